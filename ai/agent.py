@@ -7,6 +7,9 @@ import readline
 
 from rag import MentalHealthRAG
 from deep_translator import GoogleTranslator
+import language_detection
+from languages import LANGUAGES
+from conversation_memory import ConversationMemory
 
 class MentalHealthAgent:
     """
@@ -17,10 +20,13 @@ class MentalHealthAgent:
         self.groq_api_key = groq_api_key
         self.rag_system = MentalHealthRAG(groq_api_key)
         self.conversation_history = []
+        self.memory = ConversationMemory()  # What the LLM sees: recent turns plus a summary of older ones
+        self.prompt_tokens: List[int] = []  # Estimated prompt size of each turn
         self.current_session_id = None
         self.user_name = "User"
         self.target_language = "en"  # Default language (English)
-        self.supported_languages = GoogleTranslator().get_supported_languages(as_dict=True)
+        self.supported_languages = LANGUAGES.by_name
+        LANGUAGES.refresh_in_background()
         
         self._initialize_knowledge_base()
     
@@ -74,22 +80,7 @@ class MentalHealthAgent:
     
     def detect_language(self, text: str) -> str:
         """Detect the language of the input text"""
-        try:
-            # Simple detection based on common patterns
-            if any(char in text for char in ['।', '़', '्']):  # Hindi characters
-                return "hi"
-            elif any(char in text for char in ['ñ', 'á', 'é', 'í', 'ó', 'ú']):  # Spanish characters
-                return "es"
-            elif any(char in text for char in ['ä', 'ö', 'ü', 'ß']):  # German characters
-                return "de"
-            elif any(char in text for char in ['à', 'è', 'ì', 'ò', 'ù']):  # French/Italian characters
-                return "fr"
-            # Add more language detection patterns as needed
-            
-            # Default to English if no specific patterns detected
-            return "en"
-        except:
-            return "en"  # Fallback to English
+        return language_detection.detect_language(text)
     
     def translate_text(self, text: str, target_lang: str = "en", source_lang: str = "auto") -> str:
         """Translate text to target language"""
@@ -110,9 +101,9 @@ class MentalHealthAgent:
     
     def set_language(self, lang_code: str):
         """Set the target language for conversation"""
-        if lang_code in self.supported_languages.values():
+        if LANGUAGES.is_supported(lang_code):
             self.target_language = lang_code
-            lang_name = [k for k, v in self.supported_languages.items() if v == lang_code][0]
+            lang_name = LANGUAGES.name_of(lang_code)
             print(f"✓ Language set to: {lang_name} ({lang_code})")
         else:
             print("❌ Unsupported language code. Use /langs to see supported languages.")
@@ -135,6 +126,8 @@ class MentalHealthAgent:
         """Start a new conversation session"""
         self.current_session_id = f"session_{int(time.time())}"
         self.conversation_history = []
+        self.memory = ConversationMemory()
+        self.prompt_tokens = []
         
         print("\n" + "="*60)
         print("🆕 NEW CHAT SESSION STARTED")
@@ -150,6 +143,7 @@ class MentalHealthAgent:
     def _add_to_history(self, role: str, message: str):
         """Add a message to conversation history"""
         timestamp = datetime.now().isoformat()
+        self.memory.add(role, message, timestamp)
         self.conversation_history.append({
             "role": role,
             "message": message,
@@ -158,21 +152,9 @@ class MentalHealthAgent:
             "language": self.target_language
         })
     
-    def _get_conversation_context(self, max_messages: int = 10) -> str:
-        """Get recent conversation context for better continuity"""
-        if not self.conversation_history:
-            return ""
-        
-        # Get last few messages (excluding system messages)
-        recent_messages = [msg for msg in self.conversation_history[-max_messages:] 
-                          if msg['role'] in ['user', 'assistant']]
-        
-        context = "Recent conversation context:\n"
-        for msg in recent_messages:
-            speaker = "USER" if msg['role'] == 'user' else "ASSISTANT"
-            context += f"{speaker}: {msg['message']}\n"
-        
-        return context
+    def _get_conversation_context(self) -> str:
+        """Recent turns verbatim plus a summary of older ones, within the memory's token budget"""
+        return self.memory.render()
     
     def process_message(self, user_input: str) -> str:
         """Process user input and generate response with translation"""
@@ -187,19 +169,17 @@ class MentalHealthAgent:
             english_input = self.translate_text(user_input, "en", detected_lang)
             print(f"🌐 Detected: {detected_lang}, Translated to English for processing")
         
-        # Add original user message to history
-        self._add_to_history("user", user_input)
-        
-        # Get conversation context
+        # Conversation so far, before this message joins it
         conversation_context = self._get_conversation_context()
         
-        # Prepare the query with context
-        contextual_query = f"{conversation_context}\nCurrent query: {english_input}" if conversation_context else english_input
+        # Add original user message to history
+        self._add_to_history("user", user_input)
         
-        # Generate response using RAG system (in English)
+        # Generate response using RAG system (in English); retrieval only sees the current query
         start_time = time.time()
-        response_data = self.rag_system.generate_response(contextual_query)
+        response_data = self.rag_system.generate_response(english_input, history=conversation_context)
         response_time = time.time() - start_time
+        self.prompt_tokens.append(response_data.get("prompt_tokens", 0))
         
         # Translate response back to target language if needed
         english_response = response_data['response']
@@ -253,6 +233,7 @@ class MentalHealthAgent:
     def clear_history(self):
         """Clear conversation history"""
         self.conversation_history = []
+        self.memory = ConversationMemory()
         print("✓ Conversation history cleared")
     
     def save_conversation(self, filename: str = None):
@@ -311,6 +292,7 @@ Technology Stack:
     
     def show_stats(self):
         """Show knowledge base statistics"""
+        self.rag_system.refresh_document_count()
         stats = self.rag_system.get_collection_stats()
         print("\n📊 KNOWLEDGE BASE STATISTICS")
         print("="*30)
@@ -318,6 +300,12 @@ Technology Stack:
         print(f"Database: {stats.get('database_path', 'N/A')}")
         print(f"Session ID: {self.current_session_id}")
         print(f"Messages in memory: {len(self.conversation_history)}")
+        memory_stats = self.memory.stats()
+        print(f"Context: {memory_stats['recent_turns']} recent turns + summary "
+              f"({memory_stats['history_tokens']} tokens, summary {memory_stats['summary_tokens']})")
+        if self.prompt_tokens:
+            print(f"Prompt tokens: last {self.prompt_tokens[-1]}, "
+                  f"average {sum(self.prompt_tokens) // len(self.prompt_tokens)}, max {max(self.prompt_tokens)}")
         print(f"Current language: {self.target_language}")
     
     def run(self):
@@ -382,7 +370,7 @@ Technology Stack:
                         continue
                     
                     elif command in ['currentlang', 'current']:
-                        lang_name = [k for k, v in self.supported_languages.items() if v == self.target_language][0]
+                        lang_name = LANGUAGES.name_of(self.target_language)
                         print(f"🌍 Current language: {lang_name} ({self.target_language})")
                         continue
                     
@@ -0,0 +1,397 @@
+# audio_store.py
+"""
+Content-addressed, persistent store for synthesized speech.
+
+Each clip is addressed by sha256(engine|voice|language|text) and lives at
+`<directory>/<digest>.mp3` (`.wav` for engines that produce PCM audio). A
+SQLite index in the same directory records who produced the clip, its size and
+when it was last served, so the store survives restarts and is shared by every
+worker pointed at the directory. Synthesis for a digest is serialized with a
+thread lock plus an advisory file lock, so the same text is never synthesized
+twice, even by concurrent workers.
+
+Files written by older versions (`audio_<uuid>.mp3`) are still served by id.
+
+Transcoded variants of a clip (`<digest>.opus`, `<digest>.aac`) are written
+next to it by `get_or_create_variant()`; their size is added to the clip's
+index row and they are deleted together with it.
+
+`janitor_pass()` keeps the directory within a byte quota: it reconciles the
+index with the files actually on disk, then evicts least recently used clips
+until usage drops below the low watermark.
+
+`concatenate_audio()` joins clips without re-encoding (MP3 frame by frame, WAV
+sample by sample), which is how per-sentence clips are assembled into one
+response.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import wave
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    import fcntl  # Cross-process locking (POSIX only)
+except ImportError:
+    fcntl = None
+
+AUDIO_CACHE_DIR = "audio_cache"
+INDEX_FILENAME = "audio_index.sqlite3"
+LOCK_STRIPES = 64
+MEDIA_TYPES = {"mp3": "audio/mpeg", "wav": "audio/wav"}
+VARIANT_MEDIA_TYPES = {"opus": "audio/ogg; codecs=opus", "aac": "audio/aac"}
+LOW_WATERMARK = 0.9  # Eviction frees space down to this fraction of the quota
+
+# MPEG audio Layer III bitrates (kbps) by bitrate index, for MPEG-1 and MPEG-2/2.5
+_MP3_BITRATES = {
+    1: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+# Sample rates by version bits (3 = MPEG-1, 2 = MPEG-2, 0 = MPEG-2.5)
+_MP3_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+
+def audio_digest(engine: str, voice: str, language: str, text: str) -> str:
+    """Stable content address of a synthesized clip"""
+    return hashlib.sha256(f"{engine}|{voice}|{language}|{text}".encode("utf-8")).hexdigest()
+
+
+def _mp3_frame_length(header: bytes) -> Optional[int]:
+    """Length in bytes of the Layer III frame starting with `header`, or None if it is not one"""
+    if len(header) < 4 or header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+        return None
+    version, layer = (header[1] >> 3) & 3, (header[1] >> 1) & 3
+    bitrate_index, rate_index, padding = header[2] >> 4, (header[2] >> 2) & 3, (header[2] >> 1) & 1
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    bitrate = _MP3_BITRATES[1 if version == 3 else 2][bitrate_index] * 1000
+    sample_rate = _MP3_SAMPLE_RATES[version][rate_index]
+    return (144 if version == 3 else 72) * bitrate // sample_rate + padding
+
+
+def mp3_frames(data: bytes) -> bytes:
+    """
+    The MPEG audio frames of an MP3 file: ID3v2/ID3v1 tags and a leading
+    Xing/Info (VBR header) frame are removed, so several clips can be joined
+    back to back into one valid stream.
+    """
+    if data[:3] == b"ID3" and len(data) >= 10:
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        data = data[10 + size + (10 if data[5] & 0x10 else 0):]
+    if len(data) >= 128 and data[-128:-125] == b"TAG":
+        data = data[:-128]
+    frame_length = _mp3_frame_length(data[:4])
+    if frame_length and (b"Xing" in data[4:64] or b"Info" in data[4:64]):
+        data = data[frame_length:]
+    return data
+
+
+def concatenate_mp3(paths: List[str], output_path: str):
+    """Write the clips at `paths` to `output_path` as one MP3, without re-encoding"""
+    with open(output_path, "wb") as output:
+        for path in paths:
+            with open(path, "rb") as clip:
+                output.write(mp3_frames(clip.read()))
+
+
+def concatenate_wav(paths: List[str], output_path: str):
+    """Write WAV clips with identical sample formats to `output_path` as one WAV"""
+    with wave.open(output_path, "wb") as output:
+        for index, path in enumerate(paths):
+            with wave.open(path, "rb") as clip:
+                if index == 0:
+                    output.setparams(clip.getparams())
+                output.writeframes(clip.readframes(clip.getnframes()))
+
+
+def concatenate_audio(paths: List[str], output_path: str):
+    """Join clips of one format (taken from the file extension)"""
+    extensions = {os.path.splitext(path)[1] for path in paths}
+    if extensions == {".mp3"}:
+        concatenate_mp3(paths, output_path)
+    elif extensions == {".wav"}:
+        concatenate_wav(paths, output_path)
+    else:
+        raise ValueError(f"Cannot concatenate clips of mixed formats: {sorted(extensions)}")
+
+
+def media_type(path: str) -> str:
+    extension = os.path.splitext(path)[1].lstrip(".")
+    return MEDIA_TYPES.get(extension) or VARIANT_MEDIA_TYPES.get(extension, "application/octet-stream")
+
+
+class AudioStore:
+    """Synthesized audio files keyed by content digest, indexed in SQLite"""
+
+    def __init__(self, directory: str = AUDIO_CACHE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._stripes = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self._connection = sqlite3.connect(
+            os.path.join(directory, INDEX_FILENAME), timeout=30, check_same_thread=False
+        )
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS audio (
+                    digest TEXT PRIMARY KEY,
+                    engine TEXT NOT NULL,
+                    voice TEXT NOT NULL,
+                    language TEXT NOT NULL,
+                    characters INTEGER NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0
+                )
+                """
+            )
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.evicted_bytes = 0
+
+    def path_for(self, digest: str, extension: str = "mp3") -> str:
+        return os.path.join(self.directory, f"{digest}.{extension}")
+
+    def resolve(self, audio_id: str) -> Optional[str]:
+        """Path of the file served as /audio/{audio_id}, or None if it does not exist"""
+        audio_id = os.path.basename(audio_id)
+        candidates = [self.path_for(audio_id, extension) for extension in MEDIA_TYPES]
+        for path in candidates + [os.path.join(self.directory, f"audio_{audio_id}.mp3")]:
+            if os.path.isfile(path):
+                return path
+        return None
+
+    def is_content_addressed(self, path: str) -> bool:
+        """True for digest-named clips, whose bytes never change once written"""
+        return not os.path.basename(path).startswith("audio_")
+
+    def touch(self, digest: str):
+        """Record a cache hit (drives the hit rate and the LRU eviction order)"""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "UPDATE audio SET last_access = ?, hits = hits + 1 WHERE digest = ?", (time.time(), digest)
+            )
+            self.hits += 1
+
+    def lookup(self, digest: str) -> Optional[str]:
+        """Path of an existing clip, or None"""
+        path = self.resolve(digest)
+        if path is None:
+            return None
+        self.touch(digest)
+        return path
+
+    @contextmanager
+    def _digest_lock(self, digest: str, blocking: bool = True):
+        """
+        Hold the thread and file lock for `digest`; yields False instead of
+        waiting when `blocking` is False and another thread or worker holds it
+        """
+        index = int(digest[:8], 16) % LOCK_STRIPES
+        stripe = self._stripes[index]
+        if not stripe.acquire(blocking):
+            yield False
+            return
+        try:
+            if fcntl is None:
+                yield True
+                return
+            with open(os.path.join(self.directory, f".lock-{index}"), "a") as lock_file:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    yield False
+                    return
+                try:
+                    yield True
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+        finally:
+            stripe.release()
+
+    def _index(self, digest: str, engine: str, voice: str, language: str, text: str, path: str):
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO audio "
+                "(digest, engine, voice, language, characters, size, created_at, last_access, hits) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)",
+                (digest, engine, voice, language, len(text), os.path.getsize(path), now, now)
+            )
+
+    def get_or_create(self, engine: str, voice: str, language: str, text: str,
+                      synthesize: Callable[[str], None], extension: str = "mp3") -> Tuple[str, bool]:
+        """
+        Return (digest, created) for the clip, calling `synthesize(path)` to write
+        it only when no worker has produced it yet. The file is written to a
+        temporary path and renamed into place, so readers never see partial audio.
+        Blocking; run it in a worker thread from async code.
+        """
+        digest = audio_digest(engine, voice, language, text)
+        if self.lookup(digest):
+            return digest, False
+
+        with self._digest_lock(digest):
+            # Another thread or worker may have finished while we waited for the lock
+            if self.lookup(digest):
+                return digest, False
+
+            path = self.path_for(digest, extension)
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                synthesize(temp_path)
+                os.replace(temp_path, path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+            self._index(digest, engine, voice, language, text, path)
+            self.misses += 1
+            return digest, True
+
+    def get_or_create_variant(self, digest: str, extension: str,
+                              transcode: Callable[[str, str], None]) -> str:
+        """
+        Path of the `extension` variant of a clip, calling
+        `transcode(source_path, output_path)` to write it on first use.
+        Raises FileNotFoundError when the clip itself is gone. Blocking.
+        """
+        if extension not in VARIANT_MEDIA_TYPES:
+            raise ValueError(f"Unknown audio variant: {extension}")
+        path = self.path_for(digest, extension)
+        if os.path.isfile(path):
+            self.touch(digest)
+            return path
+        with self._digest_lock(digest):
+            if os.path.isfile(path):
+                self.touch(digest)
+                return path
+            source = self.resolve(digest)
+            if source is None:
+                raise FileNotFoundError(f"Audio {digest} not found")
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                transcode(source, temp_path)
+                os.replace(temp_path, path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+            with self._lock, self._connection:
+                self._connection.execute(
+                    "UPDATE audio SET size = size + ?, last_access = ? WHERE digest = ?",
+                    (os.path.getsize(path), time.time(), digest)
+                )
+            return path
+
+    def _remove_variants(self, digest: str):
+        for extension in VARIANT_MEDIA_TYPES:
+            try:
+                os.remove(self.path_for(digest, extension))
+            except FileNotFoundError:
+                pass
+
+    def _disk_files(self) -> Dict[str, Tuple[str, int, float]]:
+        """audio id -> (path, size, mtime) for every clip in the directory"""
+        files = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                audio_id, extension = os.path.splitext(entry.name)
+                if extension.lstrip(".") not in MEDIA_TYPES or not entry.is_file():
+                    continue
+                if audio_id.startswith("audio_"):
+                    audio_id = audio_id[len("audio_"):]
+                stat = entry.stat()
+                files[audio_id] = (entry.path, stat.st_size, stat.st_mtime)
+        return files
+
+    def reconcile(self) -> List[Tuple[str, str]]:
+        """
+        Make the index match the directory: drop rows whose file is gone and index
+        files it does not know (legacy clips, or clips written by another worker
+        before a crash). Returns the (audio id, engine) pairs that were dropped.
+        """
+        files = self._disk_files()
+        with self._lock, self._connection:
+            rows = self._connection.execute("SELECT digest, engine FROM audio").fetchall()
+            indexed = {digest for digest, _ in rows}
+            # Re-check on disk: a clip may have been written after the directory scan
+            missing = [(digest, engine) for digest, engine in rows if digest not in files and not self.resolve(digest)]
+            self._connection.executemany("DELETE FROM audio WHERE digest = ?", [(digest,) for digest, _ in missing])
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO audio "
+                "(digest, engine, voice, language, characters, size, created_at, last_access, hits) "
+                "VALUES (?, 'legacy', '', '', 0, ?, ?, ?, 0)",
+                [(audio_id, size, mtime, mtime) for audio_id, (_, size, mtime) in files.items()
+                 if audio_id not in indexed]
+            )
+        for digest, _ in missing:
+            self._remove_variants(digest)  # Orphaned by a clip deleted behind our back
+        return missing
+
+    def evict(self, max_bytes: int) -> List[Tuple[str, str]]:
+        """
+        Delete least recently used clips until the indexed size is at most
+        LOW_WATERMARK * max_bytes (only when it currently exceeds max_bytes).
+        Each clip is deleted under its digest lock; clips being written or
+        transcoded, or served since the scan, are skipped. Returns the evicted
+        (audio id, engine) pairs.
+        """
+        with self._lock:
+            total = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM audio").fetchone()[0]
+            if total <= max_bytes:
+                return []
+            rows = self._connection.execute(
+                "SELECT digest, engine, size, last_access FROM audio ORDER BY last_access ASC"
+            ).fetchall()
+
+        target = int(max_bytes * LOW_WATERMARK)
+        evicted = []
+        for digest, engine, size, last_access in rows:
+            if total <= target:
+                break
+            with self._digest_lock(digest, blocking=False) as locked:
+                if not locked:
+                    continue
+                with self._lock, self._connection:
+                    row = self._connection.execute(
+                        "SELECT last_access FROM audio WHERE digest = ?", (digest,)
+                    ).fetchone()
+                    if row is None or row[0] != last_access:
+                        continue  # Served or re-created since the scan, no longer least recently used
+                    self._connection.execute("DELETE FROM audio WHERE digest = ?", (digest,))
+                path = self.resolve(digest)
+                try:
+                    if path:
+                        os.remove(path)
+                except FileNotFoundError:
+                    pass  # Another worker's janitor got there first
+                self._remove_variants(digest)
+            evicted.append((digest, engine))
+            total -= size
+            self.evicted_bytes += size
+            self.evictions += 1
+        return evicted
+
+    def janitor_pass(self, max_bytes: int) -> List[Tuple[str, str]]:
+        """Reconcile and enforce the quota; returns every (audio id, engine) no longer on disk"""
+        return self.reconcile() + self.evict(max_bytes)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            files, size = self._connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM audio").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "files": files,
+            "disk_bytes": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "evicted_bytes": self.evicted_bytes
+        }
@@ -0,0 +1,213 @@
+# conversation_memory.py
+"""
+Bounded conversation history for LLM prompts.
+
+`ConversationMemory` keeps the last `recent_turns` turns (a user message and
+the reply to it) verbatim and folds older turns, one at a time as they leave
+that window, into a running summary. The rendered history - summary plus
+recent turns - stays within `token_budget` tokens: the summary is held to a
+third of the budget, and further turns are folded early when long messages
+would overflow the rest.
+
+The default summarizer is extractive: a folded turn becomes one line with the
+opening sentences of the user's message and of the reply. When the summary
+outgrows its share, the oldest lines lose their reply and are then dropped.
+It needs no model call, so folding costs microseconds on the request path;
+pass another `summarizer` to change that.
+
+Token counts are estimated at four characters per token; `estimate_tokens`
+is used both for the budget and for the prompt sizes reported per turn.
+
+The servers keep the summary next to the session (`load_memory` and
+`save_memory`), so each request reads the summary and only the messages not
+yet folded into it.
+
+Run `python conversation_memory.py` to compare prompt sizes over a long
+conversation against sending the full history or the last 10 raw messages.
+"""
+from collections import deque
+from datetime import datetime
+from typing import Callable, Deque, Dict, Iterable, List, Optional
+
+from segmentation import split_sentences
+
+CHARS_PER_TOKEN = 4
+RECENT_TURNS = 4
+TOKEN_BUDGET = 600
+USER_GIST_CHARS = 200  # Kept of each folded user message
+REPLY_GIST_CHARS = 120  # Kept of each folded reply
+REPLY_SEPARATOR = " / Assistant: "
+
+Summarizer = Callable[[str, str, str, int], str]  # (summary, user, reply, max tokens) -> summary
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _gist(text: str, max_chars: int) -> str:
+    """Leading sentences of `text` that fit in `max_chars` (the first one cut short if it alone does not)"""
+    text = " ".join(text.split())
+    gist = ""
+    for sentence, _ in split_sentences(text):
+        candidate = f"{gist} {sentence}".strip()
+        if len(candidate) > max_chars:
+            break
+        gist = candidate
+    if not gist:
+        gist = text[:max_chars - 3].rstrip() + "..." if len(text) > max_chars else text
+    return gist
+
+
+def extractive_summary(summary: str, user: str, reply: str, max_tokens: int) -> str:
+    """Add one line for a folded turn, then shrink the oldest lines until the summary fits `max_tokens`"""
+    line = f"- User: {_gist(user, USER_GIST_CHARS)}"
+    if reply:
+        line += REPLY_SEPARATOR + _gist(reply, REPLY_GIST_CHARS)
+    lines = summary.splitlines() + [line] if summary else [line]
+
+    tokens = estimate_tokens("\n".join(lines))
+    for index in range(len(lines) - 1):
+        if tokens <= max_tokens:
+            break
+        shortened = lines[index].split(REPLY_SEPARATOR)[0]
+        tokens -= estimate_tokens(lines[index]) - estimate_tokens(shortened)
+        lines[index] = shortened
+    while len(lines) > 1 and estimate_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+    return "\n".join(lines)[:max_tokens * CHARS_PER_TOKEN]
+
+
+def _epoch(timestamp) -> Optional[float]:
+    if timestamp is None or isinstance(timestamp, (int, float)):
+        return timestamp
+    return datetime.fromisoformat(timestamp).timestamp()
+
+
+class ConversationMemory:
+    """Last few turns verbatim plus a running summary of everything before them"""
+
+    def __init__(self, recent_turns: int = RECENT_TURNS, token_budget: int = TOKEN_BUDGET,
+                 summary: str = "", summarized_until: Optional[str] = None,
+                 summarizer: Summarizer = extractive_summary):
+        self.recent_turns = max(recent_turns, 1)
+        self.token_budget = token_budget
+        self.summary_budget = token_budget // 3
+        self.summary = summary
+        self.summarized_until = summarized_until  # Timestamp of the newest message in the summary
+        self.summarizer = summarizer
+        self.turns: Deque[List] = deque()  # [user message, reply, timestamp of its last message]
+        self.folded = 0  # Turns folded since this memory was loaded
+
+    def add(self, role: str, message: str, timestamp=None):
+        """Add a message; roles other than user and assistant are ignored"""
+        if role not in ("user", "assistant"):
+            return
+        if role == "user" or not self.turns:
+            self.turns.append(["", "", timestamp])
+        turn = self.turns[-1]
+        index = 0 if role == "user" else 1
+        turn[index] = f"{turn[index]} {message}".strip()
+        turn[2] = timestamp
+        self._fit()
+
+    def extend(self, messages: Iterable[Dict]):
+        """Add stored messages ({"role", "message", "timestamp"}), skipping any already summarized"""
+        until = _epoch(self.summarized_until)
+        for message in messages:
+            timestamp = message.get("timestamp")
+            if until is not None and timestamp is not None and _epoch(timestamp) <= until:
+                continue
+            self.add(message["role"], message["message"], timestamp)
+
+    def _fold(self):
+        user, reply, timestamp = self.turns.popleft()
+        self.summary = self.summarizer(self.summary, user, reply, self.summary_budget)
+        if timestamp is not None:
+            self.summarized_until = timestamp
+        self.folded += 1
+
+    @staticmethod
+    def _turn_lines(turn: List) -> List[str]:
+        user, reply, _ = turn
+        return ([f"USER: {user}"] if user else []) + ([f"ASSISTANT: {reply}"] if reply else [])
+
+    def _recent_tokens(self) -> int:
+        return sum(estimate_tokens(line) + 1 for turn in self.turns for line in self._turn_lines(turn))
+
+    def _fit(self):
+        while len(self.turns) > self.recent_turns:
+            self._fold()
+        while len(self.turns) > 1 and estimate_tokens(self.summary) + self._recent_tokens() > self.token_budget:
+            self._fold()
+
+    def render(self) -> str:
+        """History block for a prompt ("" for a new conversation), within the token budget"""
+        parts = []
+        if self.summary:
+            parts.append(f"Summary of earlier conversation:\n{self.summary}")
+        if self.turns:
+            lines = [line for turn in self.turns for line in self._turn_lines(turn)]
+            recent = "\n".join(lines)
+            # A single turn longer than the whole budget is cut from the front
+            room = (self.token_budget - estimate_tokens(self.summary)) * CHARS_PER_TOKEN
+            if len(recent) > room:
+                recent = "..." + recent[len(recent) - room + 3:]
+            parts.append(f"Recent conversation:\n{recent}")
+        return "\n".join(parts)
+
+    def stats(self) -> Dict:
+        return {
+            "recent_turns": len(self.turns),
+            "summary_tokens": estimate_tokens(self.summary),
+            "history_tokens": estimate_tokens(self.render())
+        }
+
+
+async def load_memory(store, session_id: str, recent_turns: int = RECENT_TURNS,
+                      token_budget: int = TOKEN_BUDGET) -> ConversationMemory:
+    """A session's memory: its stored summary plus the messages not folded into it yet"""
+    summary, until = await store.get_summary(session_id)
+    # Timestamps round-trip through ISO strings; the slack keeps the boundary message, extend() skips it
+    since = _epoch(until) - 0.001 if until else None
+    session = await store.get(session_id, since=since)
+    memory = ConversationMemory(recent_turns, token_budget, summary, until)
+    memory.extend(session["messages"] if session else [])
+    return memory
+
+
+async def save_memory(store, session_id: str, memory: ConversationMemory):
+    """Persist the summary if turns were folded into it since the memory was loaded"""
+    if memory.folded:
+        await store.set_summary(session_id, memory.summary, memory.summarized_until)
+        memory.folded = 0
+
+
+def _benchmark(turns: int = 40):
+    user = ("I have been feeling anxious about work lately and I can't sleep well. "
+            "My manager keeps adding deadlines and I feel like I'm falling behind. ")
+    reply = ("That sounds really stressful, and it makes sense that it is affecting your sleep. "
+             "Try writing tomorrow's tasks down before bed so your mind can let go of them. "
+             "A short breathing exercise, like breathing in for four counts and out for six, can also help. ")
+    query_tokens = estimate_tokens(user)
+    memory = ConversationMemory()
+    raw: List[str] = []
+    print("Prompt tokens per turn (history + query) and the turns each history still covers")
+    print(f"{'turn':>4} {'full history':>16} {'last 10 raw':>16} {'memory':>16}")
+    for turn in range(1, turns + 1):
+        if turn in (1, 2, 5, 10, 20, turns):
+            memory_turns = len(memory.summary.splitlines()) + len(memory.turns)
+            columns = [
+                (estimate_tokens("\n".join(raw)), len(raw) // 2),
+                (estimate_tokens("\n".join(raw[-10:])), min(len(raw), 10) // 2),
+                (estimate_tokens(memory.render()), memory_turns)
+            ]
+            print(f"{turn:>4} " + " ".join(f"{tokens + query_tokens:>7} ({covered:>2} turns)"
+                                           for tokens, covered in columns))
+        message = f"(turn {turn}) {user}"
+        raw += [f"USER: {message}", f"ASSISTANT: {reply}"]
+        memory.add("user", message)
+        memory.add("assistant", reply)
+
+if __name__ == "__main__":
+    _benchmark()
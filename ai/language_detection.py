@@ -0,0 +1,395 @@
+# language_detection.py
+"""
+Fast language detection shared by the server and the CLI agents.
+
+Detection runs in two steps:
+1. Unicode script ranges. Most scripts (Greek, Hebrew, Thai, Hangul, Tamil, ...)
+   identify the language on their own.
+2. For scripts shared by several languages (Latin, Cyrillic, Arabic,
+   Devanagari), a compact character-trigram profile per language picks the
+   most likely candidate. Profiles are built once, at import time, from the
+   small seed corpora below.
+
+Letters specific to a few languages (¿ ñ for Spanish, ß for German, ç for
+French, Portuguese and Turkish, ...) add MARK_WEIGHT to those languages'
+scores. On short text the marks decide; on long text the trigrams do.
+
+A language is only reported when it leads the runner-up by MIN_MARGIN per
+trigram (short texts must reach the lead of a MARGIN_TRIGRAMS-trigram text):
+- text with fewer than MIN_TRIGRAMS trigrams and no marks, or where the
+  script's default language is one of the close contenders, keeps the
+  default: a shared trigram is no evidence that "hi" or "stress" is not English;
+- otherwise the result is UNDETERMINED ("auto"), which makes the translator
+  detect the language instead of being given a confident wrong code. This is
+  also what languages without a profile usually get.
+
+Run `python language_detection.py` for a throughput and accuracy benchmark.
+"""
+import bisect
+import math
+import re
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_LANGUAGE = "en"
+UNDETERMINED = "auto"  # Source language that makes the translator detect the language itself
+PROFILE_SIZE = 400  # Trigrams kept per language profile
+MAX_SAMPLE_CHARS = 400  # Longer texts are detected from their prefix
+MIN_TRIGRAMS = 4  # Fewer trigrams than this (and no marks) keep the script default
+MIN_MARGIN = 0.2  # Log-probability lead per trigram the best profile needs over the runner-up
+MARGIN_TRIGRAMS = 12  # Shorter texts need the lead of a text this long
+MARK_WEIGHT = 6.0  # Log-probability added per language-specific letter
+
+# (first code point, last code point, script) - sorted by first code point
+_SCRIPT_RANGES = [
+    (0x0041, 0x005A, "Latin"),
+    (0x0061, 0x007A, "Latin"),
+    (0x00C0, 0x024F, "Latin"),
+    (0x0370, 0x03FF, "Greek"),
+    (0x0400, 0x052F, "Cyrillic"),
+    (0x0530, 0x058F, "Armenian"),
+    (0x0590, 0x05FF, "Hebrew"),
+    (0x0600, 0x06FF, "Arabic"),
+    (0x0750, 0x077F, "Arabic"),
+    (0x0780, 0x07BF, "Thaana"),
+    (0x0900, 0x097F, "Devanagari"),
+    (0x0980, 0x09FF, "Bengali"),
+    (0x0A00, 0x0A7F, "Gurmukhi"),
+    (0x0A80, 0x0AFF, "Gujarati"),
+    (0x0B00, 0x0B7F, "Oriya"),
+    (0x0B80, 0x0BFF, "Tamil"),
+    (0x0C00, 0x0C7F, "Telugu"),
+    (0x0C80, 0x0CFF, "Kannada"),
+    (0x0D00, 0x0D7F, "Malayalam"),
+    (0x0D80, 0x0DFF, "Sinhala"),
+    (0x0E00, 0x0E7F, "Thai"),
+    (0x0E80, 0x0EFF, "Lao"),
+    (0x1000, 0x109F, "Myanmar"),
+    (0x10A0, 0x10FF, "Georgian"),
+    (0x1100, 0x11FF, "Hangul"),
+    (0x1200, 0x137F, "Ethiopic"),
+    (0x1780, 0x17FF, "Khmer"),
+    (0x1800, 0x18AF, "Mongolian"),
+    (0x1E00, 0x1EFF, "Latin"),
+    (0x1F00, 0x1FFF, "Greek"),
+    (0x3040, 0x30FF, "Kana"),
+    (0x3130, 0x318F, "Hangul"),
+    (0x3400, 0x4DBF, "Han"),
+    (0x4E00, 0x9FFF, "Han"),
+    (0xABC0, 0xABFF, "MeeteiMayek"),
+    (0xAC00, 0xD7AF, "Hangul"),
+    (0xFB50, 0xFDFF, "Arabic"),
+    (0xFE70, 0xFEFF, "Arabic"),
+]
+_RANGE_STARTS = [start for start, _, _ in _SCRIPT_RANGES]
+
+# Scripts that identify a single language (deep_translator / Google codes)
+SCRIPT_LANGUAGES = {
+    "Greek": "el",
+    "Armenian": "hy",
+    "Hebrew": "iw",
+    "Thaana": "dv",
+    "Bengali": "bn",
+    "Gurmukhi": "pa",
+    "Gujarati": "gu",
+    "Oriya": "or",
+    "Tamil": "ta",
+    "Telugu": "te",
+    "Kannada": "kn",
+    "Malayalam": "ml",
+    "Sinhala": "si",
+    "Thai": "th",
+    "Lao": "lo",
+    "Myanmar": "my",
+    "Georgian": "ka",
+    "Hangul": "ko",
+    "Ethiopic": "am",
+    "Khmer": "km",
+    "Mongolian": "mn",
+    "Kana": "ja",
+    "Han": "zh-CN",
+    "MeeteiMayek": "mni-Mtei",
+}
+
+# Seed corpora for scripts shared by several languages
+SEED_TEXTS = {
+    "Latin": {
+        "en": "I have been feeling really anxious and stressed lately. I can't sleep at night and I worry about everything. What can I do to feel better? Sometimes I feel alone and nobody understands me. My friends say that I should talk to someone about my feelings. I want to improve my mental health and find ways to cope with the pressure at work. Thank you for listening to me, it helps a lot. How do I deal with panic attacks when they happen? The weather is nice today and I think I will go for a walk with my family. Hello, I need help because I am very sad. I am so tired and scared, and sometimes I am angry at myself for crying.",
+        "es": "Últimamente me siento muy ansioso y estresado. No puedo dormir por la noche y me preocupo por todo. ¿Qué puedo hacer para sentirme mejor? A veces me siento solo y nadie me entiende. Mis amigos dicen que debería hablar con alguien sobre mis sentimientos. Quiero mejorar mi salud mental y encontrar formas de manejar la presión en el trabajo. Gracias por escucharme, me ayuda mucho. ¿Cómo puedo controlar los ataques de pánico cuando ocurren? Hoy hace buen tiempo y creo que voy a dar un paseo con mi familia. Hola, necesito ayuda porque estoy muy triste.",
+        "fr": "Ces derniers temps, je me sens très anxieux et stressé. Je n'arrive pas à dormir la nuit et je m'inquiète pour tout. Que puis-je faire pour me sentir mieux ? Parfois je me sens seul et personne ne me comprend. Mes amis disent que je devrais parler de mes sentiments à quelqu'un. Je veux améliorer ma santé mentale et trouver des moyens de gérer la pression au travail. Merci de m'écouter, cela m'aide beaucoup. Comment faire face aux crises de panique quand elles arrivent ? Il fait beau aujourd'hui et je pense que je vais me promener avec ma famille. Bonjour, j'ai besoin d'aide parce que je suis très triste.",
+        "de": "In letzter Zeit fühle ich mich sehr ängstlich und gestresst. Ich kann nachts nicht schlafen und mache mir über alles Sorgen. Was kann ich tun, damit es mir besser geht? Manchmal fühle ich mich allein und niemand versteht mich. Meine Freunde sagen, dass ich mit jemandem über meine Gefühle sprechen sollte. Ich möchte meine psychische Gesundheit verbessern und Wege finden, mit dem Druck bei der Arbeit umzugehen. Danke, dass du mir zuhörst, das hilft mir sehr. Wie gehe ich mit Panikattacken um, wenn sie auftreten? Heute ist schönes Wetter und ich glaube, ich gehe mit meiner Familie spazieren. Hallo, ich brauche Hilfe, weil ich sehr traurig bin.",
+        "it": "Ultimamente mi sento molto ansioso e stressato. Non riesco a dormire la notte e mi preoccupo per tutto. Cosa posso fare per sentirmi meglio? A volte mi sento solo e nessuno mi capisce. I miei amici dicono che dovrei parlare con qualcuno dei miei sentimenti. Voglio migliorare la mia salute mentale e trovare modi per gestire la pressione al lavoro. Grazie per avermi ascoltato, mi aiuta molto. Come posso affrontare gli attacchi di panico quando succedono? Oggi il tempo è bello e penso che andrò a fare una passeggiata con la mia famiglia. Ciao, ho bisogno di aiuto perché sono molto triste.",
+        "pt": "Ultimamente tenho me sentido muito ansioso e estressado. Não consigo dormir à noite e me preocupo com tudo. O que posso fazer para me sentir melhor? Às vezes me sinto sozinho e ninguém me entende. Meus amigos dizem que eu deveria conversar com alguém sobre os meus sentimentos. Quero melhorar minha saúde mental e encontrar maneiras de lidar com a pressão no trabalho. Obrigado por me ouvir, isso ajuda muito. Como lidar com ataques de pânico quando eles acontecem? Hoje o tempo está bom e acho que vou passear com a minha família. Olá, preciso de ajuda porque estou muito triste.",
+        "nl": "De laatste tijd voel ik me erg angstig en gestrest. Ik kan 's nachts niet slapen en ik maak me overal zorgen over. Wat kan ik doen om me beter te voelen? Soms voel ik me alleen en niemand begrijpt mij. Mijn vrienden zeggen dat ik met iemand over mijn gevoelens moet praten. Ik wil mijn mentale gezondheid verbeteren en manieren vinden om met de druk op het werk om te gaan. Bedankt dat je naar me luistert, het helpt echt. Hoe ga ik om met paniekaanvallen als ze gebeuren? Het is mooi weer vandaag en ik denk dat ik een wandeling ga maken met mijn familie. Hallo, ik heb hulp nodig omdat ik erg verdrietig ben.",
+        "pl": "Ostatnio czuję się bardzo niespokojny i zestresowany. Nie mogę spać w nocy i martwię się wszystkim. Co mogę zrobić, żeby poczuć się lepiej? Czasami czuję się samotny i nikt mnie nie rozumie. Moi przyjaciele mówią, że powinienem porozmawiać z kimś o swoich uczuciach. Chcę poprawić swoje zdrowie psychiczne i znaleźć sposoby na radzenie sobie z presją w pracy. Dziękuję, że mnie słuchasz, to bardzo pomaga. Jak radzić sobie z atakami paniki, kiedy się zdarzają? Dzisiaj jest ładna pogoda i chyba pójdę na spacer z rodziną. Cześć, potrzebuję pomocy, bo jestem bardzo smutny.",
+        "tr": "Son zamanlarda kendimi çok endişeli ve stresli hissediyorum. Geceleri uyuyamıyorum ve her şey için endişeleniyorum. Daha iyi hissetmek için ne yapabilirim? Bazen kendimi yalnız hissediyorum ve kimse beni anlamıyor. Arkadaşlarım duygularım hakkında biriyle konuşmam gerektiğini söylüyor. Ruh sağlığımı iyileştirmek ve işteki baskıyla başa çıkmanın yollarını bulmak istiyorum. Beni dinlediğin için teşekkür ederim, bu çok yardımcı oluyor. Panik atakları olduğunda onlarla nasıl başa çıkabilirim? Bugün hava güzel ve sanırım ailemle yürüyüşe çıkacağım. Merhaba, yardıma ihtiyacım var çünkü çok üzgünüm.",
+        "id": "Akhir-akhir ini saya merasa sangat cemas dan stres. Saya tidak bisa tidur di malam hari dan saya khawatir tentang segala hal. Apa yang bisa saya lakukan agar merasa lebih baik? Kadang-kadang saya merasa sendirian dan tidak ada yang mengerti saya. Teman-teman saya bilang saya harus berbicara dengan seseorang tentang perasaan saya. Saya ingin memperbaiki kesehatan mental saya dan menemukan cara untuk menghadapi tekanan di tempat kerja. Terima kasih sudah mendengarkan saya, itu sangat membantu. Bagaimana cara mengatasi serangan panik ketika terjadi? Cuaca hari ini bagus dan saya pikir saya akan jalan-jalan dengan keluarga saya. Halo, saya butuh bantuan karena saya sangat sedih.",
+        "sv": "På sistone har jag känt mig väldigt orolig och stressad. Jag kan inte sova på nätterna och jag oroar mig för allt. Vad kan jag göra för att må bättre? Ibland känner jag mig ensam och ingen förstår mig. Mina vänner säger att jag borde prata med någon om mina känslor. Jag vill förbättra min psykiska hälsa och hitta sätt att hantera pressen på jobbet. Tack för att du lyssnar på mig, det hjälper mycket. Hur hanterar jag panikattacker när de händer? Det är fint väder idag och jag tror att jag ska ta en promenad med min familj. Hej, jag behöver hjälp för att jag är väldigt ledsen.",
+        "ro": "În ultima vreme mă simt foarte anxios și stresat. Nu pot să dorm noaptea și îmi fac griji pentru orice. Ce pot să fac ca să mă simt mai bine? Uneori mă simt singur și nimeni nu mă înțelege. Prietenii mei spun că ar trebui să vorbesc cu cineva despre sentimentele mele. Vreau să îmi îmbunătățesc sănătatea mintală și să găsesc modalități de a face față presiunii de la muncă. Mulțumesc că mă asculți, mă ajută foarte mult. Cum pot face față atacurilor de panică atunci când apar? Astăzi este vreme frumoasă și cred că voi merge la plimbare cu familia mea. Bună, am nevoie de ajutor pentru că sunt foarte trist.",
+        "vi": "Dạo gần đây tôi cảm thấy rất lo lắng và căng thẳng. Tôi không thể ngủ vào ban đêm và tôi lo lắng về mọi thứ. Tôi có thể làm gì để cảm thấy tốt hơn? Đôi khi tôi cảm thấy cô đơn và không ai hiểu tôi. Bạn bè tôi nói rằng tôi nên nói chuyện với ai đó về cảm xúc của mình. Tôi muốn cải thiện sức khỏe tinh thần và tìm cách đối phó với áp lực trong công việc. Cảm ơn bạn đã lắng nghe tôi, điều đó giúp ích rất nhiều. Xin chào, tôi cần giúp đỡ vì tôi rất buồn.",
+        "da": "I den seneste tid har jeg følt mig meget angst og stresset. Jeg kan ikke sove om natten, og jeg bekymrer mig om alt. Hvad kan jeg gøre for at få det bedre? Nogle gange føler jeg mig alene, og ingen forstår mig. Mine venner siger, at jeg burde tale med nogen om mine følelser. Jeg vil gerne forbedre mit mentale helbred og finde måder at håndtere presset på arbejdet. Tak fordi du lytter til mig, det hjælper meget. Hvordan håndterer jeg panikanfald, når de sker? Det er godt vejr i dag, og jeg tror, jeg går en tur med min familie. Hej, jeg har brug for hjælp, fordi jeg er meget ked af det.",
+        "no": "I det siste har jeg følt meg veldig engstelig og stresset. Jeg får ikke sove om natten, og jeg bekymrer meg for alt. Hva kan jeg gjøre for å få det bedre? Noen ganger føler jeg meg alene, og ingen forstår meg. Vennene mine sier at jeg burde snakke med noen om følelsene mine. Jeg vil forbedre den psykiske helsen min og finne måter å takle presset på jobben. Takk for at du hører på meg, det hjelper mye. Hvordan takler jeg panikkanfall når de skjer? Det er fint vær i dag, og jeg tror jeg går en tur med familien min. Hei, jeg trenger hjelp fordi jeg er veldig lei meg.",
+        "sw": "Siku hizi ninajisikia wasiwasi sana na msongo wa mawazo. Siwezi kulala usiku na ninahangaika kuhusu kila kitu. Ninaweza kufanya nini ili nijisikie vizuri zaidi? Wakati mwingine ninajisikia mpweke na hakuna anayenielewa. Marafiki zangu wanasema ninapaswa kuzungumza na mtu kuhusu hisia zangu. Ninataka kuboresha afya yangu ya akili na kutafuta njia za kukabiliana na shinikizo kazini. Asante kwa kunisikiliza, inasaidia sana. Habari, ninahitaji msaada kwa sababu nina huzuni sana.",
+    },
+    "Cyrillic": {
+        "ru": "В последнее время я чувствую сильную тревогу и стресс. Я не могу спать по ночам и беспокоюсь обо всём. Что мне сделать, чтобы почувствовать себя лучше? Иногда я чувствую себя одиноким, и никто меня не понимает. Мои друзья говорят, что мне стоит поговорить с кем-нибудь о своих чувствах. Я хочу улучшить своё психическое здоровье и найти способы справляться с давлением на работе. Спасибо, что выслушали меня, это очень помогает. Как справиться с паническими атаками, когда они случаются? Сегодня хорошая погода, и я думаю, что пойду гулять с семьёй. Привет, мне нужна помощь, потому что мне очень грустно.",
+        "uk": "Останнім часом я відчуваю сильну тривогу і стрес. Я не можу спати вночі і хвилююся про все. Що мені зробити, щоб почуватися краще? Іноді я почуваюся самотнім, і ніхто мене не розуміє. Мої друзі кажуть, що мені варто поговорити з кимось про свої почуття. Я хочу покращити своє психічне здоров'я і знайти способи впоратися з тиском на роботі. Дякую, що вислухали мене, це дуже допомагає. Як впоратися з панічними атаками, коли вони трапляються? Сьогодні гарна погода, і я думаю, що піду гуляти з родиною. Привіт, мені потрібна допомога, бо мені дуже сумно.",
+        "bg": "Напоследък се чувствам много тревожен и стресиран. Не мога да спя през нощта и се притеснявам за всичко. Какво мога да направя, за да се почувствам по-добре? Понякога се чувствам сам и никой не ме разбира. Приятелите ми казват, че трябва да говоря с някого за чувствата си. Искам да подобря психичното си здраве и да намеря начини да се справям с натиска в работата. Благодаря, че ме изслушахте, това много помага. Как да се справя с паническите атаки, когато се случват? Днес времето е хубаво и мисля, че ще изляза на разходка със семейството си. Здравей, имам нужда от помощ, защото съм много тъжен.",
+    },
+    "Arabic": {
+        "ar": "في الآونة الأخيرة أشعر بالقلق والتوتر الشديد. لا أستطيع النوم في الليل وأقلق بشأن كل شيء. ماذا يمكنني أن أفعل لأشعر بتحسن؟ أحيانا أشعر بالوحدة ولا أحد يفهمني. يقول أصدقائي إنه يجب أن أتحدث مع شخص ما عن مشاعري. أريد أن أحسن صحتي النفسية وأن أجد طرقا للتعامل مع الضغط في العمل. شكرا لأنك تستمع إلي، هذا يساعدني كثيرا. كيف أتعامل مع نوبات الهلع عندما تحدث؟ مرحبا، أحتاج إلى مساعدة لأنني حزين جدا.",
+        "fa": "این روزها خیلی احساس اضطراب و استرس می‌کنم. شب‌ها نمی‌توانم بخوابم و نگران همه چیز هستم. چه کاری می‌توانم انجام دهم تا حالم بهتر شود؟ گاهی احساس تنهایی می‌کنم و هیچ کس مرا درک نمی‌کند. دوستانم می‌گویند که باید با کسی درباره احساساتم صحبت کنم. می‌خواهم سلامت روانم را بهتر کنم و راه‌هایی برای کنار آمدن با فشار کار پیدا کنم. ممنون که به حرف‌هایم گوش می‌دهی، خیلی کمک می‌کند. سلام، به کمک نیاز دارم چون خیلی غمگین هستم.",
+        "ur": "آج کل میں بہت پریشان اور دباؤ میں محسوس کرتا ہوں۔ میں رات کو سو نہیں سکتا اور ہر چیز کے بارے میں فکر کرتا ہوں۔ میں بہتر محسوس کرنے کے لیے کیا کر سکتا ہوں؟ کبھی کبھی میں اکیلا محسوس کرتا ہوں اور کوئی مجھے نہیں سمجھتا۔ میرے دوست کہتے ہیں کہ مجھے اپنے جذبات کے بارے میں کسی سے بات کرنی چاہیے۔ میں اپنی ذہنی صحت بہتر بنانا چاہتا ہوں اور کام کے دباؤ سے نمٹنے کے طریقے تلاش کرنا چاہتا ہوں۔ میری بات سننے کا شکریہ، اس سے بہت مدد ملتی ہے۔ ہیلو، مجھے مدد کی ضرورت ہے کیونکہ میں بہت اداس ہوں۔",
+    },
+    "Devanagari": {
+        "hi": "आजकल मैं बहुत चिंतित और तनाव में महसूस करता हूँ। मैं रात को सो नहीं पाता और हर चीज़ के बारे में चिंता करता हूँ। बेहतर महसूस करने के लिए मैं क्या कर सकता हूँ? कभी कभी मैं अकेला महसूस करता हूँ और कोई मुझे नहीं समझता। मेरे दोस्त कहते हैं कि मुझे अपनी भावनाओं के बारे में किसी से बात करनी चाहिए। मैं अपने मानसिक स्वास्थ्य को बेहतर बनाना चाहता हूँ और काम के दबाव से निपटने के तरीके ढूंढना चाहता हूँ। मेरी बात सुनने के लिए धन्यवाद, इससे बहुत मदद मिलती है। नमस्ते, मुझे मदद चाहिए क्योंकि मैं बहुत उदास हूँ।",
+        "mr": "आजकाल मला खूप चिंता आणि ताण जाणवतो. मला रात्री झोप येत नाही आणि मी प्रत्येक गोष्टीची काळजी करतो. मला बरे वाटण्यासाठी मी काय करू शकतो? कधी कधी मला एकटे वाटते आणि मला कोणीही समजून घेत नाही. माझे मित्र म्हणतात की मी माझ्या भावनांबद्दल कोणाशी तरी बोलले पाहिजे. मला माझे मानसिक आरोग्य सुधारायचे आहे आणि कामाच्या दबावाला सामोरे जाण्याचे मार्ग शोधायचे आहेत. माझे ऐकल्याबद्दल धन्यवाद, त्यामुळे खूप मदत होते. नमस्कार, मला मदत हवी आहे कारण मी खूप दुःखी आहे.",
+        "ne": "आजकल म धेरै चिन्तित र तनावमा महसुस गर्छु। म राति सुत्न सक्दिन र म सबै कुराको चिन्ता गर्छु। राम्रो महसुस गर्न म के गर्न सक्छु? कहिलेकाहीँ म एक्लो महसुस गर्छु र मलाई कसैले बुझ्दैन। मेरा साथीहरू भन्छन् कि मैले मेरो भावनाको बारेमा कसैसँग कुरा गर्नुपर्छ। म मेरो मानसिक स्वास्थ्य सुधार गर्न चाहन्छु र कामको दबाबसँग जुध्ने उपायहरू खोज्न चाहन्छु। मेरो कुरा सुनिदिनुभएकोमा धन्यवाद, यसले धेरै मद्दत गर्छ। नमस्ते, मलाई मद्दत चाहिन्छ किनभने म धेरै दुःखी छु।",
+    },
+}
+
+# Letters that only a few of the profiled Latin-script languages use
+LANGUAGE_MARKS = {
+    char: tuple(languages.split())
+    for chars, languages in (
+        ("¿¡ñ", "es"), ("áíóú", "es pt"), ("ãõ", "pt"), ("ç", "fr pt tr"), ("êô", "fr pt vi"),
+        ("œ", "fr"), ("èù", "fr it"), ("ìò", "it"), ("ß", "de"), ("ä", "de sv"), ("ö", "de sv tr"),
+        ("ü", "de tr"), ("å", "sv da no"), ("æø", "da no"), ("ąćęłńśźż", "pl"), ("ğış", "tr"),
+        ("ăâîșț", "ro"), ("đươ", "vi")
+    )
+    for char in chars
+}
+
+_MARK_CHARS = frozenset(LANGUAGE_MARKS)
+
+# Language returned for a shared script when no profile matches at all
+SCRIPT_DEFAULTS = {"Latin": "en", "Cyrillic": "ru", "Arabic": "ar", "Devanagari": "hi"}
+
+_NON_WORD = re.compile(r"[\W\d_]+", re.UNICODE)
+
+
+def script_of(char: str) -> Optional[str]:
+    """Unicode script of a character, or None for punctuation, digits and symbols"""
+    code_point = ord(char)
+    index = bisect.bisect_right(_RANGE_STARTS, code_point) - 1
+    if index >= 0:
+        start, end, script = _SCRIPT_RANGES[index]
+        if code_point <= end:
+            return script
+    return None
+
+
+def _trigrams(text: str) -> Counter:
+    counts = Counter()
+    for word in _NON_WORD.split(text.lower()):
+        if word:
+            padded = f" {word} "
+            for i in range(len(padded) - 2):
+                counts[padded[i:i + 3]] += 1
+    return counts
+
+
+class LanguageDetector:
+    """Script-range plus character-trigram language detector"""
+
+    def __init__(self, seed_texts: Dict[str, Dict[str, str]] = SEED_TEXTS, profile_size: int = PROFILE_SIZE):
+        # script -> list of (language, {trigram: log probability}, floor log probability)
+        self.profiles: Dict[str, List[Tuple[str, Dict[str, float], float]]] = {}
+        for script, languages in seed_texts.items():
+            self.profiles[script] = [
+                (language, *self._build_profile(text, profile_size))
+                for language, text in languages.items()
+            ]
+
+    @staticmethod
+    def _build_profile(text: str, profile_size: int) -> Tuple[Dict[str, float], float]:
+        most_common = _trigrams(text).most_common(profile_size)
+        total = sum(count for _, count in most_common)
+        profile = {trigram: math.log(count / total) for trigram, count in most_common}
+        return profile, math.log(0.1 / total)
+
+    def dominant_script(self, text: str) -> Tuple[Optional[str], Counter]:
+        scripts = Counter()
+        for char in text:
+            if char.isalpha():
+                script = script_of(char)
+                if script:
+                    scripts[script] += 1
+        if not scripts:
+            return None, scripts
+        return scripts.most_common(1)[0][0], scripts
+
+    def detect(self, text: str, default: str = DEFAULT_LANGUAGE) -> str:
+        """Detect the language code (deep_translator / Google code) of `text`, or UNDETERMINED"""
+        if not text or not text.strip():
+            return default
+
+        sample = text[:MAX_SAMPLE_CHARS]
+        script, scripts = self.dominant_script(sample)
+        if script is None:
+            return default
+
+        # Japanese mixes kana with Han characters
+        if script == "Han" and scripts.get("Kana"):
+            return "ja"
+        if script in SCRIPT_LANGUAGES:
+            return SCRIPT_LANGUAGES[script]
+
+        candidates = self.profiles.get(script)
+        if not candidates:
+            return default
+
+        script_default = SCRIPT_DEFAULTS.get(script, default)
+        lowered = sample.lower()
+        marks = Counter()
+        for char in _MARK_CHARS.intersection(lowered):
+            for language in LANGUAGE_MARKS[char]:
+                marks[language] += lowered.count(char)
+        trigrams = _trigrams(sample)
+        total = sum(trigrams.values())
+        if total < MIN_TRIGRAMS and not marks:
+            return script_default
+
+        best_language, best_score, runner_up, matched = script_default, -math.inf, -math.inf, bool(marks)
+        default_score = -math.inf
+        for language, profile, floor in candidates:
+            score = MARK_WEIGHT * marks[language]
+            for trigram, count in trigrams.items():
+                log_probability = profile.get(trigram)
+                if log_probability is None:
+                    log_probability = floor
+                else:
+                    matched = True
+                score += count * log_probability
+            if language == script_default:
+                default_score = score
+            if score > best_score:
+                best_language, best_score, runner_up = language, score, best_score
+            elif score > runner_up:
+                runner_up = score
+        if not matched:
+            return script_default
+
+        required = MIN_MARGIN * max(total, MARGIN_TRIGRAMS)
+        if best_score - runner_up >= required:
+            return best_language
+        if best_score - default_score < required:
+            return script_default
+        return UNDETERMINED
+
+
+# Profiles are built once at import and shared by every caller
+_detector = LanguageDetector()
+
+
+def detect_language(text: str, default: str = DEFAULT_LANGUAGE) -> str:
+    """
+    Detect the language of `text`: `default` for text without letters or on
+    error, UNDETERMINED when the candidates are too close to call
+    """
+    try:
+        return _detector.detect(text, default)
+    except Exception:
+        return default
+
+
+# Held-out evaluation set (not part of the seed corpora)
+EVALUATION_SET = {
+    "en": ["I keep having panic attacks at work", "Can you help me sleep better?",
+           "I feel so alone in this world", "my therapist said I should journal every day",
+           "hi", "hello", "ok", "yes", "no", "me", "thanks", "help me", "stress", "depression",
+           "I am so tired", "good morning"],
+    "es": ["me siento muy triste y no se que hacer", "tengo ansiedad todo el tiempo",
+           "necesito hablar con alguien por favor", "no puedo dejar de pensar en mi ex",
+           "¿Qué tal?", "Hola", "Gracias", "Ayúdame"],
+    "fr": ["je suis tellement fatigué de tout", "j'ai peur de parler à mes parents",
+           "est-ce que tu peux m'aider", "je ne dors plus depuis une semaine",
+           "Bonjour", "Merci beaucoup", "Où es-tu?", "ça va?"],
+    "de": ["ich bin so müde und traurig", "kannst du mir bitte helfen",
+           "meine Arbeit macht mich krank", "ich habe keine Lust mehr auf nichts",
+           "Hilfe!", "Danke", "Grüß dich"],
+    "it": ["sono molto stanco e triste", "puoi aiutarmi per favore",
+           "non riesco a smettere di piangere", "ho paura di tutto"],
+    "pt": ["estou muito cansado e triste", "você pode me ajudar por favor",
+           "não consigo parar de chorar", "tenho medo de tudo"],
+    "nl": ["ik ben zo moe en verdrietig", "kun je me alsjeblieft helpen",
+           "ik kan niet stoppen met huilen", "mijn werk maakt me ziek"],
+    "pl": ["jestem bardzo zmęczony i smutny", "czy możesz mi pomóc",
+           "nie mogę przestać płakać", "boję się wszystkiego"],
+    "tr": ["çok yorgunum ve üzgünüm", "bana yardım edebilir misin",
+           "ağlamayı durduramıyorum", "her şeyden korkuyorum"],
+    "id": ["saya sangat lelah dan sedih", "bisakah kamu membantu saya",
+           "saya tidak bisa berhenti menangis", "saya takut akan segalanya"],
+    "da": ["jeg er så træt og ked af det", "kan du hjælpe mig", "jeg kan ikke holde op med at græde"],
+    "no": ["jeg er så sliten og lei meg", "kan du hjelpe meg", "jeg klarer ikke å slutte å gråte"],
+    "sv": ["jag är så trött och ledsen", "kan du hjälpa mig",
+           "jag kan inte sluta gråta", "jobbet gör mig sjuk"],
+    "ro": ["sunt foarte obosit și trist", "poți să mă ajuți te rog",
+           "nu mă pot opri din plâns", "mi-e frică de toate"],
+    "vi": ["tôi rất mệt mỏi và buồn", "bạn có thể giúp tôi không", "tôi không thể ngừng khóc"],
+    "sw": ["nimechoka sana na nina huzuni", "unaweza kunisaidia tafadhali", "siwezi kuacha kulia"],
+    "ru": ["я очень устал и мне грустно", "ты можешь мне помочь", "я не могу перестать плакать"],
+    "uk": ["я дуже втомився і мені сумно", "чи можеш ти мені допомогти", "я не можу перестати плакати"],
+    "bg": ["много съм уморен и тъжен", "можеш ли да ми помогнеш", "не мога да спра да плача"],
+    "ar": ["أنا متعب جدا وحزين", "هل يمكنك مساعدتي", "لا أستطيع التوقف عن البكاء"],
+    "fa": ["من خیلی خسته و غمگین هستم", "می‌توانی به من کمک کنی", "نمی‌توانم دست از گریه بردارم"],
+    "ur": ["میں بہت تھکا ہوا اور اداس ہوں", "کیا آپ میری مدد کر سکتے ہیں", "میں رونا بند نہیں کر سکتا"],
+    "hi": ["मैं बहुत थका हुआ और उदास हूँ", "क्या आप मेरी मदद कर सकते हैं", "मैं रोना बंद नहीं कर पा रहा"],
+    "mr": ["मी खूप थकलो आहे आणि दुःखी आहे", "तुम्ही मला मदत करू शकता का", "मला रडू थांबवता येत नाही"],
+    "ne": ["म धेरै थकित र दुःखी छु", "के तपाईं मलाई मद्दत गर्न सक्नुहुन्छ", "म रुन रोक्न सक्दिन"],
+    "el": ["Νιώθω πολύ άγχος και λύπη"],
+    "iw": ["אני מרגיש עצוב מאוד"],
+    "th": ["ฉันรู้สึกเศร้ามาก"],
+    "ja": ["とても疲れていて悲しいです"],
+    "zh-CN": ["我感到非常焦虑"],
+    "ko": ["저는 너무 불안해요"],
+    "ka": ["ძალიან დაღლილი ვარ"],
+    "hy": ["Ես շատ տխուր եմ"],
+    "bn": ["আমি খুব দুঃখিত"],
+    "ta": ["நான் மிகவும் சோகமாக இருக்கிறேன்"],
+    "te": ["నేను చాలా విచారంగా ఉన్నాను"],
+    "pa": ["ਮੈਂ ਬਹੁਤ ਉਦਾਸ ਹਾਂ"],
+    "gu": ["હું ખૂબ ઉદાસ છું"],
+    "kn": ["ನಾನು ತುಂಬಾ ದುಃಖಿತನಾಗಿದ್ದೇನೆ"],
+    "ml": ["എനിക്ക് വളരെ സങ്കടമുണ്ട്"],
+    "am": ["በጣም አዝኛለሁ"],
+}
+
+
+def run_benchmark(repeat: int = 200):
+    """
+    Report accuracy on the held-out set and throughput in messages/sec.
+    UNDETERMINED results are listed apart from wrong ones: the translator
+    still detects those correctly, at the cost of a translator call.
+    """
+    samples = [(language, text) for language, texts in EVALUATION_SET.items() for text in texts]
+
+    errors, undetermined = [], []
+    for expected, text in samples:
+        detected = detect_language(text)
+        if detected == UNDETERMINED:
+            undetermined.append((expected, text))
+        elif detected != expected:
+            errors.append((expected, detected, text))
+    correct = len(samples) - len(errors) - len(undetermined)
+
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        for _, text in samples:
+            detect_language(text)
+    elapsed = time.perf_counter() - start_time
+
+    print(f"Languages: {len(EVALUATION_SET)}  Samples: {len(samples)}")
+    print(f"Accuracy: {correct / len(samples):.1%} ({correct}/{len(samples)})")
+    print(f"Undetermined (left to the translator): {len(undetermined)}")
+    for expected, text in undetermined:
+        print(f"  expected {expected}: {text}")
+    print(f"Wrong: {len(errors)}")
+    for expected, detected, text in errors:
+        print(f"  expected {expected}, got {detected}: {text}")
+    print(f"Throughput: {repeat * len(samples) / elapsed:,.0f} messages/sec")
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,181 @@
+# languages.py
+"""
+Bundled table of the languages supported by the translator.
+
+The table ships with the code, so servers and agents start without asking the
+translator for its language list, and lookups are O(1) in both directions:
+`by_name` (name -> code), `by_code` (code -> name) and `codes` (frozenset).
+`LANGUAGES.refresh_in_background()` re-reads the list from deep_translator in a
+daemon thread and merges any new languages into the live table.
+
+Run `python languages.py` to compare startup and lookup cost with the
+per-constructor `GoogleTranslator().get_supported_languages()` call.
+"""
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+LANGUAGE_TABLE_VERSION = "2024.06-google-133"
+
+# Language name -> translator code (Google Translate codes as used by deep_translator)
+BUNDLED_LANGUAGES = {
+    "afrikaans": "af", "albanian": "sq", "amharic": "am", "arabic": "ar",
+    "armenian": "hy", "assamese": "as", "aymara": "ay", "azerbaijani": "az",
+    "bambara": "bm", "basque": "eu", "belarusian": "be", "bengali": "bn",
+    "bhojpuri": "bho", "bosnian": "bs", "bulgarian": "bg", "catalan": "ca",
+    "cebuano": "ceb", "chichewa": "ny", "chinese (simplified)": "zh-CN", "chinese (traditional)": "zh-TW",
+    "corsican": "co", "croatian": "hr", "czech": "cs", "danish": "da",
+    "dhivehi": "dv", "dogri": "doi", "dutch": "nl", "english": "en",
+    "esperanto": "eo", "estonian": "et", "ewe": "ee", "filipino": "tl",
+    "finnish": "fi", "french": "fr", "frisian": "fy", "galician": "gl",
+    "georgian": "ka", "german": "de", "greek": "el", "guarani": "gn",
+    "gujarati": "gu", "haitian creole": "ht", "hausa": "ha", "hawaiian": "haw",
+    "hebrew": "iw", "hindi": "hi", "hmong": "hmn", "hungarian": "hu",
+    "icelandic": "is", "igbo": "ig", "ilocano": "ilo", "indonesian": "id",
+    "irish": "ga", "italian": "it", "japanese": "ja", "javanese": "jw",
+    "kannada": "kn", "kazakh": "kk", "khmer": "km", "kinyarwanda": "rw",
+    "konkani": "gom", "korean": "ko", "krio": "kri", "kurdish (kurmanji)": "ku",
+    "kurdish (sorani)": "ckb", "kyrgyz": "ky", "lao": "lo", "latin": "la",
+    "latvian": "lv", "lingala": "ln", "lithuanian": "lt", "luganda": "lg",
+    "luxembourgish": "lb", "macedonian": "mk", "maithili": "mai", "malagasy": "mg",
+    "malay": "ms", "malayalam": "ml", "maltese": "mt", "maori": "mi",
+    "marathi": "mr", "meiteilon (manipuri)": "mni-Mtei", "mizo": "lus", "mongolian": "mn",
+    "myanmar": "my", "nepali": "ne", "norwegian": "no", "odia (oriya)": "or",
+    "oromo": "om", "pashto": "ps", "persian": "fa", "polish": "pl",
+    "portuguese": "pt", "punjabi": "pa", "quechua": "qu", "romanian": "ro",
+    "russian": "ru", "samoan": "sm", "sanskrit": "sa", "scots gaelic": "gd",
+    "sepedi": "nso", "serbian": "sr", "sesotho": "st", "shona": "sn",
+    "sindhi": "sd", "sinhala": "si", "slovak": "sk", "slovenian": "sl",
+    "somali": "so", "spanish": "es", "sundanese": "su", "swahili": "sw",
+    "swedish": "sv", "tajik": "tg", "tamil": "ta", "tatar": "tt",
+    "telugu": "te", "thai": "th", "tigrinya": "ti", "tsonga": "ts",
+    "turkish": "tr", "turkmen": "tk", "twi": "ak", "ukrainian": "uk",
+    "urdu": "ur", "uyghur": "ug", "uzbek": "uz", "vietnamese": "vi",
+    "welsh": "cy", "xhosa": "xh", "yiddish": "yi", "yoruba": "yo",
+    "zulu": "zu",
+}
+
+
+def fetch_supported_languages() -> Dict[str, str]:
+    """Language list as reported by the installed translator"""
+    from deep_translator import GoogleTranslator
+    return GoogleTranslator().get_supported_languages(as_dict=True)
+
+
+class LanguageTable:
+    """Forward/reverse language lookups with lazy background refresh"""
+
+    def __init__(self, languages: Dict[str, str] = BUNDLED_LANGUAGES, version: str = LANGUAGE_TABLE_VERSION):
+        self.version = version
+        self.by_name: Dict[str, str] = dict(languages)
+        self.by_code: Dict[str, str] = {code: name for name, code in languages.items()}
+        self.codes = frozenset(self.by_code)
+        self.refreshed_at: Optional[float] = None
+        self._refresh_lock = threading.Lock()
+        self._refresh_thread: Optional[threading.Thread] = None
+
+    def __len__(self) -> int:
+        return len(self.by_name)
+
+    def __contains__(self, code: str) -> bool:
+        return code in self.codes
+
+    def is_supported(self, code: str) -> bool:
+        return code in self.codes
+
+    def name_of(self, code: str) -> Optional[str]:
+        return self.by_code.get(code)
+
+    def code_of(self, name: str) -> Optional[str]:
+        return self.by_name.get(name.lower())
+
+    def refresh(self, fetch: Callable[[], Dict[str, str]] = fetch_supported_languages) -> int:
+        """
+        Merge the translator's current language list into the table.
+        Languages are only ever added, so callers holding `by_name` keep a valid view.
+        Returns the number of new or changed entries.
+        """
+        with self._refresh_lock:
+            fetched = fetch()
+            added = {name: code for name, code in fetched.items() if self.by_name.get(name) != code}
+            if added:
+                self.by_name.update(added)
+                self.by_code.update({code: name for name, code in added.items()})
+                self.codes = frozenset(self.by_code)
+                self.version = f"{LANGUAGE_TABLE_VERSION}+{len(added)}"
+                logger.info(f"Language table refreshed: {len(added)} new languages, {len(self.codes)} total")
+            self.refreshed_at = time.time()
+            return len(added)
+
+    def refresh_in_background(self):
+        """Start a one-off daemon refresh unless one already ran or is running"""
+        if self._refresh_thread is not None:
+            return
+
+        def run():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning(f"Language table refresh failed, keeping bundled table: {e}")
+
+        self._refresh_thread = threading.Thread(target=run, name="language-table-refresh", daemon=True)
+        self._refresh_thread.start()
+
+    def info(self) -> Dict:
+        return {
+            "version": self.version,
+            "languages": len(self.codes),
+            "refreshed_at": self.refreshed_at
+        }
+
+
+# Shared table used by the server and the CLI agents
+LANGUAGES = LanguageTable()
+
+
+def run_benchmark(lookups: int = 100000):
+    """Compare the bundled table against the per-constructor translator call"""
+    start_time = time.perf_counter()
+    fetched = fetch_supported_languages()
+    fetch_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    table = LanguageTable()
+    table_time = time.perf_counter() - start_time
+
+    codes = list(fetched.values())
+    probes = [codes[i % len(codes)] for i in range(lookups)]
+
+    start_time = time.perf_counter()
+    for code in probes:
+        code in fetched.values()
+    scan_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    for code in probes:
+        table.is_supported(code)
+    set_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    for code in probes[:lookups // 10]:
+        [name for name, value in fetched.items() if value == code][0]
+    reverse_scan_time = (time.perf_counter() - start_time) * 10
+
+    start_time = time.perf_counter()
+    for code in probes:
+        table.name_of(code)
+    reverse_dict_time = time.perf_counter() - start_time
+
+    print(f"Table version {table.version}: {len(table)} languages (translator reports {len(fetched)})")
+    print(f"Startup: get_supported_languages() {fetch_time * 1000:.2f} ms (incl. translator import), "
+          f"bundled table {table_time * 1000:.3f} ms")
+    print(f"Validation x{lookups}: dict.values() scan {scan_time * 1000:.1f} ms, frozenset {set_time * 1000:.1f} ms")
+    print(f"Reverse lookup x{lookups}: list comprehension {reverse_scan_time * 1000:.1f} ms, "
+          f"dict {reverse_dict_time * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,240 @@
+# metrics.py
+"""
+Lightweight in-process metrics with Prometheus text-format export.
+
+Counters, gauges and histograms are registered on a MetricsRegistry and
+rendered by `MetricsRegistry.render()` in the Prometheus exposition format
+(version 0.0.4), so the server can expose them without extra dependencies.
+
+`ExpiringCount` keeps a running count of items that disappear on their own
+after a TTL, such as cache keys written with SETEX, so their number can be
+reported without scanning the keyspace.
+"""
+import bisect
+import heapq
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4"
+
+# Latency buckets in seconds, tuned for cache round trips (sub-millisecond to 1s)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{_escape(extra[1])}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    """Base class for labelled metrics"""
+
+    metric_type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _header(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.metric_type}"
+        ]
+
+
+class Counter(_Metric):
+    """Monotonically increasing value"""
+
+    metric_type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> Dict[Tuple[str, ...], float]:
+        with self._lock:
+            return dict(self._values)
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        for key, value in sorted(self.samples().items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    """Value that can go up and down"""
+
+    metric_type = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """Cumulative histogram of observed values"""
+
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[Tuple[str, ...], Dict] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+                self._values[key] = series
+            series["counts"][index] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def summary(self, **labels) -> Dict[str, float]:
+        """Count, sum and mean of observations for one label set"""
+        series = self._values.get(self._key(labels))
+        if not series:
+            return {"count": 0, "sum": 0.0, "mean": 0.0}
+        return {
+            "count": series["count"],
+            "sum": series["sum"],
+            "mean": series["sum"] / series["count"]
+        }
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        with self._lock:
+            snapshot = {key: dict(series, counts=list(series["counts"])) for key, series in self._values.items()}
+        for key, series in sorted(snapshot.items()):
+            cumulative = 0
+            bounds = list(self.buckets) + [float("inf")]
+            for bound, count in zip(bounds, series["counts"]):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series['sum'])}")
+            lines.append(f"{self.name}_count{labels} {series['count']}")
+        return lines
+
+
+class ExpiringCount:
+    """
+    Per-label count of items that each expire `ttl` seconds after they were
+    added. Expiry times are grouped into `resolution`-second buckets held in a
+    heap, so adding is O(log buckets) and reading only pops expired buckets.
+    Items removed before they expire are not subtracted; `reset()` a label
+    when all of its items are cleared.
+    """
+
+    def __init__(self, resolution: float = 1.0):
+        self.resolution = resolution
+        self._buckets: Dict[str, Dict[int, int]] = {}  # label -> expiry bucket -> items
+        self._heaps: Dict[str, List[int]] = {}
+        self._totals: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def add(self, label: str, ttl: float, count: int = 1, now: Optional[float] = None):
+        bucket = int(((now or time.time()) + ttl) // self.resolution) + 1
+        with self._lock:
+            buckets = self._buckets.setdefault(label, {})
+            if bucket not in buckets:
+                buckets[bucket] = 0
+                heapq.heappush(self._heaps.setdefault(label, []), bucket)
+            buckets[bucket] += count
+            self._totals[label] = self._totals.get(label, 0) + count
+
+    def _expire(self, label: str, now: float):
+        current = int(now // self.resolution)
+        heap, buckets = self._heaps[label], self._buckets[label]
+        while heap and heap[0] <= current:
+            self._totals[label] -= buckets.pop(heapq.heappop(heap))
+
+    def reset(self, label: Optional[str] = None):
+        """Forget every item under `label` (all labels when None)"""
+        with self._lock:
+            for name in ([label] if label is not None else list(self._totals)):
+                self._buckets.pop(name, None)
+                self._heaps.pop(name, None)
+                self._totals.pop(name, None)
+
+    def counts(self, now: Optional[float] = None) -> Dict[str, int]:
+        now = now or time.time()
+        with self._lock:
+            for label in self._totals:
+                self._expire(label, now)
+            return dict(self._totals)
+
+
+class MetricsRegistry:
+    """Collection of named metrics rendered together for the /metrics endpoint"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric_class, name: str, *args, **kwargs):
+        with self._lock:
+            existing = self._metrics.get(name)
+            if existing is not None:
+                if not isinstance(existing, metric_class):
+                    raise ValueError(f"Metric {name} already registered as {existing.metric_type}")
+                return existing
+            metric = metric_class(name, *args, **kwargs)
+            self._metrics[name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        lines = []
+        for name in sorted(self._metrics):
+            lines.extend(self._metrics[name].render())
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,213 @@
+# pipeline.py
+"""
+Async stage graphs for request handling.
+
+A StageGraph is a set of named async stages with explicit dependencies. Each
+stage receives a shared context dict and its return value is stored in the
+context under the stage name. With `concurrent=True` every stage starts as soon
+as the stages it depends on have finished, so independent work (cache lookups,
+classification, retrieval, ...) overlaps. Per-stage durations are recorded in
+`context["timings"]` and, when a MetricsRegistry is given, in the
+`<name>_stage_duration_seconds{stage}` histogram.
+
+Run `python pipeline.py` to benchmark the chat graph from server_v2.py against
+mocked upstreams, sequentially and concurrently.
+"""
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Optional, Sequence
+
+from metrics import MetricsRegistry
+
+# Stage durations range from cache round trips to multi-second LLM calls
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+StageFunc = Callable[[Dict], Awaitable]
+
+
+class Stage:
+    """One named step of a StageGraph"""
+
+    def __init__(self, name: str, func: StageFunc, after: Sequence[str] = ()):
+        self.name = name
+        self.func = func
+        self.after = tuple(after)
+
+
+class StageGraph:
+    """Dependency graph of async stages executed with asyncio concurrency"""
+
+    def __init__(self, name: str, metrics: Optional[MetricsRegistry] = None):
+        self.name = name
+        self.stages: Dict[str, Stage] = {}
+        self.duration = None
+        if metrics is not None:
+            self.duration = metrics.histogram(
+                f"{name}_stage_duration_seconds", f"Duration of each {name} pipeline stage",
+                ["stage"], buckets=STAGE_BUCKETS
+            )
+
+    def add(self, name: str, func: StageFunc, after: Sequence[str] = ()) -> "StageGraph":
+        """Register a stage. Dependencies must already be registered, which keeps the graph acyclic."""
+        if name in self.stages:
+            raise ValueError(f"Stage already registered: {name}")
+        missing = [dependency for dependency in after if dependency not in self.stages]
+        if missing:
+            raise ValueError(f"Stage {name} depends on unknown stages: {missing}")
+        self.stages[name] = Stage(name, func, after)
+        return self
+
+    async def _run_stage(self, stage: Stage, context: Dict):
+        start_time = time.perf_counter()
+        context[stage.name] = await stage.func(context)
+        elapsed = time.perf_counter() - start_time
+        context["timings"][stage.name] = elapsed
+        if self.duration is not None:
+            self.duration.observe(elapsed, stage=stage.name)
+
+    async def _run_after(self, stage: Stage, context: Dict, dependencies):
+        if dependencies:
+            await asyncio.gather(*dependencies)
+        await self._run_stage(stage, context)
+
+    async def run(self, context: Dict, concurrent: bool = True) -> Dict:
+        """
+        Execute every stage and return the context. With `concurrent=False` the
+        stages run one after another in registration order (useful for debugging
+        and as a baseline). The first failing stage cancels the rest and its
+        exception propagates.
+        """
+        context.setdefault("timings", {})
+        start_time = time.perf_counter()
+
+        if not concurrent:
+            for stage in self.stages.values():
+                await self._run_stage(stage, context)
+        else:
+            tasks: Dict[str, asyncio.Task] = {}
+            for stage in self.stages.values():
+                dependencies = [tasks[dependency] for dependency in stage.after]
+                tasks[stage.name] = asyncio.ensure_future(self._run_after(stage, context, dependencies))
+            try:
+                await asyncio.gather(*tasks.values())
+            except BaseException:
+                for task in tasks.values():
+                    task.cancel()
+                await asyncio.gather(*tasks.values(), return_exceptions=True)
+                raise
+
+        elapsed = time.perf_counter() - start_time
+        context["timings"]["total"] = elapsed
+        if self.duration is not None:
+            self.duration.observe(elapsed, stage="total")
+        return context
+
+
+async def _benchmark(requests: int, parallel: int = 8):
+    """Chat graph from server_v2.py with every upstream replaced by a sleep"""
+    from server_v2 import MentalHealthServer, normalize_query
+
+    latencies = {"redis": 0.005, "translate": 0.15, "retrieve": 0.08, "generate": 0.6}
+
+    class MockCache:
+        entries = {}
+
+        async def get(self, key):
+            await asyncio.sleep(latencies["redis"])
+            return self.entries.get(key)
+
+        async def set(self, key, value, ttl=None):
+            await asyncio.sleep(latencies["redis"])
+            return True
+
+        async def increment_score(self, key, member, amount=1, max_members=None, ttl=None):
+            await asyncio.sleep(latencies["redis"])
+
+    class MockRAG:
+        def classify_query(self, query):
+            return True
+
+        def retrieve_relevant_context(self, query, n_results=5):
+            time.sleep(latencies["retrieve"])
+            return [{"text": "context", "metadata": {}, "distance": 0.1}]
+
+        def generate_response(self, query, use_rag=True, is_mental_health=None, contexts=None,
+                              on_token=None, history=None):
+            if contexts is None:
+                contexts = self.retrieve_relevant_context(query)
+            time.sleep(latencies["generate"])
+            return {"query": query, "is_mental_health": True, "response": "Take a deep breath.",
+                    "contexts": contexts, "response_time": 0, "method": "rag"}
+
+    class MockServer:
+        cache_manager = MockCache()
+        rag_system = MockRAG()
+        metrics = None
+        chat_cache_key = MentalHealthServer.chat_cache_key
+        localized_chat_cache_key = MentalHealthServer.localized_chat_cache_key
+        localized_chat_entry = MentalHealthServer.localized_chat_entry
+
+        def detect_language(self, text):
+            return "es" if text.startswith("Necesito") else "en"
+
+        async def translate_text(self, text, target_lang="en", source_lang="auto", fallback=True):
+            await asyncio.sleep(latencies["translate"])
+            return text
+
+    server = MockServer()
+    graph = MentalHealthServer.build_chat_pipeline(server)
+
+    async def legacy_chat(message, target_language):
+        """The previous strictly sequential endpoint flow (generation offloaded to a thread, as in the graph)"""
+        detected = server.detect_language(message)
+        english = message if detected == "en" else await server.translate_text(message, "en", detected)
+        await server.cache_manager.increment_score("query_log", english)
+        await server.cache_manager.get("chat")
+        response_data = await asyncio.to_thread(server.rag_system.generate_response, english)
+        await server.cache_manager.set("chat", response_data)
+        if target_language != "en":
+            await server.translate_text(response_data["response"], target_language, "en")
+
+    async def timed(coroutine):
+        start_time = time.perf_counter()
+        await coroutine
+        return time.perf_counter() - start_time
+
+    print(f"Mocked upstream latencies (s): {latencies}")
+    for message, language in (("I need help with my anxiety", "en"), ("Necesito ayuda con mi ansiedad", "es")):
+        print(f"\nUncached request, {language} -> {language}:")
+        for concurrent in (False, True):
+            totals = []
+            for i in range(requests):
+                context = await graph.run(
+                    {"message": f"{message} {i}", "target_language": language, "history": ""},
+                    concurrent=concurrent
+                )
+                totals.append(context["timings"]["total"])
+            stages = ", ".join(f"{name}={value * 1000:.0f}ms" for name, value in context["timings"].items()
+                               if name != "total")
+            mode = "concurrent" if concurrent else "sequential"
+            print(f"  {mode:>10}: mean end-to-end {sum(totals) / len(totals) * 1000:.0f} ms ({stages})")
+
+    message = "I need help with my anxiety"
+    server.cache_manager.entries[server.chat_cache_key(normalize_query(message), "en")] = {
+        "query": message, "is_mental_health": True, "response": "Take a deep breath.", "contexts": [],
+        "response_time": 0, "method": "rag"
+    }
+    context = await graph.run({"message": message, "target_language": "en", "history": ""})
+    stages = ", ".join(f"{name}={value * 1000:.0f}ms" for name, value in context["timings"].items()
+                       if name != "total")
+    print(f"\nShared cache hit, en -> en: end-to-end {context['timings']['total'] * 1000:.0f} ms ({stages})")
+
+    print(f"\n{parallel} simultaneous uncached es -> es requests:")
+    messages = [f"Necesito ayuda con mi ansiedad {i}" for i in range(parallel)]
+    legacy = await asyncio.gather(*(timed(legacy_chat(message, "es")) for message in messages))
+    staged = await asyncio.gather(*(
+        timed(graph.run({"message": message, "target_language": "es", "history": ""})) for message in messages
+    ))
+    for name, totals in (("legacy", legacy), ("pipeline", staged)):
+        print(f"  {name:>10}: mean {sum(totals) / len(totals) * 1000:.0f} ms, max {max(totals) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(_benchmark(5))
@@ -4,11 +4,12 @@ from chromadb.utils import embedding_functions
 import requests
 import json
 import os
-from typing import List, Dict, Optional, Tuple
+from typing import Callable, List, Dict, Optional, Tuple
 import re
 import numpy as np
 from sentence_transformers import SentenceTransformer
 import time
+from conversation_memory import estimate_tokens
 
 
 os.environ["ANONYMIZED_TELEMETRY"] = "False"
@@ -28,6 +29,7 @@ class MentalHealthRAG:
         self.embedding_model = None
         self.chroma_client = None
         self.collection = None
+        self.document_count = 0  # Updated by add_knowledge_documents and refresh_document_count
         
         # Initialize components
         self._initialize_embedding_model()
@@ -113,6 +115,7 @@ class MentalHealthRAG:
                 embedding_function=embedding_function,
                 metadata={"hnsw:space": "cosine"}
             )
+            self.document_count = self.collection.count()
             
             print("ChromaDB initialized successfully")
             
@@ -149,6 +152,13 @@ class MentalHealthRAG:
             
         return False
     
+    def classify_query(self, query: str) -> bool:
+        """
+        Public wrapper around the mental health classifier, so callers can
+        classify a query ahead of (or concurrently with) generation.
+        """
+        return self._is_mental_health_query(query)
+    
     def add_knowledge_documents(self, documents: List[Dict[str, str]]):
         """
         Add mental health knowledge documents to the vector database.
@@ -187,6 +197,7 @@ class MentalHealthRAG:
                 metadatas=metadatas,
                 ids=ids
             )
+            self.document_count += len(ids)
             
             print(f"Added {len(documents)} documents to knowledge base")
             return True
@@ -222,7 +233,11 @@ class MentalHealthRAG:
             print(f"Error retrieving context: {e}")
             return []
     
-    def _format_rag_prompt(self, query: str, contexts: List[Dict]) -> str:
+    @staticmethod
+    def _format_history(history: Optional[str]) -> str:
+        return f"\n        CONVERSATION SO FAR:\n{history}\n" if history else ""
+
+    def _format_rag_prompt(self, query: str, contexts: List[Dict], history: Optional[str] = None) -> str:
         """
         Format the prompt for RAG-based response generation.
         """
@@ -234,7 +249,7 @@ class MentalHealthRAG:
     # Create the prompt
         prompt = f"""You are a compassionate mental health assistant from Group-33 (B.Tech CSE Cloud Computing & Automation). Provide supportive, evidence-based help.
         KNOWLEDGE SOURCES: {context_str}
-
+{self._format_history(history)}
         USER QUERY: {query}
 
         GUIDELINES:
@@ -250,14 +265,14 @@ class MentalHealthRAG:
 
         return prompt
 
-    def _format_general_prompt(self, query: str) -> str:
+    def _format_general_prompt(self, query: str, history: Optional[str] = None) -> str:
         """
         Format the prompt for general knowledge queries.
         """
         prompt = f"""You are a mental health-focused AI assistant developed by Group-33 (B.Tech CSE Cloud Computing & Automation). 
 
         While I specialize in mental health support, I can provide brief answers to general questions.
-
+{self._format_history(history)}
         USER QUERY: {query}
 
         Please provide a single, concise response (1-2 sentences maximum) and mention that you are primarily a mental health assistant if the query is outside that scope and who developed you.
@@ -266,9 +281,14 @@ class MentalHealthRAG:
         
         return prompt
     
-    def call_groq_api(self, prompt: str, max_tokens: int = 1024) -> str:
+    def call_groq_api(self, prompt: str, max_tokens: int = 1024,
+                      on_token: Optional[Callable[[str], None]] = None) -> str:
         """
         Call the Groq API with the given prompt.
+        
+        When `on_token` is given the completion is streamed (server-sent events)
+        and `on_token` is called with each text delta as it arrives; the full
+        text is still returned at the end.
         """
         try:
             url = "https://api.groq.com/openai/v1/chat/completions"
@@ -293,14 +313,28 @@ class MentalHealthRAG:
                 "temperature": 0.7,
                 "max_tokens": max_tokens,
                 "top_p": 1,
-                "stream": False
+                "stream": on_token is not None
             }
             
-            response = requests.post(url, headers=headers, json=data, timeout=30)
+            response = requests.post(url, headers=headers, json=data, timeout=30, stream=on_token is not None)
             response.raise_for_status()
             
-            result = response.json()
-            return result['choices'][0]['message']['content']
+            if on_token is None:
+                result = response.json()
+                return result['choices'][0]['message']['content']
+            
+            parts = []
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data: "):
+                    continue
+                payload = line[len("data: "):]
+                if payload == "[DONE]":
+                    break
+                delta = json.loads(payload)['choices'][0]['delta'].get('content')
+                if delta:
+                    parts.append(delta)
+                    on_token(delta)
+            return "".join(parts)
             
         except requests.exceptions.Timeout:
             return "I'm sorry, the request timed out. Please try again."
@@ -309,15 +343,27 @@ class MentalHealthRAG:
         except Exception as e:
             return f"I'm sorry, an unexpected error occurred: {str(e)}"
     
-    def generate_response(self, query: str, use_rag: bool = True) -> Dict[str, str]:
+    def generate_response(self, query: str, use_rag: bool = True, is_mental_health: Optional[bool] = None,
+                          contexts: Optional[List[Dict]] = None,
+                          on_token: Optional[Callable[[str], None]] = None,
+                          history: Optional[str] = None) -> Dict[str, str]:
         """
         Generate a response to the user query, using RAG for mental health queries
         and direct API calls for general knowledge queries.
+        
+        `is_mental_health` and `contexts` may be passed in when the caller has
+        already classified the query or retrieved its context; those steps are
+        then skipped. With `on_token` the LLM output is streamed to it as it is
+        generated (see `call_groq_api`). `history` is the rendered conversation
+        so far (see conversation_memory.py); classification and retrieval only
+        look at the query itself. The estimated prompt size is returned as
+        `prompt_tokens`.
         """
         start_time = time.time()
         
         # Determine if this is a mental health query
-        is_mental_health = self._is_mental_health_query(query)
+        if is_mental_health is None:
+            is_mental_health = self._is_mental_health_query(query)
         
         response_data = {
             "query": query,
@@ -325,30 +371,30 @@ class MentalHealthRAG:
             "response": "",
             "contexts": [],
             "response_time": 0,
+            "prompt_tokens": 0,
             "method": "rag" if (is_mental_health and use_rag) else "direct"
         }
         
         try:
             if is_mental_health and use_rag:
                 # Mental health query with RAG
-                contexts = self.retrieve_relevant_context(query)
+                if contexts is None:
+                    contexts = self.retrieve_relevant_context(query)
                 response_data["contexts"] = contexts
                 
                 if contexts:
-                    prompt = self._format_rag_prompt(query, contexts)
-                    response = self.call_groq_api(prompt)
+                    prompt = self._format_rag_prompt(query, contexts, history)
                 else:
                     # Fallback if no contexts found
-                    prompt = self._format_general_prompt(query)
-                    response = self.call_groq_api(prompt)
+                    prompt = self._format_general_prompt(query, history)
                     response_data["method"] = "direct_fallback"
                 
             else:
                 # General knowledge query or RAG disabled
-                prompt = self._format_general_prompt(query)
-                response = self.call_groq_api(prompt)
+                prompt = self._format_general_prompt(query, history)
             
-            response_data["response"] = response
+            response_data["prompt_tokens"] = estimate_tokens(prompt)
+            response_data["response"] = self.call_groq_api(prompt, on_token=on_token)
             
         except Exception as e:
             response_data["response"] = f"I'm sorry, I encountered an error while processing your request: {str(e)}"
@@ -364,18 +410,23 @@ class MentalHealthRAG:
         """
         return self.retrieve_relevant_context(query, n_results)
     
+    def refresh_document_count(self) -> int:
+        """
+        Re-read the document count from the collection, picking up documents
+        added by other processes (e.g. populate.py). Blocking.
+        """
+        if self.collection is not None:
+            self.document_count = self.collection.count()
+        return self.document_count
+    
     def get_collection_stats(self) -> Dict:
         """
         Get statistics about the knowledge base collection.
         """
-        try:
-            count = self.collection.count()
-            return {
-                "document_count": count,
-                "database_path": self.chroma_db_path
-            }
-        except:
-            return {"error": "Unable to get collection statistics"}
+        return {
+            "document_count": self.document_count,
+            "database_path": self.chroma_db_path
+        }
 
 
 # Example usage and initialization
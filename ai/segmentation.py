@@ -0,0 +1,102 @@
+# segmentation.py
+"""
+Sentence segmentation used by the translation memory and streaming speech.
+
+`split_sentences` returns (sentence, separator) pairs so the original text can be
+reassembled exactly - including line breaks, list bullets and paragraph gaps -
+after each sentence has been translated on its own. `SentenceBuffer` applies
+the same rules to text that arrives in pieces (streamed LLM tokens).
+"""
+import re
+from typing import List, Tuple
+
+# Sentence terminators: Latin, Devanagari danda, CJK full-width marks
+_BOUNDARY = re.compile(r"([.!?।॥。！？]+[\"')\]]*)(\s+)|(\s*\n\s*)")
+
+# Tokens ending in a period that do not end a sentence
+ABBREVIATIONS = frozenset({
+    "dr", "mr", "mrs", "ms", "prof", "sr", "jr", "st", "vs", "etc", "e.g", "i.e",
+    "approx", "dept", "fig",
+})
+
+
+def _is_abbreviation(sentence: str) -> bool:
+    """True when the period ending `sentence` belongs to an abbreviation or a list marker"""
+    tokens = sentence.rstrip(".").split()
+    if not tokens:
+        return False
+    token = tokens[-1].lower().lstrip("(\"'")
+    if token in ABBREVIATIONS:
+        return True
+    # "1." / "a." opening a list item
+    return len(tokens) == 1 and (token.isdigit() or (len(token) == 1 and token.isalpha()))
+
+
+def split_sentences(text: str) -> List[Tuple[str, str]]:
+    """
+    Split text into (sentence, separator) pairs.
+
+    Joining `sentence + separator` over all pairs reproduces the input. Empty
+    sentences are never produced; leading whitespace is kept as the separator of
+    an empty first pair only when the text starts with whitespace.
+    """
+    segments: List[Tuple[str, str]] = []
+    start = 0
+    leading = len(text) - len(text.lstrip())
+    if leading:
+        segments.append(("", text[:leading]))
+        start = leading
+
+    for match in _BOUNDARY.finditer(text, start):
+        if match.group(1):
+            terminator_end = match.end(1)
+            if match.group(1) == "." and _is_abbreviation(text[start:terminator_end]):
+                continue
+            sentence, separator = text[start:terminator_end], match.group(2)
+        else:
+            sentence, separator = text[start:match.start()], match.group(3)
+        if not sentence:
+            # Consecutive separators: fold into the previous separator
+            if segments:
+                previous, previous_separator = segments[-1]
+                segments[-1] = (previous, previous_separator + separator)
+            else:
+                segments.append(("", separator))
+        else:
+            segments.append((sentence, separator))
+        start = match.end()
+
+    if start < len(text):
+        segments.append((text[start:], ""))
+    return segments
+
+
+def join_sentences(segments: List[Tuple[str, str]]) -> str:
+    """Inverse of `split_sentences`"""
+    return "".join(sentence + separator for sentence, separator in segments)
+
+
+class SentenceBuffer:
+    """Accumulates streamed text and releases each sentence once it is complete"""
+
+    def __init__(self):
+        self._pending = ""
+
+    def feed(self, text: str) -> List[str]:
+        """
+        Add a chunk and return the sentences it completed. A sentence counts as
+        complete once the whitespace after its terminator has arrived, so
+        "Dr." or "3.5" split across chunks is never cut early.
+        """
+        self._pending += text
+        segments = split_sentences(self._pending)
+        if segments and not segments[-1][1]:
+            segments = segments[:-1]  # Still being written
+        consumed = sum(len(sentence) + len(separator) for sentence, separator in segments)
+        self._pending = self._pending[consumed:]
+        return [sentence for sentence, _ in segments if sentence.strip()]
+
+    def flush(self) -> List[str]:
+        """Return whatever is left once the stream has ended"""
+        remainder, self._pending = self._pending.strip(), ""
+        return [remainder] if remainder else []
@@ -1,5 +1,5 @@
-from fastapi import FastAPI, HTTPException, Request, status, UploadFile, File, Form
-from fastapi.responses import JSONResponse, HTMLResponse, StreamingResponse, FileResponse
+from fastapi import FastAPI, HTTPException, Request, status, UploadFile, File, Form, Query
+from fastapi.responses import JSONResponse, HTMLResponse, StreamingResponse, FileResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
@@ -22,6 +22,11 @@ import re
 from datetime import datetime
 from rag import MentalHealthRAG
 from deep_translator import GoogleTranslator
+import language_detection
+from languages import LANGUAGES
+from conversation_memory import RECENT_TURNS, TOKEN_BUDGET, load_memory, save_memory
+from session_journal import SessionJournal
+from sessions import SessionStore, SESSION_TTL, MAX_SESSIONS, MAX_MESSAGES_PER_SESSION, MAX_PAGE_SIZE, parse_since
 
 # Configure structured logging
 logging.basicConfig(
@@ -48,6 +53,7 @@ class ChatResponse(BaseModel):
     timestamp: str = Field(..., description="Response timestamp")
     detected_language: Optional[str] = Field(None, description="Detected language of input")
     target_language: Optional[str] = Field(None, description="Target language of response")
+    prompt_tokens: Optional[int] = Field(None, description="Estimated LLM prompt tokens for this turn")
 
 class VoiceChatResponse(ChatResponse):
     audio_url: Optional[str] = Field(None, description="URL to generated audio file")
@@ -58,6 +64,8 @@ class SessionInfo(BaseModel):
     created_at: str = Field(..., description="Session creation timestamp")
     message_count: int = Field(..., description="Number of messages in session")
     language: str = Field(..., description="Session language")
+    last_active: Optional[str] = Field(None, description="Timestamp of the latest message")
+    messages: Optional[List[Dict]] = Field(None, description="Messages (only with fields=messages)")
 
 class HealthCheck(BaseModel):
     status: str = Field(..., description="Server status")
@@ -325,8 +333,22 @@ class MentalHealthServer:
             raise ValueError("GROQ_API_KEY environment variable is required")
         
         self.rag_system = None
-        self.sessions = {}  # Store conversation sessions
-        self.supported_languages = GoogleTranslator().get_supported_languages(as_dict=True)
+        self.sessions = SessionStore(  # Conversation sessions, bounded by idle TTL, count and length
+            max_sessions=int(os.getenv("SESSION_MAX", MAX_SESSIONS)),
+            ttl=int(os.getenv("SESSION_TTL", SESSION_TTL)),
+            max_messages=int(os.getenv("SESSION_MAX_MESSAGES", MAX_MESSAGES_PER_SESSION))
+        )
+        # Sessions survive restarts through a write-behind journal; SESSION_JOURNAL_DIR="" disables it
+        self.session_journal_dir = os.getenv("SESSION_JOURNAL_DIR", "session_journal")
+        self.session_journal = None
+        self.started_at = datetime.now().isoformat()
+        self.stats_refresh_interval = float(os.getenv("STATS_REFRESH_INTERVAL", 10))
+        self.stats_snapshot = None  # /stats payload, rebuilt every stats_refresh_interval seconds
+        self.stats_task = None
+        # History sent to the LLM: recent turns verbatim, older ones summarized, within a token budget
+        self.conversation_turns = int(os.getenv("CONVERSATION_RECENT_TURNS", RECENT_TURNS))
+        self.conversation_budget = int(os.getenv("CONVERSATION_TOKEN_BUDGET", TOKEN_BUDGET))
+        self.supported_languages = LANGUAGES.by_name
         self.audio_files = {}  # Store generated audio files
         self.mood_analyzer = MoodAnalysis(self.rag_system)
         
@@ -404,24 +426,7 @@ class MentalHealthServer:
 
     def detect_language(self, text: str) -> str:
         """Detect the language of the input text"""
-        try:
-            if not text.strip():
-                return "en"
-            
-            if any(char in text for char in ['।', '़', '्']):
-                return "hi"
-            elif any(char in text for char in ['ñ', 'á', 'é', 'í', 'ó', 'ú', '¿', '¡']):
-                return "es"
-            elif any(char in text for char in ['ä', 'ö', 'ü', 'ß']):
-                return "de"
-            elif any(char in text for char in ['à', 'è', 'ì', 'ò', 'ù', 'â', 'ê', 'î', 'ô', 'û']):
-                return "fr"
-            elif any(char in text for char in ['à', 'è', 'é', 'ì', 'ò', 'ù']):
-                return "it"
-            
-            return "en"
-        except Exception:
-            return "en"
+        return language_detection.detect_language(text)
 
     def translate_text(self, text: str, target_lang: str = "en", source_lang: str = "auto") -> str:
         """Translate text to target language"""
@@ -546,6 +551,36 @@ class MentalHealthServer:
             logger.error(f"Speech-to-text failed: {e}")
             raise HTTPException(status_code=500, detail=f"Speech recognition error: {e}")
 
+    async def collect_stats(self) -> Dict:
+        """Build the /stats payload; the document count is re-read from the vector store"""
+        session_stats = await self.sessions.stats()
+        stats = {
+            "total_sessions": session_stats["sessions"],
+            "total_messages": session_stats["messages_added"],
+            "session_store": session_stats,
+            "active_since": self.started_at,
+            "rag_system_status": "connected" if self.rag_system else "disconnected",
+            "supported_languages": len(self.supported_languages),
+            "multilingual_enabled": True
+        }
+        
+        if self.rag_system:
+            await asyncio.to_thread(self.rag_system.refresh_document_count)
+            stats["knowledge_base"] = self.rag_system.get_collection_stats()
+        
+        stats["generated_at"] = time.time()
+        return stats
+
+    async def run_stats_refresher(self):
+        """Rebuild the /stats snapshot every stats_refresh_interval seconds"""
+        while True:
+            try:
+                self.stats_snapshot = await self.collect_stats()
+            except Exception as e:
+                logger.warning(f"Stats refresh failed: {e}")
+            
+            await asyncio.sleep(self.stats_refresh_interval)
+
     def setup_routes(self):
         """Setup API routes including voice endpoints"""
         
@@ -554,6 +589,18 @@ class MentalHealthServer:
             """Initialize services on startup"""
             try:
                 logger.info("Starting server initialization...")
+                LANGUAGES.refresh_in_background()
+                if self.session_journal_dir:
+                    self.session_journal = SessionJournal(
+                        self.session_journal_dir,
+                        flush_interval=float(os.getenv("SESSION_JOURNAL_FLUSH_INTERVAL", 1.0)),
+                        snapshot_interval=float(os.getenv("SESSION_SNAPSHOT_INTERVAL", 300)),
+                        fsync=os.getenv("SESSION_JOURNAL_FSYNC", "false").lower() == "true"
+                    )
+                    recovery = await asyncio.to_thread(self.session_journal.recover, self.sessions)
+                    logger.info(f"Recovered {recovery['sessions']} sessions and "
+                                f"{recovery['events_replayed']} events in {recovery['seconds']:.3f}s")
+                    self.session_journal.start(self.sessions)
                 self.rag_system = MentalHealthRAG(groq_api_key=self.groq_api_key)
                 
                 # Enhanced sample data
@@ -580,11 +627,20 @@ class MentalHealthServer:
                 
                 self.rag_system.add_knowledge_documents(sample_documents)
                 logger.info("Knowledge base initialized with sample data")
+                self.stats_task = asyncio.create_task(self.run_stats_refresher())
                 
             except Exception as e:
                 logger.error(f"Failed to initialize RAG system: {str(e)}")
                 raise
 
+        @self.app.on_event("shutdown")
+        async def shutdown_event():
+            """Stop the stats refresher and write a final session snapshot"""
+            if self.stats_task:
+                self.stats_task.cancel()
+            if self.session_journal:
+                await self.session_journal.close(self.sessions)
+
         @self.app.get("/", response_class=HTMLResponse)
         async def root(request: Request):
             """Root endpoint with basic information"""
@@ -680,13 +736,9 @@ class MentalHealthServer:
                 session_id = chat_message.session_id or str(uuid.uuid4())
                 target_language = chat_message.language or "en"
                 
-                if session_id not in self.sessions:
-                    self.sessions[session_id] = {
-                        "created_at": datetime.now().isoformat(),
-                        "messages": [],
-                        "language": target_language
-                    }
+                if await self.sessions.ensure(session_id, target_language):
                     logger.info(f"Created new session: {session_id} with language: {target_language}")
+                memory = await load_memory(self.sessions, session_id, self.conversation_turns, self.conversation_budget)
                 
                 detected_language = self.detect_language(chat_message.message)
                 english_input = chat_message.message
@@ -695,16 +747,19 @@ class MentalHealthServer:
                     english_input = self.translate_text(chat_message.message, "en", detected_language)
                     logger.info(f"Translated from {detected_language} to English for processing")
                 
-                self.sessions[session_id]["messages"].append({
+                history = memory.render()
+                user_message = {
                     "role": "user",
                     "message": chat_message.message,
-                    "timestamp": datetime.now().isoformat(),
+                    "timestamp": time.time(),
                     "language": detected_language
-                })
+                }
+                await self.sessions.append(session_id, [user_message], language=target_language)
                 
                 logger.info(f"Processing message in session {session_id}: {chat_message.message[:50]}...")
                 
-                response_data = self.rag_system.generate_response(english_input)
+                response_data = self.rag_system.generate_response(english_input, history=history)
+                logger.info(f"Prompt for session {session_id}: {response_data.get('prompt_tokens', 0)} tokens")
                 
                 english_response = response_data["response"]
                 final_response = english_response
@@ -713,12 +768,16 @@ class MentalHealthServer:
                     final_response = self.translate_text(english_response, target_language, "en")
                     logger.info(f"Translated response to {target_language}")
                 
-                self.sessions[session_id]["messages"].append({
+                assistant_message = {
                     "role": "assistant",
                     "message": final_response,
-                    "timestamp": datetime.now().isoformat(),
+                    "timestamp": time.time(),
                     "language": target_language
-                })
+                }
+                await self.sessions.append(session_id, [assistant_message], language=target_language)
+                for stored in (user_message, assistant_message):
+                    memory.add(stored["role"], stored["message"], datetime.fromtimestamp(stored["timestamp"]).isoformat())
+                await save_memory(self.sessions, session_id, memory)
                 
                 response_time = time.time() - start_time
                 
@@ -731,7 +790,8 @@ class MentalHealthServer:
                     response_time=response_time,
                     timestamp=datetime.now().isoformat(),
                     detected_language=detected_language,
-                    target_language=target_language
+                    target_language=target_language,
+                    prompt_tokens=response_data.get("prompt_tokens")
                 )
                 
             except Exception as e:
@@ -903,7 +963,7 @@ class MentalHealthServer:
                 start_time = time.time()
                 
                 # Validate target language
-                if translation_request.target_lang not in self.supported_languages.values():
+                if not LANGUAGES.is_supported(translation_request.target_lang):
                     raise HTTPException(
                         status_code=400,
                         detail=f"Unsupported target language: {translation_request.target_lang}"
@@ -915,7 +975,7 @@ class MentalHealthServer:
                     source_lang = self.detect_language(translation_request.text)
                 
                 # Validate source language if specified
-                if source_lang != "auto" and source_lang not in self.supported_languages.values():
+                if source_lang != "auto" and not LANGUAGES.is_supported(source_lang):
                     raise HTTPException(
                         status_code=400,
                         detail=f"Unsupported source language: {source_lang}"
@@ -948,22 +1008,37 @@ class MentalHealthServer:
                     detail=f"Error translating text: {str(e)}"
                 )
 
-        @self.app.get("/sessions", response_model=List[SessionInfo], tags=["Sessions"])
-        async def list_sessions():
-            """List all active conversation sessions"""
+        @self.app.get("/sessions", response_model=List[SessionInfo], response_model_exclude_none=True, tags=["Sessions"])
+        async def list_sessions(response: Response, cursor: Optional[str] = None, limit: int = 100,
+                                fields: str = "metadata", last: Optional[int] = Query(None, ge=1),
+                                since: Optional[str] = None):
+            """
+            List active conversation sessions in creation order, a page at a time.
+            Pass the X-Next-Cursor response header back as `cursor` for the next page.
+            fields=messages adds each session's messages (limited by `last` / `since`).
+            """
             try:
-                sessions_info = []
-                for session_id, session_data in self.sessions.items():
-                    sessions_info.append(SessionInfo(
-                        session_id=session_id,
-                        created_at=session_data["created_at"],
-                        message_count=len(session_data["messages"]),
-                        language=session_data.get("language", "en")
-                    ))
+                if fields not in ("metadata", "messages"):
+                    raise HTTPException(status_code=400, detail="fields must be 'metadata' or 'messages'")
+                if not 1 <= limit <= MAX_PAGE_SIZE:
+                    raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_PAGE_SIZE}")
+                try:
+                    sessions, next_cursor = await self.sessions.page(
+                        cursor, limit, messages=fields == "messages", last=last,
+                        since=parse_since(since) if since else None
+                    )
+                except ValueError as e:
+                    raise HTTPException(status_code=400, detail=str(e))
+                
+                if next_cursor:
+                    response.headers["X-Next-Cursor"] = next_cursor
+                sessions_info = [SessionInfo(**session) for session in sessions]
                 
                 logger.info(f"Listed {len(sessions_info)} active sessions")
                 return sessions_info
                 
+            except HTTPException:
+                raise
             except Exception as e:
                 logger.error(f"Error listing sessions: {str(e)}")
                 raise HTTPException(
@@ -991,10 +1066,23 @@ class MentalHealthServer:
                 )
 
         @self.app.get("/sessions/{session_id}", response_model=Dict, tags=["Sessions"])
-        async def get_session(session_id: str):
-            """Get detailed information about a specific session"""
+        async def get_session(session_id: str, fields: str = "messages", last: Optional[int] = Query(None, ge=1),
+                              since: Optional[str] = None):
+            """
+            Get a session: metadata plus messages, or metadata only with fields=metadata.
+            `last` returns only the last N messages, `since` (epoch seconds or ISO 8601) only newer ones.
+            """
             try:
-                if session_id not in self.sessions:
+                if fields not in ("metadata", "messages"):
+                    raise HTTPException(status_code=400, detail="fields must be 'metadata' or 'messages'")
+                try:
+                    since_timestamp = parse_since(since) if since else None
+                except ValueError as e:
+                    raise HTTPException(status_code=400, detail=str(e))
+                session = await self.sessions.get(
+                    session_id, messages=fields == "messages", last=last, since=since_timestamp
+                )
+                if session is None:
                     logger.warning(f"Session not found: {session_id}")
                     raise HTTPException(
                         status_code=404,
@@ -1002,10 +1090,7 @@ class MentalHealthServer:
                     )
                 
                 logger.info(f"Retrieved session: {session_id}")
-                return {
-                    "session_id": session_id,
-                    **self.sessions[session_id]
-                }
+                return session
                 
             except HTTPException:
                 raise
@@ -1020,14 +1105,13 @@ class MentalHealthServer:
         async def delete_session(session_id: str):
             """Delete a specific conversation session"""
             try:
-                if session_id not in self.sessions:
+                if not await self.sessions.delete(session_id):
                     logger.warning(f"Session not found for deletion: {session_id}")
                     raise HTTPException(
                         status_code=404,
                         detail=f"Session {session_id} not found"
                     )
                 
-                del self.sessions[session_id]
                 logger.info(f"Deleted session: {session_id}")
                 
                 return {"message": f"Session {session_id} deleted successfully"}
@@ -1043,22 +1127,16 @@ class MentalHealthServer:
 
         @self.app.get("/stats", tags=["Monitoring"])
         async def get_stats():
-            """Get server statistics and usage metrics"""
+            """
+            Get server statistics and usage metrics. Served from a snapshot
+            refreshed every STATS_REFRESH_INTERVAL seconds, so frequent polling
+            costs nothing; `snapshot_age_seconds` says how old it is.
+            """
             try:
-                stats = {
-                    "total_sessions": len(self.sessions),
-                    "total_messages": sum(len(session["messages"]) for session in self.sessions.values()),
-                    "active_since": datetime.now().isoformat(),
-                    "rag_system_status": "connected" if self.rag_system else "disconnected",
-                    "supported_languages": len(self.supported_languages),
-                    "multilingual_enabled": True
-                }
-                
-                if self.rag_system:
-                    kb_stats = self.rag_system.get_collection_stats()
-                    stats["knowledge_base"] = kb_stats
-                
-                logger.info("Retrieved server statistics")
+                if self.stats_snapshot is None:
+                    self.stats_snapshot = await self.collect_stats()
+                stats = dict(self.stats_snapshot)
+                stats["snapshot_age_seconds"] = round(time.time() - stats.pop("generated_at"), 3)
                 return stats
                 
             except Exception as e:
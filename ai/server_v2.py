@@ -1,10 +1,10 @@
-from fastapi import FastAPI, HTTPException, Request, status, UploadFile, File, Form
-from fastapi.responses import JSONResponse, HTMLResponse, StreamingResponse, FileResponse
+from fastapi import FastAPI, HTTPException, Request, status, UploadFile, File, Form, Query
+from fastapi.responses import JSONResponse, HTMLResponse, StreamingResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel, Field
-from typing import List, Dict, Optional, Union
+from typing import List, Dict, Optional, Tuple, Union
 import logging
 import sys
 import time
@@ -15,15 +15,32 @@ import uvicorn
 import os
 import io
 import base64
-import tempfile
 import aiofiles
 import asyncio
 import re
+import hashlib
 from datetime import datetime
 from rag import MentalHealthRAG
-from deep_translator import GoogleTranslator
+import language_detection
+from languages import LANGUAGES
 import redis.asyncio as redis  # Add Redis import
 import pickle  # For serialization
+from metrics import MetricsRegistry, ExpiringCount, PROMETHEUS_CONTENT_TYPE
+from translation import TranslatorPool, TranslationMemory, TranslationFailed
+from segmentation import split_sentences, join_sentences, SentenceBuffer
+from pipeline import StageGraph
+from audio_store import AudioStore, AUDIO_CACHE_DIR, audio_digest, concatenate_audio, media_type
+from file_responses import file_response
+from tts_jobs import TTSJobQueue, QueueFull, DONE
+from transcription import Transcriber, UploadTooLarge, read_limited, audio_seconds
+from transcode import Transcoder, TranscodeError, FORMATS, negotiate
+from sessions import SessionStore, RedisSessionStore, MAX_PAGE_SIZE, parse_since
+from session_journal import SessionJournal
+from conversation_memory import ConversationMemory, estimate_tokens, load_memory, save_memory
+from voice_engines import (
+    EngineSelector, build_tts_engines, build_stt_engines, engine_names,
+    DEFAULT_TTS_ENGINES, DEFAULT_STT_ENGINES, TTS_LATENCY_BUDGET, STT_LATENCY_BUDGET
+)
 
 # Configure structured logging
 logging.basicConfig(
@@ -42,6 +59,49 @@ REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
 REDIS_DB = int(os.getenv("REDIS_DB", 0))
 REDIS_PASSWORD = os.getenv("REDIS_PASSWORD", None)
 CACHE_TTL = int(os.getenv("CACHE_TTL", 3600))  # 1 hour default
+TRANSLATION_CACHE_TTL = 86400  # 24 hours for translations
+CHAT_CACHE_TTL = 1800  # 30 minutes for chat responses
+TTS_CACHE_TTL = 3600  # 1 hour for TTS
+AUDIO_CACHE_MAX_BYTES = int(os.getenv("AUDIO_CACHE_MAX_BYTES", 500 * 1024 * 1024))  # Disk quota for audio_cache/
+AUDIO_JANITOR_INTERVAL = int(os.getenv("AUDIO_JANITOR_INTERVAL", 300))  # Seconds between janitor passes
+TTS_MODE = os.getenv("TTS_MODE", "whole")  # "whole" or "phrases" (per-sentence clips, see synthesize_phrases)
+TTS_PHRASE_CONCURRENCY = int(os.getenv("TTS_PHRASE_CONCURRENCY", 4))  # Sentences synthesized at once
+TTS_WORKERS = int(os.getenv("TTS_WORKERS", 2))  # Background synthesis workers for /voice/chat
+TTS_QUEUE_SIZE = int(os.getenv("TTS_QUEUE_SIZE", 100))  # Pending TTS jobs before new ones are rejected
+TTS_JOB_MAX_WAIT = 30.0  # Longest long-poll on /voice/jobs/{job_id}
+STT_MAX_UPLOAD_BYTES = int(os.getenv("STT_MAX_UPLOAD_BYTES", 10 * 1024 * 1024))  # Largest accepted recording
+STT_WORKERS = int(os.getenv("STT_WORKERS", 4))  # Recognition threads shared by all requests
+SESSION_TTL = int(os.getenv("SESSION_TTL", 24 * 3600))  # Seconds of inactivity before a session expires
+SESSION_MAX = int(os.getenv("SESSION_MAX", 10000))  # Least recently active sessions are evicted beyond this
+SESSION_MAX_MESSAGES = int(os.getenv("SESSION_MAX_MESSAGES", 200))  # Messages retained per session
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")  # "redis" shares sessions between workers
+SESSION_JOURNAL_DIR = os.getenv("SESSION_JOURNAL_DIR", "session_journal")  # Persists in-memory sessions; "" disables
+SESSION_JOURNAL_FLUSH_INTERVAL = float(os.getenv("SESSION_JOURNAL_FLUSH_INTERVAL", 1.0))  # Seconds of events at risk on a crash
+SESSION_SNAPSHOT_INTERVAL = float(os.getenv("SESSION_SNAPSHOT_INTERVAL", 300))  # Seconds between compacted snapshots
+SESSION_JOURNAL_FSYNC = os.getenv("SESSION_JOURNAL_FSYNC", "false").lower() == "true"  # fsync every flush
+CONVERSATION_RECENT_TURNS = int(os.getenv("CONVERSATION_RECENT_TURNS", 4))  # Turns sent to the LLM verbatim
+CONVERSATION_TOKEN_BUDGET = int(os.getenv("CONVERSATION_TOKEN_BUDGET", 600))  # Cap on history (summary + recent turns)
+STATS_REFRESH_INTERVAL = float(os.getenv("STATS_REFRESH_INTERVAL", 10))  # Seconds between /stats snapshots
+TTS_ENGINES = engine_names(os.getenv("TTS_ENGINES"), DEFAULT_TTS_ENGINES)  # Preference order, e.g. "gtts,espeak"
+STT_ENGINES = engine_names(os.getenv("STT_ENGINES"), DEFAULT_STT_ENGINES)  # Preference order, e.g. "google,sphinx"
+PROMPT_TOKEN_BUCKETS = (100, 200, 400, 600, 800, 1000, 1500, 2000, 3000)  # Estimated prompt size per turn
+FIRST_AUDIO_BUCKETS = (0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 8.0, 13.0)  # Streaming voice chat latency
+TRANSLATION_CONCURRENCY = int(os.getenv("TRANSLATION_CONCURRENCY", 4))  # Max in-flight translator calls
+TRANSLATION_MEMORY_PATH = os.getenv("TRANSLATION_MEMORY_PATH", "translation_memory.db")  # Sentence-level translation memory
+QUERY_LOG_KEY = "query_log"  # Sorted set of normalized chat queries -> request count
+QUERY_LOG_SIZE = int(os.getenv("QUERY_LOG_SIZE", 1000))  # Most frequent queries kept for cache warm-up
+QUERY_LOG_TTL = int(os.getenv("QUERY_LOG_TTL", 7 * 86400))  # Length of a counting window; the log restarts after it
+QUERY_LOG_MAX_CHARS = 100  # Longer messages are personal and rarely repeat, so they are never logged
+CACHE_NAMESPACES = ("chat", "translation", "tts", "mood_analysis", "supported_languages")
+
+def normalize_query(text: str) -> str:
+    """Normalize a query so trivially different phrasings share one cache entry"""
+    text = re.sub(r"\s+", " ", text.strip().lower())
+    return text.rstrip(" ?!.")
+
+def stable_hash(text: str) -> str:
+    """Process-independent digest for cache keys (built-in hash() is salted per process)"""
+    return hashlib.md5(text.encode("utf-8")).hexdigest()
 
 # Pydantic models (existing models remain the same)
 class ChatMessage(BaseModel):
@@ -57,16 +117,31 @@ class ChatResponse(BaseModel):
     timestamp: str = Field(..., description="Response timestamp")
     detected_language: Optional[str] = Field(None, description="Detected language of input")
     target_language: Optional[str] = Field(None, description="Target language of response")
+    prompt_tokens: Optional[int] = Field(None, description="Estimated LLM prompt tokens for this turn (None when served from cache)")
 
 class VoiceChatResponse(ChatResponse):
     audio_url: Optional[str] = Field(None, description="URL to generated audio file")
     audio_duration: Optional[float] = Field(None, description="Duration of audio in seconds")
+    audio_job_id: Optional[str] = Field(None, description="TTS job to poll at /voice/jobs/{id} while audio is pending")
+    audio_status: Optional[str] = Field(None, description="TTS job status: queued, running, done or failed")
+
+class TTSJobStatus(BaseModel):
+    job_id: str = Field(..., description="TTS job ID (hash of text and language)")
+    status: str = Field(..., description="queued, running, done or failed")
+    audio_url: Optional[str] = Field(None, description="URL to generated audio file once done")
+    error: Optional[str] = Field(None, description="Failure reason")
+    language: str = Field(..., description="Language code for TTS")
+    text_length: int = Field(..., description="Length of input text")
+    queued_seconds: float = Field(..., description="Time spent waiting for a worker")
+    synthesis_seconds: Optional[float] = Field(None, description="Synthesis time once finished")
 
 class SessionInfo(BaseModel):
     session_id: str = Field(..., description="Session ID")
     created_at: str = Field(..., description="Session creation timestamp")
     message_count: int = Field(..., description="Number of messages in session")
     language: str = Field(..., description="Session language")
+    last_active: Optional[str] = Field(None, description="Timestamp of the latest message")
+    messages: Optional[List[Dict]] = Field(None, description="Messages (only with fields=messages)")
 
 class HealthCheck(BaseModel):
     status: str = Field(..., description="Server status")
@@ -100,16 +175,32 @@ class TranslationResponse(BaseModel):
     target_lang: str = Field(..., description="Target language")
     timestamp: str = Field(..., description="Translation timestamp")
 
+class BatchTranslationRequest(BaseModel):
+    texts: List[str] = Field(..., max_length=128, description="Texts to translate")
+    target_lang: str = Field(..., description="Target language code")
+    source_lang: Optional[str] = Field("auto", description="Source language code (default: auto)")
+
+class BatchTranslationResponse(BaseModel):
+    translations: List[str] = Field(..., description="Translated texts, in request order")
+    source_lang: str = Field(..., description="Source language")
+    target_lang: str = Field(..., description="Target language")
+    translation_time: float = Field(..., description="Translation time in seconds")
+    timestamp: str = Field(..., description="Translation timestamp")
+
 class TTSRequest(BaseModel):
     text: str = Field(..., description="Text to convert to speech")
     language: Optional[str] = Field("en", description="Language code for TTS")
     voice_id: Optional[str] = Field(None, description="ElevenLabs voice ID (optional)")
+    mode: Optional[str] = Field(None, description="'whole' or 'phrases' (per-sentence cached clips); default from TTS_MODE")
+    engine: Optional[str] = Field(None, description="TTS engine to try first (elevenlabs, gtts, pyttsx3, espeak)")
+    format: Optional[str] = Field(None, description="Low-bitrate variant to prepare ('opus' or 'aac'); default is the engine's MP3/WAV")
 
 class TTSResponse(BaseModel):
     audio_url: str = Field(..., description="URL to generated audio file")
     duration: float = Field(..., description="Audio duration in seconds")
     text_length: int = Field(..., description="Length of input text")
     timestamp: str = Field(..., description="TTS generation timestamp")
+    phrase_cache_fraction: Optional[float] = Field(None, description="Share of the text served from the phrase cache (phrases mode)")
 
 class VoiceSettings(BaseModel):
     stability: float = Field(0.5, ge=0.0, le=1.0, description="Voice stability")
@@ -135,9 +226,54 @@ class MoodAnalysisResponse(BaseModel):
 class RedisCacheManager:
     """Redis cache manager for handling caching operations"""
     
-    def __init__(self):
+    def __init__(self, metrics: Optional[MetricsRegistry] = None):
         self.redis_client = None
         self.is_connected = False
+        self.metrics = metrics or MetricsRegistry()
+        self.hits = self.metrics.counter(
+            "cache_hits_total", "Cache lookups that returned a value", ["namespace"])
+        self.misses = self.metrics.counter(
+            "cache_misses_total", "Cache lookups that found no value", ["namespace"])
+        self.errors = self.metrics.counter(
+            "cache_errors_total", "Cache operations that raised an error", ["namespace", "operation"])
+        self.bytes_read = self.metrics.counter(
+            "cache_read_bytes_total", "Serialized bytes returned by cache hits", ["namespace"])
+        self.bytes_written = self.metrics.counter(
+            "cache_written_bytes_total", "Serialized bytes written to the cache", ["namespace"])
+        self.latency = self.metrics.histogram(
+            "cache_operation_duration_seconds", "Cache operation latency", ["namespace", "operation"])
+        # Keys this worker wrote that have not expired yet, per namespace (no KEYS scans)
+        self.live_keys = ExpiringCount()
+
+    @staticmethod
+    def namespace(key: str) -> str:
+        """Namespace of a cache key, e.g. 'translation' for 'translation:en:es:<digest>'"""
+        prefix = key.split(":", 1)[0]
+        return prefix if prefix in CACHE_NAMESPACES else "other"
+
+    def namespace_stats(self) -> Dict[str, Dict]:
+        """Per-namespace hit/miss/error counts and mean latencies"""
+        stats = {}
+        for namespace in CACHE_NAMESPACES + ("other",):
+            hits = self.hits.get(namespace=namespace)
+            misses = self.misses.get(namespace=namespace)
+            stats[namespace] = {
+                "hits": int(hits),
+                "misses": int(misses),
+                "errors": int(sum(self.errors.get(namespace=namespace, operation=operation)
+                                  for operation in ("get", "set", "mget", "mset"))),
+                "hit_rate": round(hits / max(1, hits + misses) * 100, 2),
+                "bytes_read": int(self.bytes_read.get(namespace=namespace)),
+                "bytes_written": int(self.bytes_written.get(namespace=namespace)),
+                "mean_get_ms": round(self.latency.summary(namespace=namespace, operation="get")["mean"] * 1000, 3),
+                "mean_set_ms": round(self.latency.summary(namespace=namespace, operation="set")["mean"] * 1000, 3)
+            }
+        return stats
+
+    def key_counts(self) -> Dict[str, int]:
+        """Estimated live keys per namespace, from the writes this worker has made"""
+        counts = self.live_keys.counts()
+        return {namespace: counts.get(namespace, 0) for namespace in CACHE_NAMESPACES + ("other",)}
         
     async def initialize(self):
         """Initialize Redis connection"""
@@ -181,12 +317,19 @@ class RedisCacheManager:
         if not self.is_connected or not self.redis_client:
             return None
             
+        namespace = self.namespace(key)
+        start_time = time.perf_counter()
         try:
             cached_data = await self.redis_client.get(key)
+            self.latency.observe(time.perf_counter() - start_time, namespace=namespace, operation="get")
             if cached_data:
+                self.hits.inc(namespace=namespace)
+                self.bytes_read.inc(len(cached_data), namespace=namespace)
                 return pickle.loads(cached_data)
+            self.misses.inc(namespace=namespace)
             return None
         except Exception as e:
+            self.errors.inc(namespace=namespace, operation="get")
             logger.warning(f"Redis get error for key {key}: {e}")
             return None
             
@@ -195,14 +338,81 @@ class RedisCacheManager:
         if not self.is_connected or not self.redis_client:
             return False
             
+        namespace = self.namespace(key)
+        start_time = time.perf_counter()
         try:
             serialized_value = pickle.dumps(value)
             await self.redis_client.setex(key, ttl, serialized_value)
+            self.latency.observe(time.perf_counter() - start_time, namespace=namespace, operation="set")
+            self.live_keys.add(namespace, ttl)
+            self.bytes_written.inc(len(serialized_value), namespace=namespace)
             return True
         except Exception as e:
+            self.errors.inc(namespace=namespace, operation="set")
             logger.warning(f"Redis set error for key {key}: {e}")
             return False
             
+    async def get_many(self, keys: List[str]) -> List:
+        """Get several values with a single MGET round trip (None for misses)"""
+        if not keys or not self.is_connected or not self.redis_client:
+            return [None] * len(keys)
+
+        namespace = self.namespace(keys[0])
+        start_time = time.perf_counter()
+        try:
+            cached_values = await self.redis_client.mget(keys)
+            self.latency.observe(time.perf_counter() - start_time, namespace=namespace, operation="mget")
+            values = []
+            for key, cached_data in zip(keys, cached_values):
+                key_namespace = self.namespace(key)
+                if cached_data:
+                    self.hits.inc(namespace=key_namespace)
+                    self.bytes_read.inc(len(cached_data), namespace=key_namespace)
+                    values.append(pickle.loads(cached_data))
+                else:
+                    self.misses.inc(namespace=key_namespace)
+                    values.append(None)
+            return values
+        except Exception as e:
+            self.errors.inc(namespace=namespace, operation="mget")
+            logger.warning(f"Redis mget error for {len(keys)} keys: {e}")
+            return [None] * len(keys)
+
+    async def set_many(self, items: Dict[str, object], ttl: int = CACHE_TTL):
+        """Set several values with TTL in one pipelined round trip"""
+        if not items or not self.is_connected or not self.redis_client:
+            return False
+
+        namespace = self.namespace(next(iter(items)))
+        start_time = time.perf_counter()
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for key, value in items.items():
+                    serialized_value = pickle.dumps(value)
+                    pipe.setex(key, ttl, serialized_value)
+                    self.bytes_written.inc(len(serialized_value), namespace=self.namespace(key))
+                await pipe.execute()
+            self.latency.observe(time.perf_counter() - start_time, namespace=namespace, operation="mset")
+            for key in items:
+                self.live_keys.add(self.namespace(key), ttl)
+            return True
+        except Exception as e:
+            self.errors.inc(namespace=namespace, operation="mset")
+            logger.warning(f"Redis pipelined set error for {len(items)} keys: {e}")
+            return False
+
+    async def delete_many(self, keys: List[str]):
+        """Delete several keys in one round trip"""
+        if not keys or not self.is_connected or not self.redis_client:
+            return False
+        
+        try:
+            await self.redis_client.delete(*keys)
+            return True
+        except Exception as e:
+            logger.warning(f"Redis delete error for {len(keys)} keys: {e}")
+            return False
+
     async def delete(self, key: str):
         """Delete key from cache"""
         if not self.is_connected or not self.redis_client:
@@ -216,19 +426,71 @@ class RedisCacheManager:
             return False
             
     async def clear_pattern(self, pattern: str):
-        """Clear keys matching pattern"""
+        """Clear keys matching pattern (SCAN in batches, so Redis is never blocked by KEYS)"""
         if not self.is_connected or not self.redis_client:
             return False
             
         try:
-            keys = await self.redis_client.keys(pattern)
-            if keys:
-                await self.redis_client.delete(*keys)
+            batch = []
+            async for key in self.redis_client.scan_iter(match=pattern, count=1000):
+                batch.append(key)
+                if len(batch) >= 1000:
+                    await self.redis_client.delete(*batch)
+                    batch = []
+            if batch:
+                await self.redis_client.delete(*batch)
+            if pattern == "*":
+                self.live_keys.reset()
+            elif pattern.endswith(":*") and pattern[:-2] in CACHE_NAMESPACES:
+                self.live_keys.reset(pattern[:-2])
             return True
         except Exception as e:
             logger.warning(f"Redis clear pattern error for {pattern}: {e}")
             return False
 
+    async def increment_score(self, key: str, member: str, amount: float = 1,
+                              max_members: int = None, ttl: int = None):
+        """
+        Increment a member's score in a sorted set. With `max_members`, the set
+        is trimmed back to its top `max_members` once it holds twice as many, so
+        new members get room to collect more hits before a trim. With `ttl`,
+        the set expires `ttl` seconds after its first member was added (the
+        expiry is not extended by later increments), so counting restarts in
+        fixed windows.
+        """
+        if not self.is_connected or not self.redis_client:
+            return False
+
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.zincrby(key, amount, member)
+                pipe.zcard(key)
+                pipe.ttl(key)
+                _, members, remaining = await pipe.execute()
+            if (max_members and members > 2 * max_members) or (ttl and remaining == -1):
+                async with self.redis_client.pipeline(transaction=False) as pipe:
+                    if max_members and members > 2 * max_members:
+                        pipe.zremrangebyrank(key, 0, -max_members - 1)
+                    if ttl and remaining == -1:
+                        pipe.expire(key, ttl)
+                    await pipe.execute()
+            return True
+        except Exception as e:
+            logger.warning(f"Redis zincrby error for key {key}: {e}")
+            return False
+
+    async def top_scores(self, key: str, count: int) -> List[tuple]:
+        """Get the highest scoring members of a sorted set as (member, score) pairs"""
+        if not self.is_connected or not self.redis_client:
+            return []
+
+        try:
+            entries = await self.redis_client.zrevrange(key, 0, count - 1, withscores=True)
+            return [(member.decode("utf-8"), score) for member, score in entries]
+        except Exception as e:
+            logger.warning(f"Redis zrevrange error for key {key}: {e}")
+            return []
+
 class MoodAnalysis:
     def __init__(self, rag_system):
         self.rag_system = rag_system
@@ -421,13 +683,64 @@ class MentalHealthServer:
             raise ValueError("GROQ_API_KEY environment variable is required")
         
         self.rag_system = None
-        self.sessions = {}  # Store conversation sessions
-        self.supported_languages = GoogleTranslator().get_supported_languages(as_dict=True)
-        self.audio_files = {}  # Store generated audio files
+        self.metrics = MetricsRegistry()
+        self.sessions = SessionStore(
+            max_sessions=SESSION_MAX, ttl=SESSION_TTL, max_messages=SESSION_MAX_MESSAGES, metrics=self.metrics
+        )
+        self.session_journal = None  # Write-behind persistence for in-memory sessions
+        self.supported_languages = LANGUAGES.by_name
+        self.audio_store = AudioStore(AUDIO_CACHE_DIR)  # Content-addressed synthesized audio
+        self.audio_janitor_task = None
+        self.started_at = datetime.now().isoformat()
+        self.stats_snapshot = None  # /stats payload, rebuilt every STATS_REFRESH_INTERVAL
+        self.stats_task = None
+        self.translator_pool = TranslatorPool()
+        self.translation_semaphore = asyncio.Semaphore(TRANSLATION_CONCURRENCY)
+        self.translation_memory = TranslationMemory(TRANSLATION_MEMORY_PATH)
+        self.translation_segments = self.metrics.counter(
+            "translation_memory_segments_total", "Sentence lookups in the translation memory", ["result"]
+        )
+        self.translator_calls = self.metrics.counter(
+            "translator_calls_total", "Segments sent to the upstream translator"
+        )
         self.mood_analyzer = MoodAnalysis(self.rag_system)
         
         # Initialize Redis cache
-        self.cache_manager = RedisCacheManager()
+        self.cache_manager = RedisCacheManager(self.metrics)
+        self.cache_keys_gauge = self.metrics.gauge(
+            "cache_keys", "Estimated live cache keys written by this worker", ["namespace"]
+        )
+        self.chat_pipeline = self.build_chat_pipeline()
+        self.audio_evictions = self.metrics.counter(
+            "audio_cache_evictions_total", "Audio clips removed by the janitor", ["reason"]
+        )
+        self.audio_cache_bytes = self.metrics.gauge("audio_cache_bytes", "Bytes of audio in audio_cache/")
+        self.audio_cache_files = self.metrics.gauge("audio_cache_files", "Audio clips in audio_cache/")
+        self.audio_responses = self.metrics.counter(
+            "audio_responses_total", "Responses served by /audio by HTTP status", ["status"]
+        )
+        self.audio_response_bytes = self.metrics.counter("audio_response_bytes_total", "Audio body bytes served by /audio")
+        self.tts_engines = EngineSelector(
+            "tts", build_tts_engines(TTS_ENGINES, self.elevenlabs_api_key), TTS_LATENCY_BUDGET, metrics=self.metrics
+        )
+        self.stt_engines = EngineSelector(
+            "stt", build_stt_engines(STT_ENGINES), STT_LATENCY_BUDGET, metrics=self.metrics
+        )
+        self.transcriber = Transcriber(STT_WORKERS, metrics=self.metrics, recognize=self.recognize_segment)
+        self.transcoder = Transcoder(metrics=self.metrics)
+        self.tts_jobs = TTSJobQueue(self.synthesize_speech, TTS_WORKERS, TTS_QUEUE_SIZE, metrics=self.metrics)
+        self.tts_semaphore = asyncio.Semaphore(TTS_PHRASE_CONCURRENCY)
+        self.tts_phrase_characters = self.metrics.counter(
+            "tts_phrase_characters_total", "Characters of phrase-mode speech by where the clip came from", ["source"]
+        )
+        self.prompt_tokens = self.metrics.histogram(
+            "chat_prompt_tokens", "Estimated LLM prompt tokens per chat turn", ["history"],
+            buckets=PROMPT_TOKEN_BUCKETS
+        )
+        self.time_to_first_audio = self.metrics.histogram(
+            "voice_time_to_first_audio_seconds", "Request start to first audio chunk on /voice/chat/stream",
+            ["cache"], buckets=FIRST_AUDIO_BUCKETS
+        )
         
         # Voice capabilities flags
         self.tts_available = False
@@ -443,36 +756,32 @@ class MentalHealthServer:
     async def initialize_redis(self):
         """Initialize Redis connection"""
         await self.cache_manager.initialize()
+        
+        if SESSION_BACKEND == "redis":
+            if self.cache_manager.is_connected:
+                self.sessions = RedisSessionStore(
+                    self.cache_manager.redis_client, max_sessions=SESSION_MAX, ttl=SESSION_TTL,
+                    max_messages=SESSION_MAX_MESSAGES, metrics=self.metrics
+                )
+                logger.info("✅ Sessions stored in Redis (shared by all workers)")
+            else:
+                logger.warning("SESSION_BACKEND=redis but Redis is not connected; sessions stay in process memory")
 
     def initialize_voice_services(self):
         """Initialize voice services with fallback mechanisms"""
         try:
-            # Check ElevenLabs availability
-            if self.elevenlabs_api_key:
-                try:
-                    import elevenlabs
-                    self.elevenlabs_available = True
-                    self.tts_available = True
-                    logger.info("✅ ElevenLabs TTS available")
-                except ImportError:
-                    logger.warning("ElevenLabs library not installed")
+            self.elevenlabs_available = "elevenlabs" in self.tts_engines.engines
+            self.tts_available = bool(self.tts_engines)
+            self.stt_available = bool(self.stt_engines)
             
-            # Check PyAudio fallback
-            try:
-                import pyaudio
-                import speech_recognition as sr
-                self.stt_available = True
-                if not self.tts_available:
-                    try:
-                        from gtts import gTTS
-                        import pygame
-                        self.tts_available = True
-                        logger.info("✅ PyAudio TTS fallback available")
-                    except ImportError:
-                        logger.warning("gTTS/PyGame not available for TTS fallback")
-                logger.info("✅ Speech-to-text available")
-            except ImportError:
-                logger.warning("PyAudio/SpeechRecognition not available")
+            if self.tts_available:
+                logger.info(f"✅ Text-to-speech available: {', '.join(self.tts_engines.engines)}")
+            else:
+                logger.warning(f"No TTS engine available (configured: {', '.join(TTS_ENGINES)})")
+            if self.stt_available:
+                logger.info(f"✅ Speech-to-text available: {', '.join(self.stt_engines.engines)}")
+            else:
+                logger.warning(f"No STT engine available (configured: {', '.join(STT_ENGINES)})")
                 
         except Exception as e:
             logger.error(f"Voice services initialization failed: {e}")
@@ -507,33 +816,265 @@ class MentalHealthServer:
 
     def detect_language(self, text: str) -> str:
         """Detect the language of the input text"""
+        return language_detection.detect_language(text)
+
+    def chat_cache_key(self, normalized_input: str, target_language: str) -> str:
+        """Cache key for a chat response to an already normalized English query"""
+        return f"chat:{stable_hash(normalized_input)}:{target_language}"
+
+    def localized_chat_cache_key(self, normalized_message: str, target_language: str) -> str:
+        """Cache key for the final, localized chat response to a normalized original message"""
+        return f"chat:localized:{stable_hash(normalized_message)}:{target_language}"
+
+    def localized_chat_entry(self, normalized_input: str, response_data: Dict,
+                             final_response: str, detected_language: str) -> Dict:
+        """Localized chat cache value: the final response plus the metadata ChatResponse needs"""
+        return {
+            "query": normalized_input,
+            "response": final_response,
+            "is_mental_health": response_data["is_mental_health"],
+            "detected_language": detected_language,
+            "method": response_data.get("method")
+        }
+
+    def translation_cache_key(self, text: str, source_lang: str, target_lang: str) -> str:
+        """Cache key for the translation of a single string"""
+        return f"translation:{source_lang}:{target_lang}:{stable_hash(text)}"
+
+    async def ensure_session(self, session_id: str, language: str):
+        if await self.sessions.ensure(session_id, language):
+            logger.info(f"Created new session: {session_id} with language: {language}")
+
+    async def load_conversation(self, session_id: str) -> ConversationMemory:
+        """The session's conversation memory: summary of older turns plus the recent ones"""
+        return await load_memory(self.sessions, session_id, CONVERSATION_RECENT_TURNS, CONVERSATION_TOKEN_BUDGET)
+
+    def observe_prompt(self, session_id: str, context: Dict) -> Optional[int]:
+        """Record the prompt size of a generated turn (None when the answer came from the cache)"""
+        if context["localized_lookup"] or context["shared_lookup"]:
+            return None
+        prompt_tokens = context["generate"].get("prompt_tokens", 0)
+        self.prompt_tokens.observe(prompt_tokens, history="yes" if context["history"] else "no")
+        logger.info(f"Prompt for session {session_id}: {prompt_tokens} tokens "
+                    f"({estimate_tokens(context['history'])} of history)")
+        return prompt_tokens
+
+    async def record_exchange(self, session_id: str, message: str, message_language: str,
+                              response: str, response_language: str, memory: Optional[ConversationMemory] = None):
+        """
+        Append a user message and the assistant's reply to the session history,
+        folding turns that leave the recent window into the session's summary
+        """
+        now = time.time()
+        await self.sessions.append(session_id, [
+            {"role": "user", "message": message, "timestamp": now, "language": message_language},
+            {"role": "assistant", "message": response, "timestamp": now, "language": response_language}
+        ], language=response_language)
+        if memory is not None:
+            timestamp = datetime.fromtimestamp(now).isoformat()
+            memory.add("user", message, timestamp)
+            memory.add("assistant", response, timestamp)
+            await save_memory(self.sessions, session_id, memory)
+
+    def build_chat_pipeline(self) -> StageGraph:
+        """
+        Chat request flow as a stage graph. Stages start as soon as their inputs
+        are ready: the localized cache lookup runs alongside language detection,
+        the shared cache lookup alongside classification, and the cache writes
+        and query logging stay off the critical path. Retrieval waits for a
+        shared cache miss, so cache hits never pay for an embedding and a
+        vector query. Every stage
+        short-circuits when an earlier cache hit already answered the request.
+        
+        When the context carries an `on_sentence` coroutine function, generation
+        is streamed and each English sentence is passed to it as soon as the LLM
+        has finished writing it.
+        
+        `history` is the rendered conversation so far. An answer that depends on
+        it must not be shared, so with history both caches are bypassed.
+        """
+        graph = StageGraph("chat", self.metrics)
+
+        async def localized_lookup(ctx):
+            ctx["localized_key"] = self.localized_chat_cache_key(
+                normalize_query(ctx["message"]), ctx["target_language"]
+            )
+            if ctx["history"]:
+                return None
+            return await self.cache_manager.get(ctx["localized_key"])
+
+        async def detect(ctx):
+            return self.detect_language(ctx["message"])
+
+        async def english_input(ctx):
+            # Translating only after a localized miss keeps cached requests free of upstream calls
+            if ctx["localized_lookup"] or ctx["detect"] == "en":
+                return ctx["message"]
+            return await self.translate_text(ctx["message"], "en", ctx["detect"])
+
+        async def log_query(ctx):
+            entry = ctx["localized_lookup"]
+            query = entry["query"] if entry else normalize_query(ctx["english_input"])
+            if len(query) <= QUERY_LOG_MAX_CHARS:
+                await self.cache_manager.increment_score(
+                    QUERY_LOG_KEY, query, max_members=QUERY_LOG_SIZE, ttl=QUERY_LOG_TTL
+                )
+
+        async def shared_lookup(ctx):
+            if ctx["localized_lookup"]:
+                return None
+            ctx["normalized_input"] = normalize_query(ctx["english_input"])
+            ctx["shared_key"] = self.chat_cache_key(ctx["normalized_input"], "en")
+            if ctx["history"]:
+                return None
+            return await self.cache_manager.get(ctx["shared_key"])
+
+        async def classify(ctx):
+            if ctx["localized_lookup"]:
+                return None
+            return self.rag_system.classify_query(ctx["english_input"])
+
+        async def retrieve(ctx):
+            if ctx["shared_lookup"] or not ctx["classify"]:
+                return []
+            return await asyncio.to_thread(self.rag_system.retrieve_relevant_context, ctx["english_input"])
+
+        async def generate(ctx):
+            if ctx["localized_lookup"] or ctx["shared_lookup"]:
+                return ctx["shared_lookup"]
+            if ctx.get("on_sentence"):
+                return await self._generate_streaming(
+                    ctx["english_input"], ctx["classify"], ctx["retrieve"], ctx["on_sentence"], ctx["history"]
+                )
+            return await asyncio.to_thread(
+                self.rag_system.generate_response, ctx["english_input"], True, ctx["classify"], ctx["retrieve"],
+                None, ctx["history"]
+            )
+
+        async def store_shared(ctx):
+            if ctx["localized_lookup"] or ctx["shared_lookup"] or ctx["history"]:
+                return
+            await self.cache_manager.set(ctx["shared_key"], ctx["generate"], ttl=CHAT_CACHE_TTL)
+
+        async def localize(ctx):
+            if ctx["localized_lookup"]:
+                return ctx["localized_lookup"]
+            response_data = ctx["generate"]
+            final_response = response_data["response"]
+            cacheable = not ctx["history"]
+            if ctx["target_language"] != "en":
+                try:
+                    final_response = await self.translate_text(
+                        final_response, ctx["target_language"], "en", fallback=False
+                    )
+                except TranslationFailed as e:
+                    # Serve English to this request only; never cache it as the localized answer
+                    logger.warning(f"Localizing response to {ctx['target_language']} failed: {e}")
+                    cacheable = False
+            entry = self.localized_chat_entry(ctx["normalized_input"], response_data, final_response, ctx["detect"])
+            if cacheable:
+                await self.cache_manager.set(ctx["localized_key"], entry, ttl=CHAT_CACHE_TTL)
+            return entry
+
+        graph.add("localized_lookup", localized_lookup)
+        graph.add("detect", detect)
+        graph.add("english_input", english_input, after=("localized_lookup", "detect"))
+        graph.add("log_query", log_query, after=("english_input",))
+        graph.add("shared_lookup", shared_lookup, after=("english_input",))
+        graph.add("classify", classify, after=("english_input",))
+        graph.add("retrieve", retrieve, after=("classify", "shared_lookup"))
+        graph.add("generate", generate, after=("shared_lookup", "retrieve"))
+        graph.add("store_shared", store_shared, after=("generate",))
+        graph.add("localize", localize, after=("generate",))
+        return graph
+
+    async def _generate_streaming(self, query: str, is_mental_health: bool, contexts: List[Dict], on_sentence,
+                                  history: Optional[str] = None) -> Dict:
+        """
+        Run generation in a worker thread with token streaming and await
+        `on_sentence(sentence)` for every sentence as soon as it is complete.
+        Returns the usual response dict once generation has finished.
+        """
+        loop = asyncio.get_running_loop()
+        tokens: asyncio.Queue = asyncio.Queue()
+        
+        def on_token(token: str):
+            loop.call_soon_threadsafe(tokens.put_nowait, token)
+        
+        async def produce():
+            try:
+                return await asyncio.to_thread(
+                    self.rag_system.generate_response, query, True, is_mental_health, contexts, on_token, history
+                )
+            finally:
+                loop.call_soon_threadsafe(tokens.put_nowait, None)
+        
+        producer = asyncio.create_task(produce())
+        buffer = SentenceBuffer()
+        streamed = False
         try:
-            if not text.strip():
-                return "en"
-            
-            if any(char in text for char in ['।', '़', '्']):
-                return "hi"
-            elif any(char in text for char in ['ñ', 'á', 'é', 'í', 'ó', 'ú', '¿', '¡']):
-                return "es"
-            elif any(char in text for char in ['ä', 'ö', 'ü', 'ß']):
-                return "de"
-            elif any(char in text for char in ['à', 'è', 'ì', 'ò', 'ù', 'â', 'ê', 'î', 'ô', 'û']):
-                return "fr"
-            elif any(char in text for char in ['à', 'è', 'é', 'ì', 'ò', 'ù']):
-                return "it"
-            
-            return "en"
-        except Exception:
-            return "en"
+            while (token := await tokens.get()) is not None:
+                streamed = True
+                for sentence in buffer.feed(token):
+                    await on_sentence(sentence)
+            response_data = await producer
+        finally:
+            producer.cancel()
+        
+        # Errors and fallbacks come back as a complete message without tokens
+        remainder = buffer.flush() if streamed else [
+            sentence for sentence, _ in split_sentences(response_data["response"]) if sentence.strip()
+        ]
+        for sentence in remainder:
+            await on_sentence(sentence)
+        return response_data
+
+    async def _translate_uncached(self, text: str, target_lang: str, source_lang: str) -> str:
+        """Call the translator off the event loop, bounded by the translation concurrency cap"""
+        async with self.translation_semaphore:
+            return await asyncio.to_thread(self.translator_pool.translate, text, source_lang, target_lang)
+
+    async def _translate_segments(self, text: str, target_lang: str, source_lang: str) -> str:
+        """
+        Translate text sentence by sentence through the translation memory.
+        Only sentences missing from the memory reach the translator (concurrently);
+        the translated sentences are reassembled with the original separators.
+        Raises TranslationFailed if the translator returned nothing for a sentence.
+        """
+        segments = split_sentences(text)
+        sentences = {sentence for sentence, _ in segments if sentence.strip()}
+        known = await asyncio.to_thread(self.translation_memory.lookup_many, sentences, source_lang, target_lang)
+        
+        missing = [sentence for sentence in sentences if sentence not in known]
+        self.translation_segments.inc(len(known), result="hit")
+        self.translation_segments.inc(len(missing), result="miss")
+        
+        if missing:
+            translations = await asyncio.gather(
+                *(self._translate_uncached(sentence, target_lang, source_lang) for sentence in missing)
+            )
+            self.translator_calls.inc(len(missing))
+            new_entries = {sentence: translated for sentence, translated in zip(missing, translations) if translated}
+            await asyncio.to_thread(self.translation_memory.store_many, new_entries, source_lang, target_lang)
+            known.update(new_entries)
+            if len(new_entries) < len(missing):
+                raise TranslationFailed(f"{len(missing) - len(new_entries)} sentences came back empty")
+        
+        return join_sentences([(known.get(sentence, sentence), separator) for sentence, separator in segments])
 
-    async def translate_text(self, text: str, target_lang: str = "en", source_lang: str = "auto") -> str:
-        """Translate text to target language with caching"""
+    async def translate_text(self, text: str, target_lang: str = "en", source_lang: str = "auto",
+                             fallback: bool = True) -> str:
+        """
+        Translate text to target language with caching. On failure the original
+        text is returned, or TranslationFailed raised when `fallback` is False
+        (for callers that cache the result under the target language).
+        """
         try:
             if not text.strip() or source_lang == target_lang:
                 return text
             
             # Create cache key
-            cache_key = f"translation:{source_lang}:{target_lang}:{hash(text)}"
+            cache_key = self.translation_cache_key(text, source_lang, target_lang)
             
             # Check cache first
             cached_translation = await self.cache_manager.get(cache_key)
@@ -541,151 +1082,374 @@ class MentalHealthServer:
                 logger.info(f"Translation cache hit for {source_lang}->{target_lang}")
                 return cached_translation
             
-            # Perform translation
-            translator = GoogleTranslator(source=source_lang, target=target_lang)
-            translated = translator.translate(text)
+            translated = await self._translate_segments(text, target_lang, source_lang)
             
             # Cache the result
-            await self.cache_manager.set(cache_key, translated, ttl=86400)  # 24 hours for translations
+            await self.cache_manager.set(cache_key, translated, ttl=TRANSLATION_CACHE_TTL)
             
             return translated
         except Exception as e:
+            if not fallback:
+                raise TranslationFailed(str(e)) from e
             logger.warning(f"Translation failed: {e}, returning original text")
             return text
 
-    async def text_to_speech_elevenlabs(self, text: str, language: str = "en", voice_id: str = None) -> Optional[str]:
-        """Convert text to speech using ElevenLabs with caching"""
-        if not self.elevenlabs_available or not text.strip():
+    async def translate_batch(self, texts: List[str], target_lang: str = "en", source_lang: str = "auto") -> List[str]:
+        """
+        Translate several strings at once. Cache lookups are coalesced into one
+        multi-get, identical strings are translated once, and uncached items run
+        concurrently under the translation concurrency cap. Items that fail to
+        translate are returned unchanged.
+        """
+        results = list(texts)
+        if source_lang == target_lang:
+            return results
+        
+        pending = [i for i, text in enumerate(texts) if text.strip()]
+        cache_keys = [self.translation_cache_key(texts[i], source_lang, target_lang) for i in pending]
+        cached_values = await self.cache_manager.get_many(cache_keys)
+        
+        misses: Dict[str, List[int]] = {}
+        for i, cached_translation in zip(pending, cached_values):
+            if cached_translation:
+                results[i] = cached_translation
+            else:
+                misses.setdefault(texts[i], []).append(i)
+        
+        if not misses:
+            return results
+        
+        async def translate_one(text: str) -> Optional[str]:
+            try:
+                return await self._translate_segments(text, target_lang, source_lang)
+            except Exception as e:
+                logger.warning(f"Batch translation item failed: {e}, returning original text")
+                return None
+        
+        unique_texts = list(misses)
+        translations = await asyncio.gather(*(translate_one(text) for text in unique_texts))
+        
+        new_entries = {}
+        for text, translated in zip(unique_texts, translations):
+            if translated is None:
+                continue
+            for i in misses[text]:
+                results[i] = translated
+            new_entries[self.translation_cache_key(text, source_lang, target_lang)] = translated
+        
+        await self.cache_manager.set_many(new_entries, ttl=TRANSLATION_CACHE_TTL)
+        logger.info(f"Batch translated {len(texts)} texts ({len(unique_texts)} uncached) {source_lang}->{target_lang}")
+        return results
+
+    def tts_cache_key(self, engine: str, audio_id: str) -> str:
+        """Redis entry pointing at a clip in the audio store"""
+        return f"tts:{engine}:{audio_id}"
+
+    async def _cached_tts(self, engine: str, voice: str, language: str, text: str, synthesize,
+                          extension: str = "mp3") -> Tuple[str, bool]:
+        """
+        Return (/audio URL, served from cache) for a clip, synthesizing it with
+        `synthesize(path)` only when neither Redis nor the audio store already has it.
+        """
+        audio_id = audio_digest(engine, voice, language, text)
+        cache_key = self.tts_cache_key(engine, audio_id)
+        
+        # Check cache first
+        if await self.cache_manager.get(cache_key) and self.audio_store.resolve(audio_id):
+            logger.info(f"TTS cache hit ({engine}) for text length {len(text)}")
+            await asyncio.to_thread(self.audio_store.touch, audio_id)
+            return f"/audio/{audio_id}", True
+        
+        # Synthesize unless this exact clip is already in the store
+        audio_id, created = await asyncio.to_thread(
+            self.audio_store.get_or_create, engine, voice, language, text, synthesize, extension
+        )
+        if not created:
+            logger.info(f"TTS audio store hit ({engine}) for text length {len(text)}")
+        
+        await self.cache_manager.set(cache_key, audio_id, ttl=TTS_CACHE_TTL)
+        return f"/audio/{audio_id}", not created
+
+    async def text_to_speech_engine(self, engine, text: str, language: str = "en",
+                                    voice_id: str = None) -> Tuple[str, bool]:
+        """Speech from one TTS engine through the audio cache; returns (audio URL, served from cache)"""
+        voice = engine.voice_for(language, voice_id)
+        
+        def synthesize(path: str):
+            start_time = time.perf_counter()
+            ok = False
+            try:
+                engine.synthesize(text, language, voice, path)
+                ok = True
+            finally:
+                # Latency per 100 characters drives engine fallback
+                self.tts_engines.record(engine.name, time.perf_counter() - start_time, ok, len(text) / 100)
+        
+        return await self._cached_tts(engine.name, voice, language, text, synthesize, engine.extension)
+
+    async def synthesize_clip(self, text: str, language: str = "en", voice_id: str = None,
+                              engine: str = None) -> Optional[Tuple[str, bool]]:
+        """
+        (audio URL, served from cache) for text from the first TTS engine that
+        succeeds: the requested engine, then the configured order with slow or
+        failing engines last. Raises KeyError for an unavailable engine name.
+        """
+        if not text.strip():
+            return None
+        
+        for tts_engine in self.tts_engines.order(engine):
+            try:
+                return await self.text_to_speech_engine(tts_engine, text, language, voice_id)
+            except Exception as e:
+                logger.error(f"{tts_engine.name} TTS failed: {e}")
+        return None
+
+    async def synthesize_phrases(self, text: str, language: str = "en", voice_id: str = None,
+                                 engine: str = None) -> Optional[Tuple[str, float]]:
+        """
+        Synthesize text sentence by sentence and join the clips into one MP3.
+        Each sentence is its own cached clip, so recurring phrases (greetings,
+        crisis line numbers, disclaimers) are synthesized once and reused across
+        responses; new sentences are synthesized concurrently, at most
+        TTS_PHRASE_CONCURRENCY at a time. Returns (audio URL, fraction of the
+        text's characters served from the phrase cache).
+        """
+        sentences = [sentence.strip() for sentence, _ in split_sentences(text) if sentence.strip()]
+        if not sentences:
+            return None
+        
+        # Pin one engine for every sentence so the clips share a format
+        engine = engine or self.tts_engines.order()[0].name
+        
+        async def synthesize_one(sentence: str):
+            async with self.tts_semaphore:
+                return await self.synthesize_clip(sentence, language, voice_id, engine)
+        
+        unique = list(dict.fromkeys(sentences))
+        clips = dict(zip(unique, await asyncio.gather(*(synthesize_one(sentence) for sentence in unique))))
+        if any(clip is None for clip in clips.values()):
             return None
         
+        cached_characters = sum(len(sentence) for sentence in sentences if clips[sentence][1])
+        total_characters = sum(len(sentence) for sentence in sentences)
+        self.tts_phrase_characters.inc(cached_characters, source="cache")
+        self.tts_phrase_characters.inc(total_characters - cached_characters, source="synthesized")
+        
+        clip_ids = [clips[sentence][0].rsplit("/", 1)[-1] for sentence in sentences]
+        clip_paths = [self.audio_store.resolve(clip_id) for clip_id in clip_ids]
+        extensions = {os.path.splitext(path)[1] for path in clip_paths}
+        if len(extensions) != 1:
+            # An engine fell back mid-response and the clips cannot be joined: synthesize whole
+            logger.warning(f"Phrase clips have mixed formats {sorted(extensions)}; synthesizing whole text")
+            clip = await self.synthesize_clip(text, language, voice_id, engine)
+            return (clip[0], 0.0) if clip else None
+        
+        def synthesize(path: str):
+            concatenate_audio(clip_paths, path)
+        
+        # The joined file is addressed by its clips, so it changes whenever one of them does
+        audio_url, _ = await self._cached_tts(
+            "phrases", stable_hash("|".join(clip_ids)), language, text, synthesize, extensions.pop().lstrip(".")
+        )
+        return audio_url, cached_characters / total_characters
+
+    def submit_tts_job(self, text: str, language: str):
+        """Queue background synthesis; finished jobs whose audio has since been evicted are redone"""
+        job = self.tts_jobs.submit(text, language)
+        if job.status == DONE and not self.audio_store.resolve(job.audio_url.rsplit("/", 1)[-1]):
+            self.tts_jobs.forget(job.job_id)
+            job = self.tts_jobs.submit(text, language)
+        return job
+
+    def phrase_cache_stats(self) -> Dict:
+        cached = self.tts_phrase_characters.get(source="cache")
+        synthesized = self.tts_phrase_characters.get(source="synthesized")
+        total = cached + synthesized
+        return {
+            "mode": TTS_MODE,
+            "characters_from_cache": cached,
+            "characters_synthesized": synthesized,
+            "phrase_cache_fraction": round(cached / total, 4) if total else 0.0
+        }
+
+    async def audio_variant(self, audio_id: str, audio_format: str) -> Optional[str]:
+        """Path of a transcoded variant of a stored clip (created on first use), or None if unavailable"""
+        if not self.transcoder.available():
+            return None
         try:
-            import elevenlabs
-            from elevenlabs import generate, play, save
-            
-            # Create cache key
-            cache_key = f"tts:elevenlabs:{language}:{voice_id or 'default'}:{hash(text)}"
-            
-            # Check cache first
-            cached_audio_id = await self.cache_manager.get(cache_key)
-            if cached_audio_id:
-                logger.info(f"TTS cache hit for text length {len(text)}")
-                return f"/audio/{cached_audio_id}"
-            
-            # Set voice based on language
-            if voice_id is None:
-                if language.startswith("en"):
-                    voice_id = "Rachel"  # English female voice
-                elif language.startswith("es"):
-                    voice_id = "Arnold"  # Spanish voice
-                elif language.startswith("fr"):
-                    voice_id = "Charlotte"  # French voice
-                else:
-                    voice_id = "Rachel"  # Default
-            
-            # Generate audio
-            audio = generate(
-                text=text,
-                voice=voice_id,
-                model="eleven_multilingual_v2",
-                api_key=self.elevenlabs_api_key
+            return await asyncio.to_thread(
+                self.audio_store.get_or_create_variant,
+                audio_id,
+                FORMATS[audio_format].extension,
+                lambda source, output: self.transcoder.transcode(source, output, audio_format)
             )
-            
-            # Save to temporary file
-            audio_id = str(uuid.uuid4())
-            filename = f"audio_{audio_id}.mp3"
-            filepath = os.path.join("audio_cache", filename)
-            
-            os.makedirs("audio_cache", exist_ok=True)
-            save(audio, filepath)
-            
-            # Store file info
-            self.audio_files[audio_id] = {
-                "path": filepath,
-                "created": datetime.now().isoformat(),
-                "text": text,
-                "language": language
-            }
-            
-            # Cache the audio ID
-            await self.cache_manager.set(cache_key, audio_id, ttl=3600)  # 1 hour for TTS
-            
-            return f"/audio/{audio_id}"
-            
-        except Exception as e:
-            logger.error(f"ElevenLabs TTS failed: {e}")
+        except (TranscodeError, FileNotFoundError) as e:
+            logger.warning(f"Serving source audio for {audio_id}: {audio_format} transcode failed: {e}")
             return None
 
-    async def text_to_speech_fallback(self, text: str, language: str = "en") -> Optional[str]:
-        """Fallback TTS using gTTS with caching"""
-        try:
-            from gtts import gTTS
-            import pygame
-            
-            # Create cache key
-            cache_key = f"tts:gtts:{language}:{hash(text)}"
-            
-            # Check cache first
-            cached_audio_id = await self.cache_manager.get(cache_key)
-            if cached_audio_id:
-                logger.info(f"TTS fallback cache hit for text length {len(text)}")
-                return f"/audio/{cached_audio_id}"
-            
-            # Create temporary file
-            audio_id = str(uuid.uuid4())
-            filename = f"audio_{audio_id}.mp3"
-            filepath = os.path.join("audio_cache", filename)
-            
-            os.makedirs("audio_cache", exist_ok=True)
-            
-            # Generate speech
-            tts = gTTS(text=text, lang=language, slow=False)
-            tts.save(filepath)
+    async def synthesize_speech(self, text: str, language: str = "en", voice_id: str = None,
+                                mode: str = None, engine: str = None) -> Optional[str]:
+        """Audio URL for text, as one clip or (mode "phrases") assembled from per-sentence clips"""
+        if (mode or TTS_MODE) == "phrases":
+            phrases = await self.synthesize_phrases(text, language, voice_id, engine)
+            return phrases[0] if phrases else None
+        clip = await self.synthesize_clip(text, language, voice_id, engine)
+        return clip[0] if clip else None
+
+    async def speak_sentence(self, sentence: str, target_lang: str, source_lang: str) -> Dict:
+        """Translate one sentence if needed and synthesize it; returns the stream event for it"""
+        text = sentence
+        if source_lang != target_lang:
+            text = await self.translate_text(sentence, target_lang, source_lang)
+        audio_url = await self.synthesize_speech(text, target_lang, mode="whole")
+        audio = audio_type = None
+        if audio_url:
+            audio_path = self.audio_store.resolve(audio_url.rsplit("/", 1)[-1])
+            audio_type = media_type(audio_path)
+            async with aiofiles.open(audio_path, "rb") as audio_file:
+                audio = base64.b64encode(await audio_file.read()).decode("ascii")
+        return {"type": "audio", "text": text, "audio_url": audio_url, "audio": audio, "media_type": audio_type}
+
+    async def run_audio_janitor(self):
+        """
+        Periodically keep audio_cache/ within AUDIO_CACHE_MAX_BYTES (LRU eviction)
+        and drop the Redis tts: entries of every clip that is no longer on disk.
+        """
+        while True:
+            try:
+                missing = await asyncio.to_thread(self.audio_store.reconcile)
+                evicted = await asyncio.to_thread(self.audio_store.evict, AUDIO_CACHE_MAX_BYTES)
+                removed = missing + evicted
+                if removed:
+                    await self.cache_manager.delete_many(
+                        [self.tts_cache_key(engine, audio_id) for audio_id, engine in removed]
+                    )
+                    self.audio_evictions.inc(len(missing), reason="missing")
+                    self.audio_evictions.inc(len(evicted), reason="quota")
+                    logger.info(f"Audio janitor removed {len(evicted)} clips over quota, {len(missing)} missing")
+                
+                stats = await asyncio.to_thread(self.audio_store.stats)
+                self.audio_cache_bytes.set(stats["disk_bytes"])
+                self.audio_cache_files.set(stats["files"])
+            except Exception as e:
+                logger.warning(f"Audio janitor pass failed: {e}")
             
-            # Store file info
-            self.audio_files[audio_id] = {
-                "path": filepath,
-                "created": datetime.now().isoformat(),
-                "text": text,
-                "language": language
+            await asyncio.sleep(AUDIO_JANITOR_INTERVAL)
+
+    async def recover_sessions(self):
+        """Rebuild the in-memory session store from its journal, then keep journaling"""
+        self.session_journal = SessionJournal(
+            SESSION_JOURNAL_DIR, SESSION_JOURNAL_FLUSH_INTERVAL, SESSION_SNAPSHOT_INTERVAL,
+            fsync=SESSION_JOURNAL_FSYNC, metrics=self.metrics
+        )
+        try:
+            recovery = await asyncio.to_thread(self.session_journal.recover, self.sessions)
+            logger.info(f"✅ Recovered {recovery['sessions']} sessions and {recovery['events_replayed']} events "
+                        f"from {SESSION_JOURNAL_DIR} in {recovery['seconds']:.3f}s")
+        except Exception as e:
+            logger.error(f"Session recovery failed, starting with no sessions: {e}")
+            self.sessions.restore([])
+        self.session_journal.start(self.sessions)
+
+    async def collect_stats(self) -> Dict:
+        """
+        Build the /stats payload from counters kept up to date as data is
+        written (sessions, messages, cache keys); nothing here scans Redis.
+        The document count is re-read from the vector store, which other
+        processes (populate.py) also write to.
+        """
+        session_stats = await self.sessions.stats()
+        audio_stats, memory_stats = await asyncio.gather(
+            asyncio.to_thread(self.audio_store.stats), asyncio.to_thread(self.translation_memory.stats)
+        )
+        stats = {
+            "total_sessions": session_stats["sessions"],
+            "total_messages": session_stats["messages_added"],
+            "session_store": session_stats,
+            "active_since": self.started_at,
+            "rag_system_status": "connected" if self.rag_system else "disconnected",
+            "supported_languages": len(self.supported_languages),
+            "multilingual_enabled": True,
+            "redis_connected": self.cache_manager.is_connected,
+            "cache_enabled": self.cache_manager.is_connected,
+            "translation_memory": memory_stats,
+            "audio_store": audio_stats,
+            "tts_phrases": self.phrase_cache_stats(),
+            "tts_jobs": self.tts_jobs.stats(),
+            "speech_to_text": self.transcriber.stats(),
+            "transcode": self.transcoder.stats(),
+            "voice_engines": {"tts": self.tts_engines.stats(), "stt": self.stt_engines.stats()}
+        }
+        if self.session_journal:
+            stats["session_journal"] = self.session_journal.stats()
+        
+        if self.cache_manager.is_connected:
+            key_counts = self.cache_manager.key_counts()
+            for namespace, count in key_counts.items():
+                self.cache_keys_gauge.set(count, namespace=namespace)
+            stats["cache_stats"] = {
+                "redis_connected": True,
+                "key_counts": key_counts,
+                "total_keys": sum(key_counts.values())
             }
+        
+        if self.rag_system:
+            try:
+                await asyncio.to_thread(self.rag_system.refresh_document_count)
+            except Exception as e:
+                logger.warning(f"Document count refresh failed: {e}")
+            stats["knowledge_base"] = self.rag_system.get_collection_stats()
+        
+        stats["generated_at"] = time.time()
+        return stats
+
+    async def run_stats_refresher(self):
+        """Rebuild the /stats snapshot every STATS_REFRESH_INTERVAL seconds"""
+        while True:
+            try:
+                self.stats_snapshot = await self.collect_stats()
+            except Exception as e:
+                logger.warning(f"Stats refresh failed: {e}")
             
-            # Cache the audio ID
-            await self.cache_manager.set(cache_key, audio_id, ttl=3600)  # 1 hour for TTS
-            
-            return f"/audio/{audio_id}"
-            
-        except Exception as e:
-            logger.error(f"Fallback TTS failed: {e}")
-            return None
+            await asyncio.sleep(STATS_REFRESH_INTERVAL)
+
+    def recognize_segment(self, segment, engine: str = None) -> str:
+        """Blocking: recognize one audio segment with the STT engines in fallback order"""
+        text, _ = self.stt_engines.run(
+            lambda stt_engine: stt_engine.recognize(segment), preferred=engine, units=audio_seconds(segment)
+        )
+        return text
 
-    async def speech_to_text(self, audio_file: UploadFile) -> str:
-        """Convert speech to text"""
+    async def speech_to_text(self, audio_file: UploadFile, engine: str = None) -> Tuple[str, Dict]:
+        """
+        Convert speech to text. The upload is processed in memory (at most
+        STT_MAX_UPLOAD_BYTES); long recordings are split at pauses and the
+        segments recognized in parallel. Returns the text and timing info.
+        """
         if not self.stt_available:
             raise HTTPException(status_code=501, detail="Speech-to-text not available")
+        if engine is not None and engine not in self.stt_engines.engines:
+            raise HTTPException(status_code=400, detail=f"STT engine not available: {engine}")
         
         try:
-            import speech_recognition as sr
-            
-            # Save uploaded file temporarily
-            temp_audio = tempfile.NamedTemporaryFile(delete=False, suffix='.wav')
-            content = await audio_file.read()
-            temp_audio.write(content)
-            temp_audio.close()
-            
-            # Recognize speech
-            recognizer = sr.Recognizer()
-            with sr.AudioFile(temp_audio.name) as source:
-                audio_data = recognizer.record(source)
-                text = recognizer.recognize_google(audio_data)
-            
-            # Clean up
-            os.unlink(temp_audio.name)
-            
-            return text
-            
+            content = await read_limited(audio_file, STT_MAX_UPLOAD_BYTES)
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        
+        try:
+            text, info = await self.transcriber.transcribe(content, engine)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Unsupported audio: {e}")
         except Exception as e:
             logger.error(f"Speech-to-text failed: {e}")
             raise HTTPException(status_code=500, detail=f"Speech recognition error: {e}")
+        
+        if not text:
+            raise HTTPException(status_code=422, detail="Could not understand audio")
+        
+        logger.info(f"Transcribed {info['audio_seconds']:.1f}s of audio in {info['segments']} segments "
+                    f"at {info['realtime_factor']:.1f}x real time")
+        return text, info
 
     def setup_routes(self):
         """Setup API routes including voice endpoints"""
@@ -695,10 +1459,19 @@ class MentalHealthServer:
             """Initialize services on startup"""
             try:
                 logger.info("Starting server initialization...")
+                LANGUAGES.refresh_in_background()
                 
                 # Initialize Redis first
                 await self.initialize_redis()
                 
+                # Sessions kept in memory come back from the journal (Redis keeps its own)
+                if SESSION_JOURNAL_DIR and isinstance(self.sessions, SessionStore):
+                    await self.recover_sessions()
+                
+                # Keep the audio cache within its disk quota
+                self.audio_janitor_task = asyncio.create_task(self.run_audio_janitor())
+                self.stats_task = asyncio.create_task(self.run_stats_refresher())
+                
                 # Initialize RAG system
                 self.rag_system = MentalHealthRAG(groq_api_key=self.groq_api_key)
                 
@@ -731,6 +1504,18 @@ class MentalHealthServer:
                 logger.error(f"Failed to initialize RAG system: {str(e)}")
                 raise
 
+        @self.app.on_event("shutdown")
+        async def shutdown_event():
+            """Stop background tasks"""
+            if self.audio_janitor_task:
+                self.audio_janitor_task.cancel()
+            if self.stats_task:
+                self.stats_task.cancel()
+            if self.session_journal:
+                await self.session_journal.close(self.sessions)
+            await self.tts_jobs.stop()
+            self.transcriber.shutdown()
+
         @self.app.get("/", response_class=HTMLResponse)
         async def root(request: Request):
             """Root endpoint with basic information"""
@@ -783,6 +1568,9 @@ class MentalHealthServer:
                         <div class="feature">
                             <strong>POST /translate</strong> - Translate text between languages
                         </div>
+                        <div class="feature">
+                            <strong>POST /translate/batch</strong> - Translate a list of texts concurrently
+                        </div>
                         <div class="feature">
                             <strong>GET /sessions</strong> - List active sessions
                         </div>
@@ -792,6 +1580,9 @@ class MentalHealthServer:
                         <div class="feature">
                             <strong>GET /stats</strong> - Server statistics
                         </div>
+                        <div class="feature">
+                            <strong>GET /metrics</strong> - Prometheus metrics
+                        </div>
                         <div class="cache">
                             <strong>POST /cache/clear</strong> - Clear Redis cache (admin)
                         </div>
@@ -833,56 +1624,32 @@ class MentalHealthServer:
                 
                 session_id = chat_message.session_id or str(uuid.uuid4())
                 target_language = chat_message.language or "en"
+                await self.ensure_session(session_id, target_language)
+                memory = await self.load_conversation(session_id)
                 
-                if session_id not in self.sessions:
-                    self.sessions[session_id] = {
-                        "created_at": datetime.now().isoformat(),
-                        "messages": [],
-                        "language": target_language
-                    }
-                    logger.info(f"Created new session: {session_id} with language: {target_language}")
-                
-                detected_language = self.detect_language(chat_message.message)
-                english_input = chat_message.message
-                
-                if detected_language != "en":
-                    english_input = await self.translate_text(chat_message.message, "en", detected_language)
-                    logger.info(f"Translated from {detected_language} to English for processing")
+                logger.info(f"Processing message in session {session_id}: {chat_message.message[:50]}...")
                 
-                self.sessions[session_id]["messages"].append({
-                    "role": "user",
+                # Localized cache entries hold the final response for this exact message and
+                # target language; the English response underneath is shared by all of them
+                context = await self.chat_pipeline.run({
                     "message": chat_message.message,
-                    "timestamp": datetime.now().isoformat(),
-                    "language": detected_language
+                    "target_language": target_language,
+                    "history": memory.render()
                 })
+                localized_entry = context["localize"]
+                detected_language = localized_entry["detected_language"]
+                final_response = localized_entry["response"]
                 
-                logger.info(f"Processing message in session {session_id}: {chat_message.message[:50]}...")
-                
-                # Check cache for similar queries
-                cache_key = f"chat:{hash(english_input)}:{target_language}"
-                cached_response = await self.cache_manager.get(cache_key)
-                
-                if cached_response:
+                if context["localized_lookup"]:
+                    logger.info(f"Localized chat cache hit for session {session_id}")
+                elif context["shared_lookup"]:
                     logger.info(f"Chat cache hit for session {session_id}")
-                    response_data = cached_response
-                else:
-                    response_data = self.rag_system.generate_response(english_input)
-                    # Cache the response
-                    await self.cache_manager.set(cache_key, response_data, ttl=1800)  # 30 minutes for chat responses
-                
-                english_response = response_data["response"]
-                final_response = english_response
-                
-                if target_language != "en":
-                    final_response = await self.translate_text(english_response, target_language, "en")
-                    logger.info(f"Translated response to {target_language}")
-                
-                self.sessions[session_id]["messages"].append({
-                    "role": "assistant",
-                    "message": final_response,
-                    "timestamp": datetime.now().isoformat(),
-                    "language": target_language
-                })
+                timings = ", ".join(f"{name}={value * 1000:.0f}ms" for name, value in context["timings"].items())
+                logger.info(f"Chat stages for session {session_id}: {timings}")
+                prompt_tokens = self.observe_prompt(session_id, context)
+                
+                await self.record_exchange(session_id, chat_message.message, detected_language, final_response,
+                                           target_language, memory)
                 
                 response_time = time.time() - start_time
                 
@@ -891,11 +1658,12 @@ class MentalHealthServer:
                 return ChatResponse(
                     response=final_response,
                     session_id=session_id,
-                    is_mental_health=response_data["is_mental_health"],
+                    is_mental_health=localized_entry["is_mental_health"],
                     response_time=response_time,
                     timestamp=datetime.now().isoformat(),
                     detected_language=detected_language,
-                    target_language=target_language
+                    target_language=target_language,
+                    prompt_tokens=prompt_tokens
                 )
                 
             except Exception as e:
@@ -908,9 +1676,16 @@ class MentalHealthServer:
         @self.app.post("/voice/chat", response_model=VoiceChatResponse, tags=["Voice"])
         async def voice_chat_endpoint(
             chat_message: ChatMessage,
-            generate_audio: bool = Form(True)
+            generate_audio: bool = True,
+            wait_for_audio: bool = False
         ):
-            """Voice chat endpoint with audio response generation and caching"""
+            """
+            Voice chat endpoint. The text response is returned as soon as it is
+            ready; audio is synthesized by a background TTS job whose id is
+            returned in `audio_job_id` (poll /voice/jobs/{id}). `audio_url` is set
+            right away when the audio already exists, or when `wait_for_audio`
+            is true.
+            """
             try:
                 start_time = time.time()
                 
@@ -919,35 +1694,29 @@ class MentalHealthServer:
                 
                 audio_url = None
                 audio_duration = None
+                job = None
                 
-                # Generate audio if requested and available
+                # Queue audio if requested and available
                 if generate_audio and self.tts_available:
-                    audio_gen_start = time.time()
-                    
-                    # Try ElevenLabs first
-                    audio_url = await self.text_to_speech_elevenlabs(
-                        chat_response.response,
-                        chat_response.target_language or "en"
-                    )
-                    
-                    # Fallback to gTTS if ElevenLabs fails
-                    if audio_url is None:
-                        audio_url = await self.text_to_speech_fallback(
-                            chat_response.response,
-                            chat_response.target_language or "en"
-                        )
+                    try:
+                        job = self.submit_tts_job(chat_response.response, chat_response.target_language or "en")
+                    except QueueFull as e:
+                        logger.warning(f"Skipping audio for session {chat_response.session_id}: {e}")
                     
-                    if audio_url:
-                        audio_duration = time.time() - audio_gen_start
-                        logger.info(f"Audio generated in {audio_duration:.2f}s")
+                    if job and wait_for_audio:
+                        job = await self.tts_jobs.wait(job.job_id, TTS_JOB_MAX_WAIT)
+                    if job and job.status == DONE:
+                        audio_url = job.audio_url
+                        audio_duration = job.finished_at - job.started_at
                 
                 response_time = time.time() - start_time
                 
                 return VoiceChatResponse(
-                    **chat_response.dict(),
+                    **{**chat_response.dict(), "response_time": response_time},
                     audio_url=audio_url,
                     audio_duration=audio_duration,
-                    response_time=response_time
+                    audio_job_id=job.job_id if job else None,
+                    audio_status=job.status if job else None
                 )
                 
             except Exception as e:
@@ -957,14 +1726,124 @@ class MentalHealthServer:
                     detail=f"Error processing voice chat: {str(e)}"
                 )
 
+        @self.app.get("/voice/jobs/{job_id}", response_model=TTSJobStatus, tags=["Voice"])
+        async def get_tts_job(job_id: str, wait: float = 0):
+            """TTS job status; with `wait` > 0, hold the request until the job finishes (long-poll)"""
+            if wait > 0:
+                job = await self.tts_jobs.wait(job_id, min(wait, TTS_JOB_MAX_WAIT))
+            else:
+                job = self.tts_jobs.get(job_id)
+            if job is None:
+                raise HTTPException(status_code=404, detail="TTS job not found")
+            return TTSJobStatus(**job.to_dict())
+
+        @self.app.post("/voice/chat/stream", tags=["Voice"])
+        async def voice_chat_stream_endpoint(chat_message: ChatMessage):
+            """
+            Streaming voice chat. The response is newline-delimited JSON sent with
+            chunked transfer encoding: one {"type": "audio"} event per sentence, in
+            order, each carrying the sentence text and its base64 MP3, followed by a
+            final {"type": "done"} event with the full response. Sentences are
+            synthesized while the LLM is still writing the rest of the answer.
+            """
+            if not self.tts_available:
+                raise HTTPException(status_code=501, detail="Text-to-speech not available")
+            
+            start_time = time.perf_counter()
+            session_id = chat_message.session_id or str(uuid.uuid4())
+            target_language = chat_message.language or "en"
+            await self.ensure_session(session_id, target_language)
+            memory = await self.load_conversation(session_id)
+            
+            # Synthesis tasks in sentence order, then the pipeline context (or its exception)
+            events: asyncio.Queue = asyncio.Queue()
+            cached = False
+            
+            async def on_sentence(sentence: str):
+                await events.put(asyncio.create_task(self.speak_sentence(sentence, target_language, "en")))
+            
+            async def run_pipeline():
+                nonlocal cached
+                try:
+                    context = await self.chat_pipeline.run({
+                        "message": chat_message.message,
+                        "target_language": target_language,
+                        "history": memory.render(),
+                        "on_sentence": on_sentence
+                    })
+                    if context["localized_lookup"] or context["shared_lookup"]:
+                        # Cached answer: nothing was streamed, speak the localized text directly
+                        cached = True
+                        for sentence, _ in split_sentences(context["localize"]["response"]):
+                            if sentence.strip():
+                                await events.put(asyncio.create_task(
+                                    self.speak_sentence(sentence, target_language, target_language)
+                                ))
+                    await events.put(context)
+                except Exception as e:
+                    await events.put(e)
+            
+            async def stream():
+                pipeline_task = asyncio.create_task(run_pipeline())
+                sentences = 0
+                item = None
+                try:
+                    while True:
+                        item = await events.get()
+                        if isinstance(item, asyncio.Task):
+                            event = await item
+                            sentences += 1
+                            if sentences == 1:
+                                self.time_to_first_audio.observe(
+                                    time.perf_counter() - start_time, cache="hit" if cached else "miss"
+                                )
+                            yield json.dumps({**event, "index": sentences - 1}) + "\n"
+                            continue
+                        
+                        if isinstance(item, Exception):
+                            logger.error(f"Streaming voice chat error: {item}")
+                            yield json.dumps({"type": "error", "detail": str(item)}) + "\n"
+                            return
+                        
+                        entry = item["localize"]
+                        prompt_tokens = self.observe_prompt(session_id, item)
+                        await self.record_exchange(session_id, chat_message.message, entry["detected_language"],
+                                                   entry["response"], target_language, memory)
+                        yield json.dumps({
+                            "type": "done",
+                            "response": entry["response"],
+                            "session_id": session_id,
+                            "is_mental_health": entry["is_mental_health"],
+                            "detected_language": entry["detected_language"],
+                            "target_language": target_language,
+                            "sentences": sentences,
+                            "prompt_tokens": prompt_tokens,
+                            "response_time": time.perf_counter() - start_time
+                        }) + "\n"
+                        return
+                finally:
+                    # Client went away or we are done: stop any remaining work
+                    pipeline_task.cancel()
+                    if isinstance(item, asyncio.Task):
+                        item.cancel()
+                    while not events.empty():
+                        item = events.get_nowait()
+                        if isinstance(item, asyncio.Task):
+                            item.cancel()
+            
+            return StreamingResponse(stream(), media_type="application/x-ndjson")
+
         @self.app.post("/voice/speech-to-text", tags=["Voice"])
-        async def speech_to_text_endpoint(audio_file: UploadFile = File(...)):
-            """Convert speech to text from uploaded audio file"""
+        async def speech_to_text_endpoint(audio_file: UploadFile = File(...), engine: Optional[str] = None):
+            """Convert speech to text from uploaded audio file (optionally with a specific STT engine)"""
             try:
-                text = await self.speech_to_text(audio_file)
+                text, info = await self.speech_to_text(audio_file, engine)
                 return {
                     "text": text,
                     "detected_language": self.detect_language(text),
+                    "audio_seconds": info["audio_seconds"],
+                    "segments": info["segments"],
+                    "realtime_factor": info["realtime_factor"],
                     "timestamp": datetime.now().isoformat()
                 }
             except HTTPException:
@@ -983,24 +1862,43 @@ class MentalHealthServer:
                 if not self.tts_available:
                     raise HTTPException(status_code=501, detail="Text-to-speech not available")
                 
-                start_time = time.time()
+                mode = tts_request.mode or TTS_MODE
+                if mode not in ("whole", "phrases"):
+                    raise HTTPException(status_code=400, detail=f"Unknown TTS mode: {mode}")
+                if tts_request.engine is not None and tts_request.engine not in self.tts_engines.engines:
+                    raise HTTPException(status_code=400, detail=f"TTS engine not available: {tts_request.engine}")
+                try:
+                    audio_format = negotiate(None, tts_request.format)
+                except ValueError as e:
+                    raise HTTPException(status_code=400, detail=str(e))
                 
-                # Try ElevenLabs first
-                audio_url = await self.text_to_speech_elevenlabs(
-                    tts_request.text,
-                    tts_request.language,
-                    tts_request.voice_id
-                )
+                start_time = time.time()
+                phrase_cache_fraction = None
                 
-                # Fallback to gTTS
-                if audio_url is None:
-                    audio_url = await self.text_to_speech_fallback(
+                if mode == "phrases":
+                    phrases = await self.synthesize_phrases(
+                        tts_request.text,
+                        tts_request.language,
+                        tts_request.voice_id,
+                        tts_request.engine
+                    )
+                    audio_url, phrase_cache_fraction = phrases if phrases else (None, None)
+                else:
+                    # ElevenLabs first, gTTS as fallback
+                    clip = await self.synthesize_clip(
                         tts_request.text,
-                        tts_request.language
+                        tts_request.language,
+                        tts_request.voice_id,
+                        tts_request.engine
                     )
+                    audio_url = clip[0] if clip else None
                 
                 if audio_url is None:
                     raise HTTPException(status_code=500, detail="Failed to generate audio")
+                if audio_format:
+                    # Transcode now so the client's first GET is served from the store
+                    if await self.audio_variant(audio_url.rsplit("/", 1)[-1], audio_format):
+                        audio_url = f"{audio_url}?format={audio_format}"
                 
                 duration = time.time() - start_time
                 
@@ -1008,7 +1906,8 @@ class MentalHealthServer:
                     audio_url=audio_url,
                     duration=duration,
                     text_length=len(tts_request.text),
-                    timestamp=datetime.now().isoformat()
+                    timestamp=datetime.now().isoformat(),
+                    phrase_cache_fraction=phrase_cache_fraction
                 )
                 
             except HTTPException:
@@ -1021,17 +1920,34 @@ class MentalHealthServer:
                 )
 
         @self.app.get("/audio/{audio_id}")
-        async def get_audio_file(audio_id: str):
-            """Serve generated audio files"""
-            if audio_id not in self.audio_files:
+        async def get_audio_file(audio_id: str, request: Request, format: Optional[str] = None):
+            """
+            Serve generated audio files (ETag/304, byte ranges, immutable caching).
+            A low-bitrate variant is served for ?format=opus|aac or an Accept header preferring one.
+            """
+            audio_path = self.audio_store.resolve(audio_id)
+            if audio_path is None:
                 raise HTTPException(status_code=404, detail="Audio file not found")
+            try:
+                audio_format = negotiate(request.headers.get("accept"), format)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            if audio_format and self.audio_store.is_content_addressed(audio_path):
+                audio_path = await self.audio_variant(audio_id, audio_format) or audio_path
             
-            file_info = self.audio_files[audio_id]
-            return FileResponse(
-                file_info["path"],
-                media_type="audio/mpeg",
-                filename=f"speech_{audio_id}.mp3"
+            response = await asyncio.to_thread(
+                file_response,
+                request.headers,
+                audio_path,
+                media_type=media_type(audio_path),
+                filename=f"speech_{audio_id}{os.path.splitext(audio_path)[1]}",
+                immutable=self.audio_store.is_content_addressed(audio_path)
             )
+            if format is None:
+                response.headers["vary"] = "Accept"
+            self.audio_responses.inc(status=response.status_code)
+            self.audio_response_bytes.inc(int(response.headers.get("content-length", 0)))
+            return response
 
         @self.app.post("/cache/clear", tags=["Cache Management"])
         async def clear_cache(pattern: str = "*", admin_key: str = Form(None)):
@@ -1093,20 +2009,15 @@ class MentalHealthServer:
                 # Get Redis info
                 info = await self.cache_manager.redis_client.info()
                 
-                # Count keys by pattern
-                patterns = ["chat:*", "translation:*", "tts:*", "mood:*"]
-                key_counts = {}
-                
-                for pattern in patterns:
-                    keys = await self.cache_manager.redis_client.keys(pattern)
-                    key_counts[pattern] = len(keys)
-                
+                # Keys per namespace, counted as they are written
+                key_counts = self.cache_manager.key_counts()
                 total_keys = sum(key_counts.values())
                 
                 return {
                     "redis_connected": True,
                     "total_keys": total_keys,
                     "key_counts": key_counts,
+                    "namespaces": self.cache_manager.namespace_stats(),
                     "memory_used": info.get('used_memory_human', 'N/A'),
                     "connected_clients": info.get('connected_clients', 0),
                     "keyspace_hits": info.get('keyspace_hits', 0),
@@ -1123,6 +2034,11 @@ class MentalHealthServer:
                     detail=f"Error getting cache stats: {str(e)}"
                 )
 
+        @self.app.get("/metrics", tags=["Monitoring"])
+        async def get_metrics():
+            """Prometheus text-format metrics (per-namespace cache counters and latency histograms)"""
+            return Response(content=self.metrics.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
         @self.app.get("/languages", response_model=List[LanguageInfo], tags=["Translation"])
         async def get_supported_languages():
             """
@@ -1167,7 +2083,7 @@ class MentalHealthServer:
                 start_time = time.time()
                 
                 # Validate target language
-                if translation_request.target_lang not in self.supported_languages.values():
+                if not LANGUAGES.is_supported(translation_request.target_lang):
                     raise HTTPException(
                         status_code=400,
                         detail=f"Unsupported target language: {translation_request.target_lang}"
@@ -1179,7 +2095,7 @@ class MentalHealthServer:
                     source_lang = self.detect_language(translation_request.text)
                 
                 # Validate source language if specified
-                if source_lang != "auto" and source_lang not in self.supported_languages.values():
+                if source_lang != "auto" and not LANGUAGES.is_supported(source_lang):
                     raise HTTPException(
                         status_code=400,
                         detail=f"Unsupported source language: {source_lang}"
@@ -1230,22 +2146,87 @@ class MentalHealthServer:
                     detail=f"Error translating text: {str(e)}"
                 )
 
-        @self.app.get("/sessions", response_model=List[SessionInfo], tags=["Sessions"])
-        async def list_sessions():
-            """List all active conversation sessions"""
+        @self.app.post("/translate/batch", response_model=BatchTranslationResponse, tags=["Translation"])
+        async def translate_batch_endpoint(batch_request: BatchTranslationRequest):
+            """
+            Translate a list of texts in one request.
+
+            Cached items are fetched with a single multi-get and uncached items are
+            translated concurrently, so the cost is closer to one round trip than N.
+            """
+            try:
+                start_time = time.time()
+
+                if not LANGUAGES.is_supported(batch_request.target_lang):
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"Unsupported target language: {batch_request.target_lang}"
+                    )
+
+                source_lang = batch_request.source_lang or "auto"
+                if source_lang != "auto" and not LANGUAGES.is_supported(source_lang):
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"Unsupported source language: {source_lang}"
+                    )
+
+                translations = await self.translate_batch(
+                    batch_request.texts,
+                    batch_request.target_lang,
+                    source_lang
+                )
+
+                translation_time = time.time() - start_time
+                logger.info(f"Batch translated {len(translations)} texts to {batch_request.target_lang} in {translation_time:.3f}s")
+
+                return BatchTranslationResponse(
+                    translations=translations,
+                    source_lang=source_lang,
+                    target_lang=batch_request.target_lang,
+                    translation_time=translation_time,
+                    timestamp=datetime.now().isoformat()
+                )
+
+            except HTTPException:
+                raise
+            except Exception as e:
+                logger.error(f"Batch translation error: {str(e)}")
+                raise HTTPException(
+                    status_code=500,
+                    detail=f"Error translating texts: {str(e)}"
+                )
+
+        @self.app.get("/sessions", response_model=List[SessionInfo], response_model_exclude_none=True, tags=["Sessions"])
+        async def list_sessions(response: Response, cursor: Optional[str] = None, limit: int = 100,
+                                fields: str = "metadata", last: Optional[int] = Query(None, ge=1),
+                                since: Optional[str] = None):
+            """
+            List active conversation sessions in creation order, a page at a time.
+            Pass the X-Next-Cursor response header back as `cursor` for the next page.
+            fields=messages adds each session's messages (limited by `last` / `since`).
+            """
             try:
-                sessions_info = []
-                for session_id, session_data in self.sessions.items():
-                    sessions_info.append(SessionInfo(
-                        session_id=session_id,
-                        created_at=session_data["created_at"],
-                        message_count=len(session_data["messages"]),
-                        language=session_data.get("language", "en")
-                    ))
+                if fields not in ("metadata", "messages"):
+                    raise HTTPException(status_code=400, detail="fields must be 'metadata' or 'messages'")
+                if not 1 <= limit <= MAX_PAGE_SIZE:
+                    raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_PAGE_SIZE}")
+                try:
+                    sessions, next_cursor = await self.sessions.page(
+                        cursor, limit, messages=fields == "messages", last=last,
+                        since=parse_since(since) if since else None
+                    )
+                except ValueError as e:
+                    raise HTTPException(status_code=400, detail=str(e))
+                
+                if next_cursor:
+                    response.headers["X-Next-Cursor"] = next_cursor
+                sessions_info = [SessionInfo(**session) for session in sessions]
                 
                 logger.info(f"Listed {len(sessions_info)} active sessions")
                 return sessions_info
                 
+            except HTTPException:
+                raise
             except Exception as e:
                 logger.error(f"Error listing sessions: {str(e)}")
                 raise HTTPException(
@@ -1285,10 +2266,23 @@ class MentalHealthServer:
                 )
 
         @self.app.get("/sessions/{session_id}", response_model=Dict, tags=["Sessions"])
-        async def get_session(session_id: str):
-            """Get detailed information about a specific session"""
+        async def get_session(session_id: str, fields: str = "messages", last: Optional[int] = Query(None, ge=1),
+                              since: Optional[str] = None):
+            """
+            Get a session: metadata plus messages, or metadata only with fields=metadata.
+            `last` returns only the last N messages, `since` (epoch seconds or ISO 8601) only newer ones.
+            """
             try:
-                if session_id not in self.sessions:
+                if fields not in ("metadata", "messages"):
+                    raise HTTPException(status_code=400, detail="fields must be 'metadata' or 'messages'")
+                try:
+                    since_timestamp = parse_since(since) if since else None
+                except ValueError as e:
+                    raise HTTPException(status_code=400, detail=str(e))
+                session = await self.sessions.get(
+                    session_id, messages=fields == "messages", last=last, since=since_timestamp
+                )
+                if session is None:
                     logger.warning(f"Session not found: {session_id}")
                     raise HTTPException(
                         status_code=404,
@@ -1296,10 +2290,7 @@ class MentalHealthServer:
                     )
                 
                 logger.info(f"Retrieved session: {session_id}")
-                return {
-                    "session_id": session_id,
-                    **self.sessions[session_id]
-                }
+                return session
                 
             except HTTPException:
                 raise
@@ -1314,14 +2305,13 @@ class MentalHealthServer:
         async def delete_session(session_id: str):
             """Delete a specific conversation session"""
             try:
-                if session_id not in self.sessions:
+                if not await self.sessions.delete(session_id):
                     logger.warning(f"Session not found for deletion: {session_id}")
                     raise HTTPException(
                         status_code=404,
                         detail=f"Session {session_id} not found"
                     )
                 
-                del self.sessions[session_id]
                 logger.info(f"Deleted session: {session_id}")
                 
                 return {"message": f"Session {session_id} deleted successfully"}
@@ -1337,32 +2327,16 @@ class MentalHealthServer:
 
         @self.app.get("/stats", tags=["Monitoring"])
         async def get_stats():
-            """Get server statistics and usage metrics"""
+            """
+            Get server statistics and usage metrics. Served from a snapshot
+            refreshed every STATS_REFRESH_INTERVAL seconds, so frequent polling
+            costs nothing; `snapshot_age_seconds` says how old it is.
+            """
             try:
-                stats = {
-                    "total_sessions": len(self.sessions),
-                    "total_messages": sum(len(session["messages"]) for session in self.sessions.values()),
-                    "active_since": datetime.now().isoformat(),
-                    "rag_system_status": "connected" if self.rag_system else "disconnected",
-                    "supported_languages": len(self.supported_languages),
-                    "multilingual_enabled": True,
-                    "redis_connected": self.cache_manager.is_connected,
-                    "cache_enabled": self.cache_manager.is_connected
-                }
-                
-                # Add cache statistics if Redis is connected
-                if self.cache_manager.is_connected:
-                    try:
-                        cache_stats = await self.get_cache_internal_stats()
-                        stats["cache_stats"] = cache_stats
-                    except Exception as e:
-                        stats["cache_stats"] = {"error": str(e)}
-                
-                if self.rag_system:
-                    kb_stats = self.rag_system.get_collection_stats()
-                    stats["knowledge_base"] = kb_stats
-                
-                logger.info("Retrieved server statistics")
+                if self.stats_snapshot is None:
+                    self.stats_snapshot = await self.collect_stats()
+                stats = dict(self.stats_snapshot)
+                stats["snapshot_age_seconds"] = round(time.time() - stats.pop("generated_at"), 3)
                 return stats
                 
             except Exception as e:
@@ -1372,35 +2346,6 @@ class MentalHealthServer:
                     detail=f"Error getting statistics: {str(e)}"
                 )
 
-        async def get_cache_internal_stats(self):
-            """Internal method to get cache statistics"""
-            if not self.cache_manager.is_connected:
-                return {"redis_connected": False}
-            
-            try:
-                patterns = ["chat:*", "translation:*", "tts:*", "mood:*"]
-                key_counts = {}
-                total_size = 0
-                
-                for pattern in patterns:
-                    keys = await self.cache_manager.redis_client.keys(pattern)
-                    key_counts[pattern] = len(keys)
-                    
-                    # Estimate size (rough calculation)
-                    for key in keys[:10]:  # Sample first 10 keys
-                        value = await self.cache_manager.redis_client.get(key)
-                        if value:
-                            total_size += len(value)
-                
-                return {
-                    "redis_connected": True,
-                    "key_counts": key_counts,
-                    "total_keys": sum(key_counts.values()),
-                    "estimated_size_mb": round(total_size / (1024 * 1024), 2)
-                }
-            except Exception as e:
-                return {"error": str(e)}
-
         # Exception handlers
         @self.app.exception_handler(HTTPException)
         async def http_exception_handler(request: Request, exc: HTTPException):
@@ -0,0 +1,286 @@
+# session_journal.py
+"""
+Write-behind persistence for the in-memory session store.
+
+`SessionStore` hands every change to `SessionJournal.record()` as a small
+event list (create, append, summary, delete). Recording only appends to a
+list, so /chat never waits for the disk. A background task writes pending
+events to an append-only JSON-lines log every `flush_interval` seconds, and
+every `snapshot_interval` seconds it writes a compacted snapshot of the whole
+store and deletes the logs the snapshot covers:
+
+  journal-<generation>.jsonl   events, one JSON array per line
+  snapshot-<generation>.json   the store as it was before journal-<generation>
+
+A snapshot switches writing to a new log generation. Older logs and
+snapshots are only deleted once the new snapshot has been renamed into
+place, so a crash at any point leaves a snapshot plus every log after it.
+
+On startup `recover()` loads the newest readable snapshot and replays the
+logs from its generation onwards. A line torn by a crash is skipped. Writing
+then continues in a fresh generation. Up to `flush_interval` seconds of
+events can be lost on a crash; `fsync=True` also protects the flushed ones
+against power loss.
+
+Run `python session_journal.py` to measure the per-message overhead the
+journal adds to `append()` and the recovery time for a large store.
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from typing import Dict, List, Optional
+
+from metrics import MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = 1.0
+SNAPSHOT_INTERVAL = 300.0
+_FILE_PATTERN = re.compile(r"^(journal|snapshot)-(\d+)\.(jsonl|json)$")
+
+
+def _encode(event: List) -> str:
+    return json.dumps(event, ensure_ascii=False, separators=(",", ":"))
+
+
+class SessionJournal:
+    """Append-only event log plus periodic snapshots for a SessionStore"""
+
+    def __init__(self, directory: str, flush_interval: float = FLUSH_INTERVAL,
+                 snapshot_interval: float = SNAPSHOT_INTERVAL, fsync: bool = False,
+                 metrics: Optional[MetricsRegistry] = None):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.snapshot_interval = snapshot_interval
+        self.fsync = fsync
+        self.generation = 1
+        self.pending: List[List] = []
+        self.task: Optional[asyncio.Task] = None
+        self._file = None
+        self._file_generation = None
+        self.events_written = 0
+        self.bytes_written = 0
+        self.snapshots = 0
+        self.last_recovery: Dict = {}
+        os.makedirs(directory, exist_ok=True)
+
+        self.events_counter = self.flush_histogram = self.snapshot_histogram = None
+        if metrics is not None:
+            self.events_counter = metrics.counter("session_journal_events_total", "Session events written to the journal")
+            self.flush_histogram = metrics.histogram(
+                "session_journal_flush_seconds", "Time to write a batch of session events"
+            )
+            self.snapshot_histogram = metrics.histogram(
+                "session_journal_snapshot_seconds", "Time to write a session store snapshot",
+                buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+            )
+
+    def _path(self, kind: str, generation: int) -> str:
+        extension = "jsonl" if kind == "journal" else "json"
+        return os.path.join(self.directory, f"{kind}-{generation:08d}.{extension}")
+
+    def _generations(self, kind: str) -> List[int]:
+        return sorted(
+            int(match.group(2)) for match in map(_FILE_PATTERN.match, os.listdir(self.directory))
+            if match and match.group(1) == kind
+        )
+
+    def record(self, event: List):
+        """Queue an event; called by the store on every change"""
+        self.pending.append(event)
+
+    def _write(self, generation: int, events: List[List]):
+        """Blocking: append events to the log of `generation`"""
+        if self._file_generation != generation:
+            if self._file is not None:
+                self._file.close()
+            self._file = open(self._path("journal", generation), "a", encoding="utf-8")
+            self._file_generation = generation
+        data = "".join(_encode(event) + "\n" for event in events)
+        self._file.write(data)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self.events_written += len(events)
+        self.bytes_written += len(data)
+
+    async def flush(self):
+        """Write the events recorded so far to the current log"""
+        events, self.pending = self.pending, []
+        if not events:
+            return
+        start_time = time.perf_counter()
+        await asyncio.to_thread(self._write, self.generation, events)
+        if self.events_counter is not None:
+            self.events_counter.inc(len(events))
+            self.flush_histogram.observe(time.perf_counter() - start_time)
+
+    def _write_snapshot(self, generation: int, rows: List[List]):
+        """Blocking: write the snapshot atomically, then delete what it supersedes"""
+        path = self._path("snapshot", generation)
+        temporary = path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as snapshot:
+            json.dump({"generation": generation, "created_at": time.time(), "sessions": rows},
+                      snapshot, ensure_ascii=False, separators=(",", ":"))
+            snapshot.flush()
+            os.fsync(snapshot.fileno())
+        os.replace(temporary, path)
+        for kind in ("journal", "snapshot"):
+            for old in self._generations(kind):
+                if old < generation:
+                    os.remove(self._path(kind, old))
+
+    async def snapshot(self, store):
+        """Compact the journal: snapshot the store and start a new log generation"""
+        await self.flush()
+        start_time = time.perf_counter()
+        # No await between here and the generation switch: the snapshot holds exactly
+        # the events logged to the old generation plus those still pending
+        rows = store.export_state()
+        carried, self.pending = self.pending, []
+        previous, self.generation = self.generation, self.generation + 1
+        if carried:
+            await asyncio.to_thread(self._write, previous, carried)
+        await asyncio.to_thread(self._write_snapshot, self.generation, rows)
+        self.snapshots += 1
+        if self.snapshot_histogram is not None:
+            self.snapshot_histogram.observe(time.perf_counter() - start_time)
+        logger.info(f"Session snapshot {self.generation}: {len(rows)} sessions in "
+                    f"{time.perf_counter() - start_time:.3f}s")
+
+    def recover(self, store) -> Dict:
+        """
+        Blocking: rebuild `store` from the newest readable snapshot and the logs
+        after it. Call before the store serves requests.
+        """
+        start_time = time.perf_counter()
+        base, rows = 0, []
+        for generation in reversed(self._generations("snapshot")):
+            try:
+                with open(self._path("snapshot", generation), encoding="utf-8") as snapshot:
+                    rows = json.load(snapshot)["sessions"]
+                base = generation
+                break
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Skipping unreadable session snapshot {generation}: {e}")
+        store.restore(rows)
+        snapshot_seconds = time.perf_counter() - start_time
+
+        events = skipped = 0
+        logs = [generation for generation in self._generations("journal") if generation >= base]
+        for generation in logs:
+            with open(self._path("journal", generation), encoding="utf-8") as log:
+                for line in log:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        skipped += 1  # Torn write at a crash
+                        continue
+                    store.apply(event)
+                    events += 1
+
+        # Never append to a log that may end in a torn line
+        self.generation = max([base] + logs) + 1
+        self.last_recovery = {
+            "sessions": len(rows),
+            "snapshot_generation": base or None,
+            "snapshot_seconds": round(snapshot_seconds, 3),
+            "events_replayed": events,
+            "lines_skipped": skipped,
+            "seconds": round(time.perf_counter() - start_time, 3)
+        }
+        return self.last_recovery
+
+    async def run(self, store):
+        """Flush every `flush_interval` seconds and snapshot every `snapshot_interval`"""
+        last_snapshot = time.monotonic()
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                if time.monotonic() - last_snapshot >= self.snapshot_interval:
+                    await self.snapshot(store)
+                    last_snapshot = time.monotonic()
+                else:
+                    await self.flush()
+            except Exception as e:
+                logger.warning(f"Session journal write failed: {e}")
+
+    def start(self, store):
+        store.journal = self
+        self.task = asyncio.create_task(self.run(store))
+
+    async def close(self, store):
+        """Stop the background task and leave a snapshot, so the next start replays nothing"""
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        await self.snapshot(store)
+        if self._file is not None:
+            self._file.close()
+            self._file, self._file_generation = None, None
+
+    def stats(self) -> Dict:
+        return {
+            "directory": self.directory,
+            "generation": self.generation,
+            "pending_events": len(self.pending),
+            "events_written": self.events_written,
+            "bytes_written": self.bytes_written,
+            "snapshots": self.snapshots,
+            "last_recovery": self.last_recovery
+        }
+
+
+async def _benchmark(sessions: int = 2000, turns: int = 25):
+    import shutil
+    import tempfile
+
+    from sessions import SessionStore
+
+    directory = tempfile.mkdtemp()
+    exchange = [
+        {"role": "user", "message": "I have been feeling anxious about work and I can't sleep well.", "language": "en"},
+        {"role": "assistant", "message": "That sounds stressful. Writing tomorrow's tasks down before bed "
+                                         "can help your mind let go of them.", "language": "en"}
+    ]
+
+    async def fill(store) -> float:
+        start_time = time.perf_counter()
+        for turn in range(turns):
+            for i in range(sessions):
+                await store.append(f"session-{i}", exchange)
+        return time.perf_counter() - start_time
+
+    messages = sessions * turns * len(exchange)
+    plain = await fill(SessionStore(max_sessions=sessions))
+
+    store = SessionStore(max_sessions=sessions)
+    journal = SessionJournal(directory)
+    store.journal = journal
+    journaled = await fill(store)
+    flush_start = time.perf_counter()
+    await journal.flush()
+    flush_seconds = time.perf_counter() - flush_start
+    print(f"{messages} messages in {sessions} sessions")
+    print(f"  append: {plain / messages * 1e6:.1f} us/message without journal, "
+          f"{journaled / messages * 1e6:.1f} us/message with journal (request path)")
+    print(f"  background flush: {flush_seconds / messages * 1e6:.1f} us/message, "
+          f"{journal.bytes_written / messages:.0f} bytes/message")
+
+    recovered = SessionStore(max_sessions=sessions)
+    info = SessionJournal(directory).recover(recovered)
+    print(f"  recovery from log only: {info['seconds'] * 1000:.0f} ms ({info['events_replayed']} events)")
+
+    await journal.snapshot(store)
+    recovered = SessionStore(max_sessions=sessions)
+    info = SessionJournal(directory).recover(recovered)
+    print(f"  recovery from snapshot: {info['seconds'] * 1000:.0f} ms ({info['sessions']} sessions, "
+          f"{sum(len(session.messages) for session in recovered._sessions.values())} messages)")
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(_benchmark())
@@ -0,0 +1,773 @@
+# sessions.py
+"""
+Conversation session storage for the servers.
+
+`SessionStore` keeps sessions in process memory within fixed bounds:
+  - sessions idle for longer than `ttl` seconds are dropped,
+  - at most `max_sessions` are kept; creating one more evicts the least
+    recently active session,
+  - each session retains its last `max_messages` messages.
+
+Sessions are held in an OrderedDict in order of last activity, so expiry and
+LRU eviction only ever look at the oldest entries and cost O(evicted), not
+O(sessions). Messages are stored as compact tuples with float timestamps and
+rendered as dicts (ISO timestamps) when read. Memory use is estimated
+incrementally and reported by `stats()`.
+
+Listing is paginated in creation order with an opaque cursor, through an
+index kept sorted by creation (a list searched with bisect in memory, a sorted
+set in Redis), so a page costs O(log n + page size) however many sessions
+exist. Pages and single sessions can be projected to metadata only, or carry
+just the last N messages or those after a timestamp.
+
+`RedisSessionStore` implements the same interface on Redis so that every
+uvicorn worker sees the same sessions:
+  session:<id>:meta      hash  created_at, last_active, language
+  session:<id>:messages  list  JSON messages, appended with RPUSH and cut
+                               to the last `max_messages` with LTRIM
+  sessions:active        zset  session id scored by last activity (the index
+                               used for idle pruning and LRU eviction)
+  sessions:created       zset  session id scored by creation time (the index
+                               used for paginated listing)
+  session:<id>:summary   hash  text and until: the conversation summary
+                               (see conversation_memory.py) and the timestamp
+                               of the newest message folded into it
+  sessions:stats         hash  sessions created and messages added per
+                               role and language, shared by all workers
+Each append is one pipelined MULTI/EXEC round trip that also refreshes the
+keys' expiry, so idle sessions disappear even if no worker prunes them.
+
+Both stores count sessions created and messages added (by role and language)
+as they are written, so `stats()` never walks the stored sessions.
+
+`SessionStore` survives restarts through a write-behind journal (see
+session_journal.py): every change is handed to `journal.record()` as a small
+event list, and `apply()`, `export_state()` and `restore()` rebuild the store
+from a snapshot plus the events written after it.
+
+Run `python sessions.py` to benchmark per-message append latency of both
+stores (Redis at REDIS_HOST, or fakeredis when no server is configured).
+"""
+import asyncio
+import base64
+import bisect
+import json
+import os
+import sys
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Deque, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from metrics import MetricsRegistry
+
+SESSION_TTL = 24 * 3600
+MAX_SESSIONS = 10000
+MAX_MESSAGES_PER_SESSION = 200
+MAX_PAGE_SIZE = 1000  # Largest page of sessions served at once
+
+# Approximate bytes per stored message beyond its text (tuple, float, deque slot)
+# and per session beyond its messages (record, deque, dict entry, id string)
+MESSAGE_OVERHEAD = 120
+SESSION_OVERHEAD = 900
+
+Message = Tuple[str, str, float, str]  # (role, message, timestamp, language)
+
+
+def encode_cursor(position: float, session_id: str) -> str:
+    """Opaque cursor for the page after the session at `position` in the index"""
+    return base64.urlsafe_b64encode(json.dumps([position, session_id]).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[float, str]:
+    """Raises ValueError for a malformed cursor"""
+    try:
+        position, session_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return float(position), str(session_id)
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+
+def parse_since(value: str) -> float:
+    """Unix timestamp from a `since` query value (seconds since the epoch, or ISO 8601)"""
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise ValueError(f"Invalid timestamp: {value} (expected epoch seconds or ISO 8601)")
+
+
+def select_messages(messages: Sequence[Message], last: Optional[int] = None,
+                    since: Optional[float] = None) -> List[Message]:
+    """
+    Messages after `since` (a Unix timestamp), at most the `last` N of them.
+    Walks back from the newest message, so the cost is O(result), not O(history).
+    """
+    if last is None and since is None:
+        return list(messages)
+    selected = []
+    for message in reversed(messages):
+        if (since is not None and message[2] <= since) or (last is not None and len(selected) >= last):
+            break
+        selected.append(message)
+    selected.reverse()
+    return selected
+
+
+def message_dict(message: Message) -> Dict:
+    role, text, timestamp, language = message
+    return {
+        "role": role,
+        "message": text,
+        "timestamp": datetime.fromtimestamp(timestamp).isoformat(),
+        "language": language
+    }
+
+
+def message_tuple(message: Dict) -> Message:
+    """Compact form of a {"role", "message", "language"[, "timestamp"]} dict"""
+    timestamp = message.get("timestamp")
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp).timestamp()
+    return (
+        sys.intern(message["role"]),
+        message["message"],
+        timestamp if timestamp is not None else time.time(),
+        sys.intern(message.get("language") or "en")
+    )
+
+
+def _restored(message: Sequence) -> Message:
+    """Message tuple from its serialized [role, message, timestamp, language] form"""
+    role, text, timestamp, language = message
+    return sys.intern(role), text, timestamp, sys.intern(language)
+
+
+def _message_bytes(message: Message) -> int:
+    return MESSAGE_OVERHEAD + sys.getsizeof(message[1])
+
+
+def _write_stats(created: int, messages: Dict[Tuple[str, str], int]) -> Dict:
+    """Sessions created and messages added, broken down by role and by language"""
+    by_role, by_language = {}, {}
+    for (role, language), count in messages.items():
+        by_role[role] = by_role.get(role, 0) + count
+        by_language[language] = by_language.get(language, 0) + count
+    return {
+        "sessions_created": created,
+        "messages_added": sum(messages.values()),
+        "messages_by_role": by_role,
+        "messages_by_language": by_language
+    }
+
+
+class _WriteCounters:
+    """Sessions created and messages added, counted as they are written"""
+
+    def __init__(self, metrics: Optional[MetricsRegistry] = None):
+        self.created = 0
+        self.messages: Dict[Tuple[str, str], int] = {}  # (role, language) -> messages added
+        self.created_counter = self.messages_counter = None
+        if metrics is not None:
+            self.created_counter = metrics.counter("sessions_created_total", "Sessions created")
+            self.messages_counter = metrics.counter(
+                "session_messages_total", "Messages added to sessions", ["role", "language"]
+            )
+
+    def session_created(self):
+        self.created += 1
+        if self.created_counter is not None:
+            self.created_counter.inc()
+
+    def messages_added(self, messages: Iterable[Message]):
+        for role, _, _, language in messages:
+            self.messages[(role, language)] = self.messages.get((role, language), 0) + 1
+            if self.messages_counter is not None:
+                self.messages_counter.inc(role=role, language=language)
+
+    def stats(self) -> Dict:
+        return _write_stats(self.created, self.messages)
+
+
+class _Session:
+    __slots__ = ("seq", "created_at", "last_active", "language", "messages", "bytes", "summary", "summary_until")
+
+    def __init__(self, seq: int, language: str, max_messages: int, now: float):
+        self.seq = seq  # Position in the creation index
+        self.created_at = now
+        self.last_active = now
+        self.language = language
+        self.messages: Deque[Message] = deque(maxlen=max_messages)
+        self.bytes = SESSION_OVERHEAD
+        self.summary = ""  # Conversation summary of the turns before the recent ones
+        self.summary_until: Optional[str] = None
+
+
+class SessionStore:
+    """Bounded in-memory session store with idle expiry and LRU eviction"""
+
+    def __init__(self, max_sessions: int = MAX_SESSIONS, ttl: float = SESSION_TTL,
+                 max_messages: int = MAX_MESSAGES_PER_SESSION, metrics: Optional[MetricsRegistry] = None):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_messages = max_messages
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        # (seq, session id) in creation order; dropped sessions are skipped and compacted lazily
+        self._created: List[Tuple[int, str]] = []
+        self._seq = 0
+        self._dead = 0
+        self.bytes = 0
+        self.messages = 0
+        self.evictions = {"idle": 0, "capacity": 0}
+        self.trimmed_messages = 0
+        self.counters = _WriteCounters(metrics)
+        self.journal = None  # Receives every change as an event; see session_journal.py
+
+        self.sessions_gauge = self.bytes_gauge = self.evictions_counter = None
+        if metrics is not None:
+            self.sessions_gauge = metrics.gauge("session_store_sessions", "Sessions held by the session store")
+            self.bytes_gauge = metrics.gauge("session_store_bytes", "Estimated memory used by stored sessions")
+            self.evictions_counter = metrics.counter(
+                "session_evictions_total", "Sessions dropped by the session store", ["reason"]
+            )
+
+    def _drop(self, session_id: str, reason: Optional[str] = None):
+        session = self._sessions.pop(session_id)
+        self.bytes -= session.bytes
+        self.messages -= len(session.messages)
+        self._dead += 1
+        if self._dead > 64 and self._dead > len(self._created) // 2:
+            self._created = [(seq, sid) for seq, sid in self._created if self._indexed(seq, sid)]
+            self._dead = 0
+        if reason:
+            self.evictions[reason] += 1
+            if self.evictions_counter is not None:
+                self.evictions_counter.inc(reason=reason)
+
+    def _expire(self, now: float):
+        """Drop sessions idle for longer than the TTL (the oldest come first)"""
+        cutoff = now - self.ttl
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session.last_active > cutoff:
+                break
+            self._drop(session_id, "idle")
+
+    def _indexed(self, seq: int, session_id: str) -> bool:
+        session = self._sessions.get(session_id)
+        return session is not None and session.seq == seq
+
+    def _live(self, session_id: str) -> Optional[_Session]:
+        self._expire(time.time())
+        return self._sessions.get(session_id)
+
+    def _update_gauges(self):
+        if self.sessions_gauge is not None:
+            self.sessions_gauge.set(len(self._sessions))
+            self.bytes_gauge.set(self.bytes)
+
+    def _create(self, session_id: str, language: str, now: float, count: bool = True) -> _Session:
+        while len(self._sessions) >= self.max_sessions:
+            self._drop(next(iter(self._sessions)), "capacity")
+        self._seq += 1
+        session = _Session(self._seq, language, self.max_messages, now)
+        session.bytes += sys.getsizeof(session_id)
+        self._sessions[session_id] = session
+        self._created.append((self._seq, session_id))
+        self.bytes += session.bytes
+        if count:
+            self.counters.session_created()
+        return session
+
+    def _add_messages(self, session_id: str, session: _Session, messages: Iterable[Message], now: float):
+        for stored in messages:
+            if len(session.messages) == session.messages.maxlen:
+                dropped = session.messages[0]
+                session.bytes -= _message_bytes(dropped)
+                self.bytes -= _message_bytes(dropped)
+                self.messages -= 1
+                self.trimmed_messages += 1
+            session.messages.append(stored)
+            session.bytes += _message_bytes(stored)
+            self.bytes += _message_bytes(stored)
+            self.messages += 1
+        session.last_active = now
+        self._sessions.move_to_end(session_id)
+
+    def _set_summary(self, session: _Session, summary: str, until: Optional[str]):
+        size_change = sys.getsizeof(summary) - sys.getsizeof(session.summary)
+        session.summary, session.summary_until = summary, until
+        session.bytes += size_change
+        self.bytes += size_change
+
+    async def ensure(self, session_id: str, language: str = "en") -> bool:
+        """Create the session if it does not exist; returns True when it was created"""
+        now = time.time()
+        self._expire(now)
+        if session_id in self._sessions:
+            return False
+        self._create(session_id, language, now)
+        if self.journal is not None:
+            self.journal.record(["create", session_id, now, language])
+        self._update_gauges()
+        return True
+
+    async def append(self, session_id: str, messages: Iterable[Dict], language: str = "en"):
+        """
+        Append messages ({"role", "message", "language"}) and mark the session
+        active. A session that expired or was evicted meanwhile is recreated.
+        """
+        now = time.time()
+        self._expire(now)
+        session = self._sessions.get(session_id) or self._create(session_id, language, now)
+        stored = [message_tuple(message) for message in messages]
+        self._add_messages(session_id, session, stored, now)
+        self.counters.messages_added(stored)
+        if self.journal is not None:
+            self.journal.record(["append", session_id, now, language, stored])
+        self._update_gauges()
+
+    def _metadata(self, session_id: str, session: _Session) -> Dict:
+        return {
+            "session_id": session_id,
+            "created_at": datetime.fromtimestamp(session.created_at).isoformat(),
+            "last_active": datetime.fromtimestamp(session.last_active).isoformat(),
+            "message_count": len(session.messages),
+            "language": session.language
+        }
+
+    def _project(self, session_id: str, session: _Session, messages: bool,
+                 last: Optional[int], since: Optional[float]) -> Dict:
+        result = self._metadata(session_id, session)
+        if messages:
+            result["messages"] = [message_dict(m) for m in select_messages(session.messages, last, since)]
+        return result
+
+    async def get(self, session_id: str, messages: bool = True, last: Optional[int] = None,
+                  since: Optional[float] = None) -> Optional[Dict]:
+        """
+        Metadata plus (unless `messages` is False) the retained messages, limited
+        to the `last` N and/or those after `since`; None if there is no such
+        session. Reading does not count as activity.
+        """
+        session = self._live(session_id)
+        if session is None:
+            return None
+        return self._project(session_id, session, messages, last, since)
+
+    async def page(self, cursor: Optional[str] = None, limit: int = 100, messages: bool = False,
+                   last: Optional[int] = None, since: Optional[float] = None) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Up to `limit` sessions in creation order, starting after `cursor`, and the
+        cursor of the next page (None on the last page). Raises ValueError for a bad cursor.
+        """
+        self._expire(time.time())
+        start = 0
+        if cursor:
+            after, _ = decode_cursor(cursor)
+            start = bisect.bisect_right(self._created, (int(after), "\U0010ffff"))
+        results, last_position, next_cursor = [], None, None
+        for index in range(start, len(self._created)):
+            seq, session_id = self._created[index]
+            if not self._indexed(seq, session_id):
+                continue
+            if len(results) == limit:
+                next_cursor = encode_cursor(*last_position)
+                break
+            results.append(self._project(session_id, self._sessions[session_id], messages, last, since))
+            last_position = (seq, session_id)
+        return results, next_cursor
+
+    async def get_summary(self, session_id: str) -> Tuple[str, Optional[str]]:
+        """The conversation summary and the timestamp of the newest message folded into it"""
+        session = self._live(session_id)
+        return (session.summary, session.summary_until) if session else ("", None)
+
+    async def set_summary(self, session_id: str, summary: str, until: Optional[str]):
+        session = self._live(session_id)
+        if session is None:
+            return
+        self._set_summary(session, summary, until)
+        if self.journal is not None:
+            self.journal.record(["summary", session_id, time.time(), summary, until])
+        self._update_gauges()
+
+    async def delete(self, session_id: str) -> bool:
+        if self._live(session_id) is None:
+            return False
+        self._drop(session_id)
+        if self.journal is not None:
+            self.journal.record(["delete", session_id, time.time()])
+        self._update_gauges()
+        return True
+
+    def apply(self, event: List):
+        """
+        Replay a journal event without journaling it again. Expiry runs at the
+        event's time first, so idle sessions drop out exactly as they did live.
+        """
+        kind, session_id, now = event[0], event[1], event[2]
+        self._expire(now)
+        session = self._sessions.get(session_id)
+        if kind == "create" and session is None:
+            self._create(session_id, event[3], now, count=False)
+        elif kind == "append":
+            session = session or self._create(session_id, event[3], now, count=False)
+            self._add_messages(session_id, session, [_restored(message) for message in event[4]], now)
+        elif kind == "summary" and session is not None:
+            self._set_summary(session, event[3], event[4])
+        elif kind == "delete" and session is not None:
+            self._drop(session_id)
+        self._update_gauges()
+
+    def export_state(self) -> List[List]:
+        """
+        Every session as [id, seq, created_at, last_active, language, summary,
+        summary_until, messages], least recently active first. Messages are
+        immutable tuples, so the rows can be serialized on another thread.
+        """
+        return [
+            [session_id, session.seq, session.created_at, session.last_active, session.language,
+             session.summary, session.summary_until, tuple(session.messages)]
+            for session_id, session in self._sessions.items()
+        ]
+
+    def restore(self, rows: Iterable[Sequence]):
+        """Replace the contents of the store with rows from `export_state()`"""
+        self._sessions.clear()
+        self._created, self._dead = [], 0
+        self.bytes = self.messages = 0
+        for session_id, seq, created_at, last_active, language, summary, until, messages in rows:
+            session = _Session(seq, language, self.max_messages, created_at)
+            session.bytes += sys.getsizeof(session_id)
+            self._sessions[session_id] = session
+            self.bytes += session.bytes
+            self._add_messages(session_id, session, [_restored(message) for message in messages], last_active)
+            self._set_summary(session, summary, until)
+            self._created.append((seq, session_id))
+        self._created.sort()
+        self._seq = self._created[-1][0] if self._created else 0
+        self._update_gauges()
+
+    async def stats(self) -> Dict:
+        self._expire(time.time())
+        self._update_gauges()
+        return {
+            "backend": "memory",
+            "sessions": len(self._sessions),
+            "messages": self.messages,
+            **self.counters.stats(),
+            "estimated_bytes": self.bytes,
+            "max_sessions": self.max_sessions,
+            "ttl_seconds": self.ttl,
+            "max_messages_per_session": self.max_messages,
+            "evictions": dict(self.evictions),
+            "trimmed_messages": self.trimmed_messages
+        }
+
+
+REDIS_KEY_PREFIX = "session:"
+REDIS_INDEX_KEY = "sessions:active"
+REDIS_CREATED_KEY = "sessions:created"
+REDIS_STATS_KEY = "sessions:stats"
+
+
+def _text(value) -> Optional[str]:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+class RedisSessionStore:
+    """Session store shared by all workers through Redis"""
+
+    def __init__(self, client, max_sessions: int = MAX_SESSIONS, ttl: float = SESSION_TTL,
+                 max_messages: int = MAX_MESSAGES_PER_SESSION, metrics: Optional[MetricsRegistry] = None):
+        self.client = client
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.expire_seconds = max(int(ttl + 0.999), 1)  # Redis EXPIRE takes whole seconds
+        self.max_messages = max_messages
+        self.evictions = {"idle": 0, "capacity": 0}
+        self.counters = _WriteCounters(metrics)  # This worker's writes, for /metrics
+
+        self.evictions_counter = None
+        if metrics is not None:
+            self.evictions_counter = metrics.counter(
+                "session_evictions_total", "Sessions dropped by the session store", ["reason"]
+            )
+
+    @staticmethod
+    def _meta_key(session_id: str) -> str:
+        return f"{REDIS_KEY_PREFIX}{session_id}:meta"
+
+    @staticmethod
+    def _messages_key(session_id: str) -> str:
+        return f"{REDIS_KEY_PREFIX}{session_id}:messages"
+
+    @staticmethod
+    def _summary_key(session_id: str) -> str:
+        return f"{REDIS_KEY_PREFIX}{session_id}:summary"
+
+    def _session_keys(self, session_id: str) -> Tuple[str, str, str]:
+        return self._meta_key(session_id), self._messages_key(session_id), self._summary_key(session_id)
+
+    def _count_evictions(self, reason: str, count: int):
+        if count:
+            self.evictions[reason] += count
+            if self.evictions_counter is not None:
+                self.evictions_counter.inc(count, reason=reason)
+
+    async def _prune(self, now: float):
+        """Drop idle sessions from the indexes (their keys expire on their own)"""
+        idle = await self.client.zrangebyscore(REDIS_INDEX_KEY, "-inf", now - self.ttl)
+        if not idle:
+            return
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.zrem(REDIS_INDEX_KEY, *idle)
+            pipe.zrem(REDIS_CREATED_KEY, *idle)
+            removed, _ = await pipe.execute()
+        self._count_evictions("idle", removed)
+
+    async def _count_created(self):
+        self.counters.session_created()
+        await self.client.hincrby(REDIS_STATS_KEY, "created", 1)
+
+    async def _enforce_capacity(self):
+        excess = await self.client.zcard(REDIS_INDEX_KEY) - self.max_sessions
+        if excess <= 0:
+            return
+        evicted = [_text(member) for member, _ in await self.client.zpopmin(REDIS_INDEX_KEY, excess)]
+        if evicted:
+            async with self.client.pipeline(transaction=True) as pipe:
+                pipe.zrem(REDIS_CREATED_KEY, *evicted)
+                pipe.delete(*[key for session_id in evicted for key in self._session_keys(session_id)])
+                await pipe.execute()
+        self._count_evictions("capacity", len(evicted))
+
+    def _touch(self, pipe, session_id: str, language: str, now: float):
+        meta_key = self._meta_key(session_id)
+        pipe.hsetnx(meta_key, "created_at", now)
+        pipe.hsetnx(meta_key, "language", language)
+        pipe.hset(meta_key, "last_active", now)
+        pipe.expire(meta_key, self.expire_seconds)
+        pipe.zadd(REDIS_INDEX_KEY, {session_id: now})
+        pipe.zadd(REDIS_CREATED_KEY, {session_id: now}, nx=True)
+
+    async def ensure(self, session_id: str, language: str = "en") -> bool:
+        now = time.time()
+        async with self.client.pipeline(transaction=True) as pipe:
+            self._touch(pipe, session_id, language, now)
+            created = (await pipe.execute())[0]
+        if created:
+            await self._count_created()
+            await self._prune(now)
+            await self._enforce_capacity()
+        return bool(created)
+
+    async def append(self, session_id: str, messages: Iterable[Dict], language: str = "en"):
+        now = time.time()
+        stored = [message_tuple(message) for message in messages]
+        encoded = [json.dumps(list(message), ensure_ascii=False) for message in stored]
+        messages_key = self._messages_key(session_id)
+        async with self.client.pipeline(transaction=True) as pipe:
+            self._touch(pipe, session_id, language, now)
+            if encoded:
+                pipe.rpush(messages_key, *encoded)
+                pipe.ltrim(messages_key, -self.max_messages, -1)
+            pipe.expire(messages_key, self.expire_seconds)
+            pipe.expire(self._summary_key(session_id), self.expire_seconds)
+            for role, _, _, message_language in stored:
+                pipe.hincrby(REDIS_STATS_KEY, f"messages:{role}:{message_language}", 1)
+            created = (await pipe.execute())[0]
+        self.counters.messages_added(stored)
+        if created:
+            await self._count_created()
+            await self._enforce_capacity()
+
+    def _metadata(self, session_id: str, meta: Dict, message_count: int) -> Dict:
+        meta = {_text(key): _text(value) for key, value in meta.items()}
+        return {
+            "session_id": session_id,
+            "created_at": datetime.fromtimestamp(float(meta["created_at"])).isoformat(),
+            "last_active": datetime.fromtimestamp(float(meta["last_active"])).isoformat(),
+            "message_count": message_count,
+            "language": meta.get("language", "en")
+        }
+
+    def _queue_read(self, pipe, session_id: str, messages: bool, last: Optional[int]):
+        pipe.hgetall(self._meta_key(session_id))
+        pipe.llen(self._messages_key(session_id))
+        if messages:
+            # Lists are capped at max_messages, so filtering by `since` afterwards stays bounded
+            pipe.lrange(self._messages_key(session_id), -last if last is not None else 0, -1)
+
+    def _project(self, session_id: str, meta: Dict, count: int, raw_messages: Optional[List],
+                 last: Optional[int], since: Optional[float]) -> Dict:
+        result = self._metadata(session_id, meta, count)
+        if raw_messages is not None:
+            stored = [tuple(json.loads(raw)) for raw in raw_messages]
+            result["messages"] = [message_dict(m) for m in select_messages(stored, last, since)]
+        return result
+
+    async def get(self, session_id: str, messages: bool = True, last: Optional[int] = None,
+                  since: Optional[float] = None) -> Optional[Dict]:
+        async with self.client.pipeline(transaction=False) as pipe:
+            self._queue_read(pipe, session_id, messages, last)
+            results = await pipe.execute()
+        if not results[0]:
+            return None
+        return self._project(session_id, results[0], results[1], results[2] if messages else None, last, since)
+
+    async def page(self, cursor: Optional[str] = None, limit: int = 100, messages: bool = False,
+                   last: Optional[int] = None, since: Optional[float] = None) -> Tuple[List[Dict], Optional[str]]:
+        await self._prune(time.time())
+        after = decode_cursor(cursor) if cursor else None
+        # Members with equal scores are ordered by id, so (score, id) is a total order; fetch
+        # from the cursor's score and skip what the previous page already returned
+        candidates, offset = [], 0
+        while len(candidates) <= limit:
+            batch = await self.client.zrangebyscore(
+                REDIS_CREATED_KEY, after[0] if after else "-inf", "+inf",
+                start=offset, num=limit + 1 - len(candidates) + 8, withscores=True
+            )
+            if not batch:
+                break
+            offset += len(batch)
+            candidates += [(score, _text(member)) for member, score in batch
+                           if after is None or (score, _text(member)) > after]
+        has_more = len(candidates) > limit
+        candidates = candidates[:limit]
+
+        async with self.client.pipeline(transaction=False) as pipe:
+            for _, session_id in candidates:
+                self._queue_read(pipe, session_id, messages, last)
+            results = await pipe.execute()
+        width = 3 if messages else 2
+        sessions = [
+            self._project(session_id, results[i * width], results[i * width + 1],
+                          results[i * width + 2] if messages else None, last, since)
+            for i, (_, session_id) in enumerate(candidates)
+            if results[i * width]  # Keys already expired; the index catches up on the next prune
+        ]
+        next_cursor = encode_cursor(*candidates[-1]) if has_more else None
+        return sessions, next_cursor
+
+    async def get_summary(self, session_id: str) -> Tuple[str, Optional[str]]:
+        text, until = await self.client.hmget(self._summary_key(session_id), "text", "until")
+        return _text(text) or "", _text(until) or None
+
+    async def set_summary(self, session_id: str, summary: str, until: Optional[str]):
+        summary_key = self._summary_key(session_id)
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.hset(summary_key, mapping={"text": summary, "until": until or ""})
+            pipe.expire(summary_key, self.expire_seconds)
+            await pipe.execute()
+
+    async def delete(self, session_id: str) -> bool:
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.delete(*self._session_keys(session_id))
+            pipe.zrem(REDIS_INDEX_KEY, session_id)
+            pipe.zrem(REDIS_CREATED_KEY, session_id)
+            deleted, _, _ = await pipe.execute()
+        return deleted > 0
+
+    async def stats(self) -> Dict:
+        """Counters shared by all workers; O(1) in the number of sessions besides pruning"""
+        await self._prune(time.time())
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.zcard(REDIS_INDEX_KEY)
+            pipe.hgetall(REDIS_STATS_KEY)
+            sessions, counters = await pipe.execute()
+        counters = {_text(field): int(value) for field, value in counters.items()}
+        messages = {}
+        for field, count in counters.items():
+            if field.startswith("messages:"):
+                _, role, language = field.split(":", 2)
+                messages[(role, language)] = count
+        try:
+            used_memory = (await self.client.info("memory")).get("used_memory")
+        except Exception:
+            used_memory = None
+        return {
+            "backend": "redis",
+            "sessions": sessions,
+            **_write_stats(counters.get("created", 0), messages),
+            "redis_used_memory_bytes": used_memory,
+            "max_sessions": self.max_sessions,
+            "ttl_seconds": self.ttl,
+            "max_messages_per_session": self.max_messages,
+            "evictions": dict(self.evictions)
+        }
+
+
+async def _benchmark(messages: int = 2000):
+    import redis.asyncio as redis
+
+    if os.getenv("REDIS_HOST"):
+        client = redis.Redis(
+            host=os.getenv("REDIS_HOST"), port=int(os.getenv("REDIS_PORT", 6379)),
+            username=os.getenv("REDIS_USERNAME"), password=os.getenv("REDIS_PASSWORD")
+        )
+        label = f"redis at {os.getenv('REDIS_HOST')}"
+    else:
+        import fakeredis
+        client = fakeredis.aioredis.FakeRedis()
+        label = "fakeredis (in-process; set REDIS_HOST for network round trips)"
+
+    exchange = [
+        {"role": "user", "message": "I have been feeling anxious before work lately.", "language": "en"},
+        {"role": "assistant", "message": "That sounds hard. Would a short breathing exercise help?", "language": "en"},
+    ]
+
+    async def unpipelined_append(session_id: str):
+        # The same writes as RedisSessionStore.append, one round trip each
+        now = time.time()
+        meta_key, messages_key = f"naive:{session_id}:meta", f"naive:{session_id}:messages"
+        await client.hsetnx(meta_key, "created_at", now)
+        await client.hsetnx(meta_key, "language", "en")
+        await client.hset(meta_key, "last_active", now)
+        await client.expire(meta_key, SESSION_TTL)
+        await client.zadd("naive:active", {session_id: now})
+        await client.rpush(messages_key, *[json.dumps(list(message_tuple(m))) for m in exchange])
+        await client.ltrim(messages_key, -MAX_MESSAGES_PER_SESSION, -1)
+        await client.expire(messages_key, SESSION_TTL)
+
+    def report(name: str, latencies: List[float]):
+        latencies.sort()
+        per_message = [latency / len(exchange) for latency in latencies]
+        print(f"  {name:>20}: p50 {per_message[len(per_message) // 2] * 1e6:.0f} us, "
+              f"p99 {per_message[int(len(per_message) * 0.99)] * 1e6:.0f} us per message")
+
+    print(f"Append latency, {messages} messages over 100 sessions, {label}:")
+    stores = {
+        "memory": SessionStore(),
+        "redis (pipelined)": RedisSessionStore(client, max_sessions=MAX_SESSIONS),
+    }
+    for name, store in stores.items():
+        latencies = []
+        for i in range(messages // len(exchange)):
+            start_time = time.perf_counter()
+            await store.append(f"bench-{i % 100}", exchange)
+            latencies.append(time.perf_counter() - start_time)
+        report(name, latencies)
+
+    latencies = []
+    for i in range(messages // len(exchange)):
+        start_time = time.perf_counter()
+        await unpipelined_append(f"bench-{i % 100}")
+        latencies.append(time.perf_counter() - start_time)
+    report("redis (unpipelined)", latencies)
+
+    stats = await stores["redis (pipelined)"].stats()
+    print(f"  redis store: {stats['sessions']} sessions, {stats['messages_added']} messages added")
+    for i in range(100):
+        await stores["redis (pipelined)"].delete(f"bench-{i}")
+        await client.delete(f"naive:bench-{i}:meta", f"naive:bench-{i}:messages")
+    await client.delete("naive:active")
+    await client.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(_benchmark())
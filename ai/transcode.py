@@ -0,0 +1,239 @@
+# transcode.py
+"""
+Low-bitrate variants of synthesized speech for clients on slow links.
+
+TTS engines produce MP3 (or WAV) at whatever bitrate they choose, typically
+32-64 kbps for speech that needs far less. `Transcoder` re-encodes a clip with
+ffmpeg into one of `FORMATS`:
+  - "opus": Ogg Opus at 16 kbps, tuned for voice
+  - "aac":  AAC-LC in an ADTS stream at 24 kbps (Safari and older iOS players)
+
+Clients ask for a variant with `?format=opus` or through the Accept header
+(`negotiate()`); variants are cached next to their source clip in the audio
+store and evicted with it.
+
+Run `python transcode.py` to compare bytes per second of speech and the CPU
+cost of each transcode against the MP3 source.
+"""
+import logging
+import os
+import shutil
+import subprocess
+import threading
+import time
+from typing import Dict, NamedTuple, Optional
+
+from metrics import MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+TRANSCODE_TIMEOUT = 60.0
+# ffmpeg CPU time for a few seconds of speech, from well under to a few hundred milliseconds
+TRANSCODE_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class AudioFormat(NamedTuple):
+    extension: str
+    media_type: str
+    ffmpeg_args: tuple
+
+
+FORMATS: Dict[str, AudioFormat] = {
+    "opus": AudioFormat(
+        "opus", "audio/ogg; codecs=opus",
+        ("-c:a", "libopus", "-b:a", "16k", "-application", "voip", "-f", "ogg")
+    ),
+    "aac": AudioFormat("aac", "audio/aac", ("-c:a", "aac", "-b:a", "24k", "-f", "adts")),
+}
+
+# Accept header media types and the variant that satisfies them (None: the source clip)
+_ACCEPT_TYPES = {
+    "audio/ogg": "opus",
+    "audio/opus": "opus",
+    "audio/aac": "aac",
+    "audio/mpeg": None,
+    "audio/mp3": None,
+}
+_SOURCE_NAMES = ("original", "source", "mp3")
+
+
+class TranscodeError(Exception):
+    """Raised when ffmpeg is missing or fails"""
+
+
+def negotiate(accept: Optional[str], requested: Optional[str] = None) -> Optional[str]:
+    """
+    The variant to serve: the `requested` format if given, else the variant
+    the Accept header explicitly prefers. Returns None for the source clip;
+    wildcards never trigger a transcode. Raises ValueError for an unknown format.
+    """
+    if requested:
+        requested = requested.lower()
+        if requested in _SOURCE_NAMES:
+            return None
+        if requested not in FORMATS:
+            raise ValueError(f"Unknown audio format: {requested} (expected one of {', '.join(FORMATS)})")
+        return requested
+
+    best, best_quality = None, 0.0
+    for item in (accept or "").split(","):
+        media_range, *params = [part.strip() for part in item.split(";")]
+        media_range = media_range.lower()
+        if media_range not in _ACCEPT_TYPES:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        variant = _ACCEPT_TYPES[media_range]
+        # Ties go to the smaller variant
+        if quality > best_quality or (quality == best_quality and quality > 0 and variant and not best):
+            best, best_quality = variant, quality
+    return best
+
+
+class Transcoder:
+    """Runs ffmpeg to produce the variants in FORMATS"""
+
+    def __init__(self, ffmpeg: Optional[str] = None, metrics: Optional[MetricsRegistry] = None):
+        self.ffmpeg = ffmpeg or os.getenv("FFMPEG_PATH") or shutil.which("ffmpeg")
+        self.transcodes = 0
+        self.failures = 0
+        self.cpu_seconds = 0.0
+        self.input_bytes = 0
+        self.output_bytes = 0
+
+        self.cpu_histogram = self.transcodes_counter = None
+        if metrics is not None:
+            self.cpu_histogram = metrics.histogram(
+                "audio_transcode_cpu_seconds", "ffmpeg CPU time per transcode", ["format"],
+                buckets=TRANSCODE_BUCKETS
+            )
+            self.transcodes_counter = metrics.counter(
+                "audio_transcodes_total", "Audio transcodes by format and outcome", ["format", "result"]
+            )
+
+    def available(self) -> bool:
+        return self.ffmpeg is not None
+
+    def transcode(self, source_path: str, output_path: str, format_name: str) -> float:
+        """
+        Blocking: write the `format_name` variant of `source_path` to
+        `output_path`. Returns the CPU seconds ffmpeg used.
+        """
+        if not self.available():
+            raise TranscodeError("ffmpeg not found")
+        audio_format = FORMATS[format_name]
+        command = [
+            self.ffmpeg, "-nostdin", "-loglevel", "error", "-y", "-i", source_path,
+            "-ac", "1", "-vn", "-map_metadata", "-1", *audio_format.ffmpeg_args, output_path
+        ]
+        start_time = time.perf_counter()
+        process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        killer = threading.Timer(TRANSCODE_TIMEOUT, process.kill)
+        killer.start()
+        try:
+            stderr = process.stderr.read()  # ffmpeg only logs errors; EOF once it exits
+            cpu_seconds = self._reap(process, time.perf_counter() - start_time)
+        finally:
+            killer.cancel()
+            process.stderr.close()
+
+        if process.returncode != 0:
+            self._count(format_name, "error")
+            raise TranscodeError(f"ffmpeg exited with {process.returncode}: {stderr.decode(errors='replace')[-500:]}")
+
+        self.transcodes += 1
+        self.cpu_seconds += cpu_seconds
+        self.input_bytes += os.path.getsize(source_path)
+        self.output_bytes += os.path.getsize(output_path)
+        self._count(format_name, "ok")
+        if self.cpu_histogram is not None:
+            self.cpu_histogram.observe(cpu_seconds, format=format_name)
+        return cpu_seconds
+
+    @staticmethod
+    def _reap(process: subprocess.Popen, wall_seconds: float) -> float:
+        """Wait for ffmpeg and return its user + system CPU time (wall time where wait4 is unavailable)"""
+        if not hasattr(os, "wait4"):
+            process.wait()
+            return wall_seconds
+        _, status, rusage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        return rusage.ru_utime + rusage.ru_stime
+
+    def _count(self, format_name: str, result: str):
+        if result != "ok":
+            self.failures += 1
+        if self.transcodes_counter is not None:
+            self.transcodes_counter.inc(format=format_name, result=result)
+
+    def stats(self) -> Dict:
+        return {
+            "available": self.available(),
+            "formats": list(FORMATS),
+            "transcodes": self.transcodes,
+            "failures": self.failures,
+            "cpu_seconds": round(self.cpu_seconds, 3),
+            "input_bytes": self.input_bytes,
+            "output_bytes": self.output_bytes,
+            "size_ratio": round(self.output_bytes / self.input_bytes, 3) if self.input_bytes else None
+        }
+
+
+def run_benchmark(seconds: float = 30.0):
+    """Bytes per second of speech and transcode CPU cost for each variant"""
+    import tempfile
+
+    transcoder = Transcoder()
+    if not transcoder.available():
+        print("ffmpeg not found; install it (or set FFMPEG_PATH) to run the benchmark")
+        return
+
+    directory = tempfile.mkdtemp()
+    source = os.path.join(directory, "speech.mp3")
+    try:
+        from gtts import gTTS
+        text = ("Take a slow, deep breath. It is okay to ask for help when things feel overwhelming. "
+                "If you are in crisis, please call or text 988. ") * 4
+        gTTS(text=text, lang="en").save(source)
+        label = "gTTS speech"
+    except Exception:
+        # Offline: a voice-band test signal at the bitrate gTTS produces (32 kbps, 24 kHz mono)
+        subprocess.run([
+            transcoder.ffmpeg, "-nostdin", "-loglevel", "error", "-y", "-f", "lavfi",
+            "-i", f"sine=frequency=220:beep_factor=4:duration={seconds}",
+            "-ar", "24000", "-ac", "1", "-b:a", "32k", source
+        ], check=True)
+        label = "synthetic 32 kbps MP3"
+
+    probe = subprocess.run(
+        [transcoder.ffmpeg, "-nostdin", "-i", source, "-f", "null", "-"], capture_output=True, text=True
+    ).stderr
+    duration = seconds
+    for line in probe.splitlines():
+        if "Duration:" in line:
+            hours, minutes, secs = line.split("Duration:")[1].split(",")[0].strip().split(":")
+            duration = int(hours) * 3600 + int(minutes) * 60 + float(secs)
+
+    source_size = os.path.getsize(source)
+    print(f"Source: {label}, {duration:.1f} s, {source_size / duration:.0f} bytes/s")
+    for format_name, audio_format in FORMATS.items():
+        output = os.path.join(directory, f"speech.{audio_format.extension}")
+        try:
+            cpu_seconds = transcoder.transcode(source, output, format_name)
+        except TranscodeError as e:
+            print(f"  {format_name:>5}: failed ({e})")
+            continue
+        size = os.path.getsize(output)
+        print(f"  {format_name:>5}: {size / duration:.0f} bytes/s ({size / source_size:.0%} of source), "
+              f"{cpu_seconds * 1000:.0f} ms CPU ({cpu_seconds / duration * 1000:.1f} ms per second of speech)")
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,256 @@
+# transcription.py
+"""
+Speech-to-text for uploaded recordings.
+
+Uploads are read into memory up to a size cap (no temporary files) and decoded
+with speech_recognition straight from the buffer. Long recordings are cut at
+pauses - runs of frames whose RMS energy stays under an adaptive threshold -
+into segments of at most `target_segment_seconds`, which are recognized in
+parallel on a bounded thread pool shared by all requests. Short recordings are
+recognized in one piece.
+
+Throughput is reported as the real-time factor: seconds of audio transcribed
+per second of wall-clock time.
+
+Run `python transcription.py` to compare whole-file and segmented recognition
+of a synthetic recording against a mocked recognizer.
+"""
+import asyncio
+import io
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from metrics import MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_CHUNK_SIZE = 64 * 1024
+FRAME_SECONDS = 0.03
+MIN_SILENCE_SECONDS = 0.4  # Pauses shorter than this never split a segment
+SPLIT_THRESHOLD_SECONDS = 12.0  # Recordings up to this long are recognized whole
+TARGET_SEGMENT_SECONDS = 10.0
+MIN_ENERGY = 0.01  # Silence threshold floor, as a fraction of full scale
+
+# Real-time factors from well under 1x (slow API) to tens of x (parallel segments)
+REALTIME_BUCKETS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0, 64.0)
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds the configured size cap"""
+
+
+async def read_limited(upload, max_bytes: int) -> bytes:
+    """Read an UploadFile into memory, refusing anything over `max_bytes`"""
+    buffer = io.BytesIO()
+    while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+        if buffer.tell() + len(chunk) > max_bytes:
+            raise UploadTooLarge(f"Upload exceeds {max_bytes} bytes")
+        buffer.write(chunk)
+    return buffer.getvalue()
+
+
+def load_audio(data: bytes):
+    """Decode a WAV/AIFF/FLAC recording held in memory into speech_recognition AudioData"""
+    import speech_recognition as sr
+
+    with sr.AudioFile(io.BytesIO(data)) as source:
+        return sr.Recognizer().record(source)
+
+
+def audio_seconds(audio) -> float:
+    return len(audio.frame_data) / (audio.sample_rate * audio.sample_width)
+
+
+def frame_energies(raw: bytes, width: int, frame_bytes: int) -> List[float]:
+    """RMS of each whole frame of little-endian signed PCM (what audioop.rms computed)"""
+    frames = len(raw) // frame_bytes
+    if not frames:
+        return []
+    data = np.frombuffer(raw, dtype=np.uint8, count=frames * frame_bytes)
+    if width == 3:
+        # No 24-bit dtype: assemble each sample from its three bytes and sign-extend
+        triples = data.reshape(-1, 3).astype(np.int32)
+        samples = triples[:, 0] | (triples[:, 1] << 8) | (triples[:, 2] << 16)
+        samples = np.where(samples >= 1 << 23, samples - (1 << 24), samples)
+    else:
+        samples = data.view({1: np.int8, 2: "<i2", 4: "<i4"}[width])
+    samples = samples.astype(np.float64).reshape(frames, -1)
+    return np.sqrt(np.mean(samples ** 2, axis=1)).tolist()
+
+
+def split_on_silence(audio, target_segment_seconds: float = TARGET_SEGMENT_SECONDS,
+                     split_threshold_seconds: float = SPLIT_THRESHOLD_SECONDS) -> List:
+    """
+    Cut a long recording at pauses into segments of roughly
+    `target_segment_seconds` (a segment only exceeds it when no pause falls
+    inside). Cuts are placed in the middle of each pause so no speech is clipped.
+    """
+    import speech_recognition as sr
+
+    if audio_seconds(audio) <= split_threshold_seconds:
+        return [audio]
+
+    width, rate, raw = audio.sample_width, audio.sample_rate, audio.frame_data
+    frame_bytes = int(rate * FRAME_SECONDS) * width
+    energies = frame_energies(raw, width, frame_bytes)
+    if not energies:
+        return [audio]
+
+    # Adaptive threshold: well above the quietest frames (room noise), never below the floor
+    full_scale = 2 ** (8 * width - 1)
+    noise_floor = sorted(energies)[len(energies) // 10]
+    threshold = max(noise_floor * 2.5, MIN_ENERGY * full_scale)
+
+    # Candidate cut points: middle of every long enough run of quiet frames
+    cuts, run_start = [], None
+    min_run = max(int(MIN_SILENCE_SECONDS / FRAME_SECONDS), 1)
+    for index, energy in enumerate(energies + [threshold]):
+        if energy < threshold:
+            run_start = index if run_start is None else run_start
+            continue
+        if run_start is not None and index - run_start >= min_run and run_start > 0 and index < len(energies):
+            cuts.append((run_start + index) // 2 * frame_bytes)
+        run_start = None
+
+    # Greedily merge the pieces between cuts into segments near the target length
+    target_bytes = int(target_segment_seconds * rate) * width
+    boundaries, segment_start = [], 0
+    for previous, cut in zip([0] + cuts, cuts + [len(raw)]):
+        if cut - segment_start > target_bytes and previous > segment_start:
+            boundaries.append(previous)
+            segment_start = previous
+    boundaries = [0] + boundaries + [len(raw)]
+    return [sr.AudioData(raw[start:end], rate, width) for start, end in zip(boundaries, boundaries[1:])]
+
+
+def recognize_google(audio, engine: Optional[str] = None) -> str:
+    """Recognize one segment; silence or unintelligible audio yields an empty string"""
+    import speech_recognition as sr
+
+    try:
+        return sr.Recognizer().recognize_google(audio)
+    except sr.UnknownValueError:
+        return ""
+
+
+class Transcriber:
+    """Segmenting speech recognizer backed by a bounded thread pool"""
+
+    def __init__(self, workers: int = 4, metrics: Optional[MetricsRegistry] = None,
+                 recognize: Callable = recognize_google,
+                 target_segment_seconds: float = TARGET_SEGMENT_SECONDS):
+        self.workers = workers
+        self.recognize = recognize
+        self.target_segment_seconds = target_segment_seconds
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="stt")
+        self.audio_total = self.wall_total = 0.0
+        self.requests = 0
+
+        self.audio_counter = self.wall_counter = self.segment_counter = self.realtime = None
+        if metrics is not None:
+            self.audio_counter = metrics.counter("stt_audio_seconds_total", "Seconds of audio transcribed")
+            self.wall_counter = metrics.counter("stt_processing_seconds_total", "Wall-clock seconds spent transcribing")
+            self.segment_counter = metrics.counter("stt_segments_total", "Segments sent to the recognizer")
+            self.realtime = metrics.histogram(
+                "stt_realtime_factor", "Audio seconds transcribed per wall-clock second, per request",
+                buckets=REALTIME_BUCKETS
+            )
+
+    async def transcribe(self, data: bytes, engine: Optional[str] = None) -> Tuple[str, Dict]:
+        """
+        Transcribe an in-memory recording, passing `engine` on to the recognize
+        callable. Returns the text and
+        {"audio_seconds", "segments", "wall_seconds", "realtime_factor"}.
+        Raises ValueError for undecodable audio.
+        """
+        loop = asyncio.get_running_loop()
+        start_time = time.perf_counter()
+
+        audio = await loop.run_in_executor(self.executor, load_audio, data)
+        segments = await loop.run_in_executor(
+            self.executor, split_on_silence, audio, self.target_segment_seconds
+        )
+        texts = await asyncio.gather(
+            *(loop.run_in_executor(self.executor, self.recognize, segment, engine) for segment in segments)
+        )
+
+        wall_seconds = time.perf_counter() - start_time
+        duration = audio_seconds(audio)
+        info = {
+            "audio_seconds": duration,
+            "segments": len(segments),
+            "wall_seconds": wall_seconds,
+            "realtime_factor": duration / wall_seconds if wall_seconds else 0.0
+        }
+        self.requests += 1
+        self.audio_total += duration
+        self.wall_total += wall_seconds
+        if self.realtime is not None:
+            self.audio_counter.inc(duration)
+            self.wall_counter.inc(wall_seconds)
+            self.segment_counter.inc(len(segments))
+            self.realtime.observe(info["realtime_factor"])
+        return " ".join(text.strip() for text in texts if text and text.strip()), info
+
+    def stats(self) -> Dict:
+        return {
+            "workers": self.workers,
+            "requests": self.requests,
+            "audio_seconds": round(self.audio_total, 3),
+            "processing_seconds": round(self.wall_total, 3),
+            "realtime_factor": round(self.audio_total / self.wall_total, 3) if self.wall_total else 0.0
+        }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _synthetic_recording(phrases: int = 12, phrase_seconds: float = 3.0, pause_seconds: float = 0.8,
+                         rate: int = 16000) -> bytes:
+    """WAV bytes: tone bursts ("phrases") separated by near-silent pauses"""
+    import math
+    import struct
+    import wave
+
+    samples = []
+    for phrase in range(phrases):
+        frequency = 220 + 40 * phrase
+        samples += [int(8000 * math.sin(2 * math.pi * frequency * i / rate)) for i in range(int(phrase_seconds * rate))]
+        samples += [(i % 7) - 3 for i in range(int(pause_seconds * rate))]
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(struct.pack(f"<{len(samples)}h", *samples))
+    return buffer.getvalue()
+
+
+async def _benchmark():
+    data = _synthetic_recording()
+
+    def mock_recognize(segment, engine=None) -> str:
+        # Cloud recognizers take a round trip plus time proportional to the audio
+        time.sleep(0.3 + 0.05 * audio_seconds(segment))
+        return "words"
+
+    start_time = time.perf_counter()
+    audio = load_audio(data)
+    mock_recognize(audio)
+    wall_seconds = time.perf_counter() - start_time
+    print(f"whole file: {audio_seconds(audio):.1f} s audio, 1 segment, "
+          f"{wall_seconds:.2f} s wall, {audio_seconds(audio) / wall_seconds:.1f}x real time")
+
+    transcriber = Transcriber(workers=4, recognize=mock_recognize)
+    _, info = await transcriber.transcribe(data)
+    print(f" segmented: {info['audio_seconds']:.1f} s audio, {info['segments']} segments, "
+          f"{info['wall_seconds']:.2f} s wall, {info['realtime_factor']:.1f}x real time")
+    transcriber.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(_benchmark())
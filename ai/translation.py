@@ -0,0 +1,165 @@
+# translation.py
+"""
+Translation helpers shared by the server and the CLI agents.
+"""
+import hashlib
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from deep_translator import GoogleTranslator
+
+TRANSLATION_MEMORY_PATH = "translation_memory.db"
+
+
+class TranslationFailed(Exception):
+    """Raised when the translator could not translate every sentence of a text"""
+
+
+class TranslatorPool:
+    """
+    Reusable translator instances per (source, target) language pair.
+
+    GoogleTranslator keeps per-request state on the instance, so an instance is
+    checked out by a single caller at a time and returned to the pool afterwards.
+    This avoids constructing a new translator for every string while staying safe
+    when translations run concurrently in worker threads.
+    """
+
+    def __init__(self, max_idle_per_pair: int = 8, factory: Callable = GoogleTranslator):
+        self.max_idle_per_pair = max_idle_per_pair
+        self.factory = factory
+        self._idle: Dict[Tuple[str, str], List] = {}
+        self._lock = threading.Lock()
+        self.created = 0
+
+    @contextmanager
+    def acquire(self, source: str, target: str):
+        """Check out a translator for the language pair, creating one if none is idle"""
+        pair = (source, target)
+        with self._lock:
+            idle = self._idle.setdefault(pair, [])
+            translator = idle.pop() if idle else None
+        if translator is None:
+            translator = self.factory(source=source, target=target)
+            with self._lock:
+                self.created += 1
+        try:
+            yield translator
+        finally:
+            with self._lock:
+                idle = self._idle.setdefault(pair, [])
+                if len(idle) < self.max_idle_per_pair:
+                    idle.append(translator)
+
+    def translate(self, text: str, source: str = "auto", target: str = "en") -> str:
+        """Translate a single string (blocking; run it in a worker thread from async code)"""
+        with self.acquire(source, target) as translator:
+            return translator.translate(text)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "translators_created": self.created,
+                "idle_translators": sum(len(idle) for idle in self._idle.values()),
+                "language_pairs": len(self._idle)
+            }
+
+
+def segment_hash(text: str) -> str:
+    """Stable digest of a source segment"""
+    return hashlib.md5(text.encode("utf-8")).hexdigest()
+
+
+class TranslationMemory:
+    """
+    Persistent sentence-level translation memory backed by SQLite.
+
+    Segments are keyed by (source language, target language, digest of the
+    source text), so a sentence translated once - a crisis line, a breathing
+    exercise, a closing line - is never sent to the translator again, whichever
+    response it appears in.
+    """
+
+    def __init__(self, path: str = TRANSLATION_MEMORY_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS segments (
+                    source_lang TEXT NOT NULL,
+                    target_lang TEXT NOT NULL,
+                    digest TEXT NOT NULL,
+                    translation TEXT NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (source_lang, target_lang, digest)
+                )
+                """
+            )
+        self.lookups = 0
+        self.hits = 0
+        self.translator_calls = 0
+
+    def lookup_many(self, segments: Iterable[str], source: str, target: str) -> Dict[str, str]:
+        """Return {segment: translation} for the segments already in memory"""
+        by_digest = {segment_hash(segment): segment for segment in segments}
+        if not by_digest:
+            return {}
+
+        found = {}
+        digests = list(by_digest)
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit
+            for i in range(0, len(digests), 500):
+                chunk = digests[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._connection.execute(
+                    f"SELECT digest, translation FROM segments "
+                    f"WHERE source_lang = ? AND target_lang = ? AND digest IN ({placeholders})",
+                    (source, target, *chunk)
+                ).fetchall()
+                found.update({by_digest[digest]: translation for digest, translation in rows})
+            if found:
+                with self._connection:
+                    self._connection.executemany(
+                        "UPDATE segments SET hits = hits + 1 WHERE source_lang = ? AND target_lang = ? AND digest = ?",
+                        [(source, target, segment_hash(segment)) for segment in found]
+                    )
+            self.lookups += len(by_digest)
+            self.hits += len(found)
+        return found
+
+    def store_many(self, translations: Dict[str, str], source: str, target: str):
+        """Remember newly translated segments"""
+        if not translations:
+            return
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO segments (source_lang, target_lang, digest, translation, hits, updated_at) "
+                "VALUES (?, ?, ?, ?, 0, ?)",
+                [(source, target, segment_hash(segment), translated, now) for segment, translated in translations.items()]
+            )
+            self.translator_calls += len(translations)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            segments = self._connection.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+            return {
+                "segments_stored": segments,
+                "segment_lookups": self.lookups,
+                "segment_hits": self.hits,
+                "segment_hit_ratio": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+                "translator_calls": self.translator_calls,
+                "translator_calls_saved": self.hits
+            }
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
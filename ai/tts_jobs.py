@@ -0,0 +1,209 @@
+# tts_jobs.py
+"""
+Background text-to-speech jobs.
+
+`TTSJobQueue` lets request handlers hand synthesis off and answer right away.
+Jobs are identified by a hash of (text, language), so the same response
+requested by many clients is synthesized once; a bounded asyncio queue feeds a
+fixed pool of worker tasks, and submissions beyond the queue limit are
+rejected instead of piling up. Finished jobs are kept (up to `max_finished`)
+so clients can poll for the result or wait on it.
+"""
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from metrics import MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+# Synthesis takes from a few hundred milliseconds to tens of seconds
+TTS_JOB_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 8.0, 13.0, 21.0, 34.0)
+
+Synthesizer = Callable[[str, str], Awaitable[Optional[str]]]
+
+
+class QueueFull(Exception):
+    """Raised when the job queue is at capacity"""
+
+
+def tts_job_id(text: str, language: str) -> str:
+    return hashlib.sha256(f"{language}|{text}".encode("utf-8")).hexdigest()[:32]
+
+
+class TTSJob:
+    """One synthesis request and its outcome"""
+
+    def __init__(self, job_id: str, text: str, language: str):
+        self.job_id = job_id
+        self.text = text
+        self.language = language
+        self.status = QUEUED
+        self.audio_url: Optional[str] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.done = asyncio.Event()
+
+    def to_dict(self) -> Dict:
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "audio_url": self.audio_url,
+            "error": self.error,
+            "language": self.language,
+            "text_length": len(self.text),
+            "queued_seconds": (self.started_at or time.time()) - self.created_at,
+            "synthesis_seconds": (self.finished_at - self.started_at) if self.finished_at and self.started_at else None
+        }
+
+
+class TTSJobQueue:
+    """Bounded queue of TTS jobs processed by a fixed pool of worker tasks"""
+
+    def __init__(self, synthesize: Synthesizer, workers: int = 2, max_queue: int = 100,
+                 max_finished: int = 1000, metrics: Optional[MetricsRegistry] = None):
+        self.synthesize = synthesize
+        self.worker_count = workers
+        self.max_queue = max_queue
+        self.max_finished = max_finished
+        self.jobs: "OrderedDict[str, TTSJob]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self.submitted = 0
+        self.deduplicated = 0
+        self.rejected = 0
+
+        self.queue_depth = self.job_duration = self.jobs_total = None
+        if metrics is not None:
+            self.queue_depth = metrics.gauge("tts_queue_depth", "TTS jobs waiting for a worker")
+            self.job_duration = metrics.histogram(
+                "tts_job_duration_seconds", "TTS job time by phase", ["phase"], buckets=TTS_JOB_BUCKETS
+            )
+            self.jobs_total = metrics.counter("tts_jobs_total", "TTS job submissions by outcome", ["result"])
+
+    def _count(self, result: str):
+        if self.jobs_total is not None:
+            self.jobs_total.inc(result=result)
+
+    def _ensure_workers(self):
+        # Created lazily so the queue binds to the running event loop
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+        if not self._workers:
+            self._workers = [
+                asyncio.create_task(self._worker(), name=f"tts-worker-{i}") for i in range(self.worker_count)
+            ]
+
+    def get(self, job_id: str) -> Optional[TTSJob]:
+        return self.jobs.get(job_id)
+
+    def forget(self, job_id: str):
+        """Drop a finished job so the next submission synthesizes again"""
+        job = self.jobs.get(job_id)
+        if job is not None and job.status in (DONE, FAILED):
+            del self.jobs[job_id]
+
+    def submit(self, text: str, language: str = "en") -> TTSJob:
+        """
+        Queue text for synthesis and return its job. A queued, running or
+        finished job for the same text and language is returned as is; failed
+        jobs are retried. Raises QueueFull when no slot is free.
+        """
+        self._ensure_workers()
+        job_id = tts_job_id(text, language)
+        existing = self.jobs.get(job_id)
+        if existing is not None and existing.status != FAILED:
+            self.deduplicated += 1
+            self._count("deduplicated")
+            return existing
+
+        job = TTSJob(job_id, text, language)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            self._count("rejected")
+            raise QueueFull(f"TTS queue is full ({self.max_queue} jobs)")
+
+        self.jobs[job_id] = job
+        self.jobs.move_to_end(job_id)
+        self.submitted += 1
+        self._count("submitted")
+        self._update_depth()
+        return job
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[TTSJob]:
+        """The job once it has finished or `timeout` seconds have passed (None if unknown)"""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        try:
+            await asyncio.wait_for(job.done.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return job
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            self._update_depth()
+            job.status = RUNNING
+            job.started_at = time.time()
+            try:
+                job.audio_url = await self.synthesize(job.text, job.language)
+                job.status = DONE if job.audio_url else FAILED
+                if not job.audio_url:
+                    job.error = "No TTS engine produced audio"
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"TTS job {job.job_id} failed: {e}")
+                job.status = FAILED
+                job.error = str(e)
+            finally:
+                job.finished_at = time.time()
+                job.done.set()
+                self._queue.task_done()
+
+            self._count(job.status)
+            if self.job_duration is not None:
+                self.job_duration.observe(job.started_at - job.created_at, phase="queued")
+                self.job_duration.observe(job.finished_at - job.started_at, phase="synthesis")
+            self._prune()
+
+    def _update_depth(self):
+        if self.queue_depth is not None and self._queue is not None:
+            self.queue_depth.set(self._queue.qsize())
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond `max_finished`"""
+        finished = [job_id for job_id, job in self.jobs.items() if job.status in (DONE, FAILED)]
+        for job_id in finished[:max(len(finished) - self.max_finished, 0)]:
+            del self.jobs[job_id]
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def stats(self) -> Dict:
+        by_status: Dict[str, int] = {}
+        for job in self.jobs.values():
+            by_status[job.status] = by_status.get(job.status, 0) + 1
+        return {
+            "workers": self.worker_count,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue": self.max_queue,
+            "jobs": by_status,
+            "submitted": self.submitted,
+            "deduplicated": self.deduplicated,
+            "rejected": self.rejected
+        }
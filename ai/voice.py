@@ -1,5 +1,6 @@
 # voice.py
 import os
+import io
 import json
 import time
 import threading
@@ -9,9 +10,7 @@ import queue
 import wave
 import pyaudio
 import speech_recognition as sr
-from gtts import gTTS
 import pygame
-import tempfile
 import subprocess
 import requests
 from pathlib import Path
@@ -19,12 +18,23 @@ import platform
 
 from rag import MentalHealthRAG
 from deep_translator import GoogleTranslator
+import language_detection
+from languages import LANGUAGES
+from segmentation import split_sentences
+from transcription import audio_seconds
+from voice_engines import (
+    EngineSelector, build_tts_engines, build_stt_engines, engine_names,
+    DEFAULT_TTS_ENGINES, DEFAULT_STT_ENGINES, TTS_LATENCY_BUDGET, STT_LATENCY_BUDGET
+)
 
 class VoiceMentalHealthAgent:
     """
     Voice Interface for Mental Health Chatbot with speech recognition and text-to-speech
     """
     
+    MUSIC_END = pygame.USEREVENT + 1  # Posted by the mixer when a clip finishes
+    SYNTHESIS_AHEAD = 2  # Sentences synthesized ahead of the one playing
+    
     def __init__(self, groq_api_key: str):
         self.groq_api_key = groq_api_key
         self.rag_system = MentalHealthRAG(groq_api_key)
@@ -32,7 +42,8 @@ class VoiceMentalHealthAgent:
         self.current_session_id = None
         self.user_name = "Harjas Singh"
         self.target_language = "en"
-        self.supported_languages = GoogleTranslator().get_supported_languages(as_dict=True)
+        self.supported_languages = LANGUAGES.by_name
+        LANGUAGES.refresh_in_background()
         
         # Enhanced audio settings optimized for macOS
         self.audio_format = pyaudio.paInt16
@@ -41,10 +52,30 @@ class VoiceMentalHealthAgent:
         self.chunk = 2048  # Larger chunk size for better performance
         self.sample_width = 2  # 16-bit audio
         
+        # Speech engines in preference order (TTS_ENGINES / STT_ENGINES); slow or
+        # failing engines fall back to the next one, e.g. local espeak/Sphinx offline
+        self.tts_engines = EngineSelector(
+            "tts",
+            build_tts_engines(engine_names(os.getenv("TTS_ENGINES"), DEFAULT_TTS_ENGINES), os.getenv("ELEVENLABS_API_KEY")),
+            TTS_LATENCY_BUDGET
+        )
+        self.stt_engines = EngineSelector(
+            "stt", build_stt_engines(engine_names(os.getenv("STT_ENGINES"), DEFAULT_STT_ENGINES)), STT_LATENCY_BUDGET
+        )
+        
         # Initialize audio components with comprehensive error handling
         self.has_audio = False
         self.audio = None
         self.recognizer = None
+        self.microphone = None
+        
+        # Continuous listening: a background listener queues captured phrases,
+        # a recognition thread turns them into transcripts
+        self.listen_mode = os.getenv("VOICE_LISTEN_MODE", "continuous")  # "continuous" or "turn"
+        self.phrase_queue = queue.Queue()
+        self.transcript_queue = queue.Queue()
+        self._stop_listening = None
+        self._recognition_thread = None
         
         try:
             # Initialize PyAudio with macOS-specific settings
@@ -78,15 +109,25 @@ class VoiceMentalHealthAgent:
             self.recognizer.operation_timeout = 10  # Longer timeout
             self.recognizer.phrase_threshold = 0.3  # Lower phrase threshold
             
-            # Test microphone access
+            # Test microphone access and calibrate for ambient noise once; the
+            # dynamic energy threshold keeps adapting while we listen
             print("🔊 Testing microphone access...")
-            with sr.Microphone() as source:
+            self.microphone = sr.Microphone(device_index=input_device_index)
+            with self.microphone as source:
                 self.recognizer.adjust_for_ambient_noise(source, duration=1)
                 print("✅ Microphone access successful")
             
             # Initialize pygame for audio playback with better settings
             pygame.mixer.init(frequency=22050, size=-16, channels=1, buffer=4096)
             
+            # End-of-playback is signalled through the event queue, which needs the
+            # video subsystem; the dummy driver provides it without opening a window
+            os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+            pygame.display.init()
+            pygame.event.set_blocked(None)
+            pygame.event.set_allowed(self.MUSIC_END)
+            pygame.mixer.music.set_endevent(self.MUSIC_END)
+            
             self.has_audio = True
             print("✅ Audio system initialized successfully")
             
@@ -142,6 +183,8 @@ class VoiceMentalHealthAgent:
         print(f"Audio Quality: {self.audio_quality}")
         print(f"Sample Rate: {self.rate} Hz")
         print(f"Supported Languages: {len(self.supported_languages)}")
+        print(f"TTS Engines: {', '.join(self.tts_engines.engines) or 'none'}")
+        print(f"STT Engines: {', '.join(self.stt_engines.engines) or 'none'}")
         
         if self.has_audio:
             # Show audio device info
@@ -259,23 +302,7 @@ class VoiceMentalHealthAgent:
     
     def detect_language(self, text: str) -> str:
         """Detect the language of the input text"""
-        try:
-            if not text.strip():
-                return "en"
-            
-            # Simple heuristic-based detection
-            if any(char in text for char in ['।', '़', '्']):
-                return "hi"
-            elif any(char in text for char in ['ñ', 'á', 'é', 'í', 'ó', 'ú']):
-                return "es"
-            elif any(char in text for char in ['ä', 'ö', 'ü', 'ß']):
-                return "de"
-            elif any(char in text for char in ['à', 'è', 'ì', 'ò', 'ù']):
-                return "fr"
-            
-            return "en"
-        except:
-            return "en"
+        return language_detection.detect_language(text)
     
     def translate_text(self, text: str, target_lang: str = "en", source_lang: str = "auto") -> str:
         """Translate text to target language"""
@@ -295,56 +322,149 @@ class VoiceMentalHealthAgent:
         if not text.strip():
             return
         
+        print(f"🔊 Speaking: {text[:50]}..." if len(text) > 50 else f"🔊 Speaking: {text}")
+        sentences = [sentence.strip() for sentence, _ in split_sentences(text) if sentence.strip()]
+        
+        # Sentence N+1 is synthesized while sentence N plays
+        clips = queue.Queue(maxsize=self.SYNTHESIS_AHEAD)
+        stop = threading.Event()
+        producer = threading.Thread(
+            target=self._synthesize_sentences, args=(sentences, lang, clips, stop), daemon=True
+        )
+        start_time = time.time()
+        spoken = 0
+        
+        # The background listener ignores phrases captured while we speak
+        self.is_speaking = True
+        producer.start()
         try:
-            # Method 1: gTTS (Google Text-to-Speech)
-            print(f"🔊 Speaking: {text[:50]}..." if len(text) > 50 else f"🔊 Speaking: {text}")
-            
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as tmp_file:
-                tts = gTTS(text=text, lang=lang, slow=False)
-                tts.save(tmp_file.name)
-                
-                # Play audio with pygame
-                pygame.mixer.music.load(tmp_file.name)
-                pygame.mixer.music.play()
-                
-                # Wait for playback to finish
-                while pygame.mixer.music.get_busy():
-                    time.sleep(0.1)
-                
-                # Clean up
-                os.unlink(tmp_file.name)
+            while (clip := clips.get()) is not None:
+                data, extension, error = clip
+                if error:
+                    raise RuntimeError(error)
+                if spoken == 0:
+                    print(f"⏱️ First audio after {time.time() - start_time:.2f}s")
+                self._play_clip(data, extension)
+                spoken += 1
                 
         except Exception as e:
             print(f"❌ TTS failed: {e}")
-            # Fallback: Print text with typing animation
+            # Fallback: Print the unspoken text with typing animation
             print("\n🤖 AI: ", end="", flush=True)
-            for char in text:
+            for char in " ".join(sentences[spoken:]):
                 print(char, end="", flush=True)
                 time.sleep(0.03)
             print()
+        finally:
+            self.is_speaking = False
+            stop.set()
+            while not clips.empty():
+                clips.get_nowait()
+    
+    def _synthesize_sentences(self, sentences: List[str], lang: str, clips: queue.Queue, stop: threading.Event):
+        """Producer for text_to_speech: synthesize each sentence into memory, in order"""
+        for sentence in sentences:
+            if stop.is_set():
+                break
+            try:
+                (data, extension), _ = self.tts_engines.run(
+                    lambda engine: (engine.synthesize_bytes(sentence, lang, engine.voice_for(lang)), engine.extension),
+                    units=len(sentence) / 100
+                )
+                clips.put((data, extension, None))
+            except Exception as e:
+                clips.put((None, None, str(e)))
+                return
+        clips.put(None)
+    
+    def _play_clip(self, data: bytes, extension: str):
+        """Play an in-memory clip and block until the mixer reports its end"""
+        pygame.event.clear(self.MUSIC_END)
+        pygame.mixer.music.load(io.BytesIO(data), f"speech.{extension}")
+        pygame.mixer.music.play()
+        while True:
+            # Wake on the end event; the timeout only guards against a lost event
+            event = pygame.event.wait(1000)
+            if event.type == self.MUSIC_END or not pygame.mixer.music.get_busy():
+                break
+        pygame.mixer.music.unload()
+    
+    def recognize_audio(self, audio) -> str:
+        """Recognize one captured phrase with the first healthy engine (Google, or Sphinx offline)"""
+        text, engine = self.stt_engines.run(
+            lambda stt_engine: stt_engine.recognize(audio), units=audio_seconds(audio)
+        )
+        if not text:
+            print("❓ Could not understand audio")
+            return ""
+        print(f"👤 You said: {text}" + (f" ({engine})" if engine != "google" else ""))
+        return text
+    
+    def _on_phrase(self, recognizer, audio):
+        """Background listener callback: queue the phrase unless it is our own speech"""
+        if self.is_speaking:
+            return
+        self.phrase_queue.put(audio)
+    
+    def _recognition_worker(self):
+        """Recognize queued phrases while the listener keeps capturing the next one"""
+        while True:
+            audio = self.phrase_queue.get()
+            if audio is None:
+                break
+            try:
+                text = self.recognize_audio(audio)
+            except Exception as e:
+                print(f"🌐 Speech recognition error: {e}")
+                continue
+            if text.strip():
+                self.transcript_queue.put(text)
+    
+    def start_listening(self) -> bool:
+        """Keep the microphone open and hand phrases to the recognition thread"""
+        if not self.has_audio or self._stop_listening is not None:
+            return self._stop_listening is not None
+        try:
+            self._stop_listening = self.recognizer.listen_in_background(
+                self.microphone, self._on_phrase, phrase_time_limit=15
+            )
+        except Exception as e:
+            print(f"⚠️ Continuous listening unavailable ({e}); listening turn by turn")
+            self.listen_mode = "turn"
+            return False
+        self._recognition_thread = threading.Thread(target=self._recognition_worker, daemon=True)
+        self._recognition_thread.start()
+        print("🎤 Continuous listening started")
+        return True
+    
+    def stop_listening(self):
+        if self._stop_listening is not None:
+            self._stop_listening(wait_for_stop=False)
+            self._stop_listening = None
+            self.phrase_queue.put(None)
     
     def speech_to_text(self) -> str:
         """Convert speech to text using multiple fallback methods"""
         if not self.has_audio:
             return input("💬 Type your message: ")
         
+        if self.listen_mode == "continuous" and self.start_listening():
+            # Phrases are captured and recognized in the background
+            print("🎤 Listening... (Speak now)")
+            try:
+                return self.transcript_queue.get(timeout=8)
+            except queue.Empty:
+                print("⏰ Listening timeout - no speech detected")
+                return ""
+        
         print("🎤 Listening... (Speak now)")
         
         try:
-            # Method 1: Google Speech Recognition
-            with sr.Microphone() as source:
-                # Adjust for ambient noise
-                print("🔊 Adjusting for ambient noise...")
-                self.recognizer.adjust_for_ambient_noise(source, duration=1)
-                
-                # Listen for audio
-                print("🎤 Listening...")
+            # Calibrated once at startup; the energy threshold adapts dynamically
+            with self.microphone as source:
                 audio = self.recognizer.listen(source, timeout=8, phrase_time_limit=6)
                 
-                # Recognize speech
-                text = self.recognizer.recognize_google(audio)
-                print(f"👤 You said: {text}")
-                return text
+            return self.recognize_audio(audio)
                 
         except sr.WaitTimeoutError:
             print("⏰ Listening timeout - no speech detected")
@@ -457,9 +577,9 @@ Available voice commands:
             if self.has_audio:
                 self.text_to_speech("Please say the language code you want to use, like 'es' for Spanish or 'fr' for French.", self.target_language)
             lang_code = self.speech_to_text().strip().lower()
-            if lang_code in self.supported_languages.values():
+            if LANGUAGES.is_supported(lang_code):
                 self.target_language = lang_code
-                lang_name = [k for k, v in self.supported_languages.items() if v == lang_code][0]
+                lang_name = LANGUAGES.name_of(lang_code)
                 if self.has_audio:
                     self.text_to_speech(f"Language changed to {lang_name}", "en")
                 else:
@@ -475,6 +595,7 @@ Available voice commands:
             if self.has_audio:
                 self.text_to_speech("Goodbye! Take care of yourself.", self.target_language)
             print("👋 Goodbye!")
+            self.stop_listening()
             exit()
             
         return False
@@ -525,6 +646,7 @@ Available voice commands:
                 print("\n\n⚠️ Interrupted by user")
                 if self.has_audio:
                     self.text_to_speech("Session interrupted.", self.target_language)
+                self.stop_listening()
                 break
                 
             except Exception as e:
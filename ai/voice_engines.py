@@ -0,0 +1,436 @@
+# voice_engines.py
+"""
+Pluggable text-to-speech and speech-to-text engines.
+
+Cloud engines (ElevenLabs, gTTS, Google recognition) sound and recognize
+best but cost a network round trip and fail offline; local engines (pyttsx3,
+the espeak/espeak-ng command line, CMU Sphinx) run on the CPU with no network
+at all. Engines are tried in a configured preference order by an
+`EngineSelector`, which tracks each engine's latency as an EWMA per unit of
+work: 100 characters for TTS, one second of audio for STT, and never less than
+one unit per call so short requests are not penalized for round trips. An
+engine that fails, or whose latency exceeds the budget, is demoted behind the
+others for a cooldown period and then probed again, so traffic falls back to
+local engines while the network is slow or down and returns once it recovers.
+A request may also name the engine it wants.
+
+Run `python voice_engines.py` for a latency and throughput benchmark of every
+engine available on this machine.
+"""
+import io
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from metrics import MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTS_ENGINES = ("elevenlabs", "gtts", "pyttsx3", "espeak")
+DEFAULT_STT_ENGINES = ("google", "sphinx")
+TTS_LATENCY_BUDGET = 1.5  # Seconds per 100 characters before an engine is demoted
+STT_LATENCY_BUDGET = 1.0  # Seconds per second of audio (slower than real time) before an engine is demoted
+ENGINE_COOLDOWN = 60.0  # Seconds a demoted engine waits before it is probed again
+
+ENGINE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0)
+
+
+class TTSEngine:
+    """Writes speech for a text to a file"""
+
+    name = ""
+    extension = "mp3"
+    local = False
+
+    def available(self) -> bool:
+        return True
+
+    def voice_for(self, language: str, voice_id: Optional[str] = None) -> str:
+        """Voice used for `language`; `voice_id` is an ElevenLabs voice and only that engine honours it"""
+        return "default"
+
+    def synthesize(self, text: str, language: str, voice: str, path: str):
+        raise NotImplementedError
+
+    def synthesize_bytes(self, text: str, language: str, voice: str) -> bytes:
+        """Speech as an in-memory file in this engine's format"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, f"speech.{self.extension}")
+            self.synthesize(text, language, voice, path)
+            with open(path, "rb") as file:
+                return file.read()
+
+
+class ElevenLabsEngine(TTSEngine):
+    name = "elevenlabs"
+
+    # Voice per language prefix; anything else uses the first entry
+    VOICES = (("en", "Rachel"), ("es", "Arnold"), ("fr", "Charlotte"))
+
+    def __init__(self, api_key: Optional[str]):
+        self.api_key = api_key
+
+    def available(self) -> bool:
+        if not self.api_key:
+            return False
+        try:
+            import elevenlabs
+            return True
+        except ImportError:
+            return False
+
+    def voice_for(self, language: str, voice_id: Optional[str] = None) -> str:
+        if voice_id:
+            return voice_id
+        for prefix, voice in self.VOICES:
+            if language.startswith(prefix):
+                return voice
+        return self.VOICES[0][1]
+
+    def synthesize(self, text: str, language: str, voice: str, path: str):
+        from elevenlabs import generate, save
+        audio = generate(text=text, voice=voice, model="eleven_multilingual_v2", api_key=self.api_key)
+        save(audio, path)
+
+    def synthesize_bytes(self, text: str, language: str, voice: str) -> bytes:
+        from elevenlabs import generate
+        return generate(text=text, voice=voice, model="eleven_multilingual_v2", api_key=self.api_key)
+
+
+class GTTSEngine(TTSEngine):
+    name = "gtts"
+
+    def available(self) -> bool:
+        try:
+            from gtts import gTTS
+            return True
+        except ImportError:
+            return False
+
+    def synthesize(self, text: str, language: str, voice: str, path: str):
+        from gtts import gTTS
+        gTTS(text=text, lang=language, slow=False).save(path)
+
+    def synthesize_bytes(self, text: str, language: str, voice: str) -> bytes:
+        from gtts import gTTS
+        buffer = io.BytesIO()
+        gTTS(text=text, lang=language, slow=False).write_to_fp(buffer)
+        return buffer.getvalue()
+
+
+class Pyttsx3Engine(TTSEngine):
+    """Local synthesis through the platform speech API (SAPI5, NSSpeechSynthesizer, espeak)"""
+
+    name = "pyttsx3"
+    extension = "wav"
+    local = True
+
+    def __init__(self):
+        self._engine = None
+        # pyttsx3 drivers run their own event loop and are not thread-safe
+        self._lock = threading.Lock()
+
+    def available(self) -> bool:
+        try:
+            import pyttsx3
+            return True
+        except ImportError:
+            return False
+
+    def voice_for(self, language: str, voice_id: Optional[str] = None) -> str:
+        return language.split("-")[0].lower()
+
+    def synthesize(self, text: str, language: str, voice: str, path: str):
+        import pyttsx3
+        with self._lock:
+            if self._engine is None:
+                self._engine = pyttsx3.init()
+            for candidate in self._engine.getProperty("voices"):
+                languages = [str(code).lower() for code in (candidate.languages or [])]
+                if voice == candidate.id or any(voice in code for code in languages):
+                    self._engine.setProperty("voice", candidate.id)
+                    break
+            self._engine.save_to_file(text, path)
+            self._engine.runAndWait()
+
+
+class EspeakEngine(TTSEngine):
+    """Local formant synthesis with the espeak-ng (or espeak) command line tool"""
+
+    name = "espeak"
+    extension = "wav"
+    local = True
+
+    def __init__(self):
+        self.binary = shutil.which("espeak-ng") or shutil.which("espeak")
+
+    def available(self) -> bool:
+        return self.binary is not None
+
+    def voice_for(self, language: str, voice_id: Optional[str] = None) -> str:
+        return language.split("-")[0].lower()
+
+    def synthesize(self, text: str, language: str, voice: str, path: str):
+        subprocess.run([self.binary, "-v", voice, "-w", path, text], check=True, capture_output=True, timeout=60)
+
+    def synthesize_bytes(self, text: str, language: str, voice: str) -> bytes:
+        return subprocess.run(
+            [self.binary, "-v", voice, "--stdout", text], check=True, capture_output=True, timeout=60
+        ).stdout
+
+
+class STTEngine:
+    """Turns speech_recognition AudioData into text ("" when nothing was understood)"""
+
+    name = ""
+    local = False
+
+    def available(self) -> bool:
+        try:
+            import speech_recognition
+            return True
+        except ImportError:
+            return False
+
+    def recognize(self, audio, language: Optional[str] = None) -> str:
+        raise NotImplementedError
+
+
+class GoogleSTTEngine(STTEngine):
+    name = "google"
+
+    def recognize(self, audio, language: Optional[str] = None) -> str:
+        import speech_recognition as sr
+        try:
+            return sr.Recognizer().recognize_google(audio, language=language or "en-US")
+        except sr.UnknownValueError:
+            return ""
+
+
+class SphinxSTTEngine(STTEngine):
+    """Offline CMU Sphinx recognition (English models unless others are installed)"""
+
+    name = "sphinx"
+    local = True
+
+    def available(self) -> bool:
+        try:
+            import pocketsphinx
+            return super().available()
+        except ImportError:
+            return False
+
+    def recognize(self, audio, language: Optional[str] = None) -> str:
+        import speech_recognition as sr
+        try:
+            return sr.Recognizer().recognize_sphinx(audio, language=language or "en-US")
+        except sr.UnknownValueError:
+            return ""
+
+
+def build_tts_engines(names: Sequence[str], elevenlabs_api_key: Optional[str] = None) -> List[TTSEngine]:
+    factories = {
+        "elevenlabs": lambda: ElevenLabsEngine(elevenlabs_api_key),
+        "gtts": GTTSEngine,
+        "pyttsx3": Pyttsx3Engine,
+        "espeak": EspeakEngine,
+    }
+    return [factories[name]() for name in names if name in factories]
+
+
+def build_stt_engines(names: Sequence[str]) -> List[STTEngine]:
+    factories = {"google": GoogleSTTEngine, "sphinx": SphinxSTTEngine}
+    return [factories[name]() for name in names if name in factories]
+
+
+def engine_names(setting: Optional[str], default: Sequence[str]) -> List[str]:
+    """Engine preference order from a comma separated setting such as TTS_ENGINES"""
+    if not setting:
+        return list(default)
+    return [name.strip().lower() for name in setting.split(",") if name.strip()]
+
+
+class EngineHealth:
+    """Observed behaviour of one engine"""
+
+    def __init__(self):
+        self.latency: Optional[float] = None  # EWMA seconds per unit of work
+        self.calls = 0
+        self.failures = 0
+        self.demoted_until = 0.0
+
+
+class EngineSelector:
+    """Preference-ordered engines with latency- and failure-driven fallback"""
+
+    def __init__(self, kind: str, engines: Sequence, latency_budget: float,
+                 cooldown: float = ENGINE_COOLDOWN, alpha: float = 0.3,
+                 metrics: Optional[MetricsRegistry] = None):
+        self.kind = kind
+        self.latency_budget = latency_budget
+        self.cooldown = cooldown
+        self.alpha = alpha
+        self.engines = OrderedDict((engine.name, engine) for engine in engines if engine.available())
+        self.health = {name: EngineHealth() for name in self.engines}
+        self._lock = threading.Lock()
+
+        self.latency_histogram = self.calls_counter = None
+        if metrics is not None:
+            self.latency_histogram = metrics.histogram(
+                "voice_engine_latency_seconds", "Voice engine call duration",
+                ["kind", "engine"], buckets=ENGINE_BUCKETS
+            )
+            self.calls_counter = metrics.counter(
+                "voice_engine_calls_total", "Voice engine calls by outcome", ["kind", "engine", "result"]
+            )
+
+        names = ", ".join(self.engines) or "none"
+        logger.info(f"{kind.upper()} engines available (in preference order): {names}")
+
+    def __bool__(self) -> bool:
+        return bool(self.engines)
+
+    def order(self, preferred: Optional[str] = None) -> List:
+        """
+        Engines to try, best first: the requested engine (if any), then the
+        configured order with demoted engines moved to the end.
+        Raises KeyError for an engine that is unknown or unavailable.
+        """
+        if preferred is not None and preferred not in self.engines:
+            raise KeyError(f"{self.kind.upper()} engine not available: {preferred}")
+        now = time.time()
+        names = list(self.engines)
+        healthy = [name for name in names if self.health[name].demoted_until <= now]
+        ordered = healthy + [name for name in names if name not in healthy]
+        if preferred is not None:
+            ordered.remove(preferred)
+            ordered.insert(0, preferred)
+        return [self.engines[name] for name in ordered]
+
+    def record(self, name: str, seconds: float, ok: bool, units: float = 1.0):
+        """Feed back one call; demotes the engine when it failed or was over budget"""
+        with self._lock:
+            health = self.health[name]
+            now = time.time()
+            probing = health.demoted_until and health.demoted_until <= now
+            health.calls += 1
+            if ok:
+                per_unit = seconds / max(units, 1.0)
+                if health.latency is None or probing:
+                    health.latency = per_unit  # Fresh start after a cooldown
+                else:
+                    health.latency = self.alpha * per_unit + (1 - self.alpha) * health.latency
+                if health.latency > self.latency_budget:
+                    health.demoted_until = now + self.cooldown
+                    logger.warning(f"{self.kind.upper()} engine {name} demoted: "
+                                   f"{health.latency:.2f}s per unit > {self.latency_budget}s budget")
+                elif probing:
+                    health.demoted_until = 0.0
+                    logger.info(f"{self.kind.upper()} engine {name} restored")
+            else:
+                health.failures += 1
+                health.demoted_until = now + self.cooldown
+                logger.warning(f"{self.kind.upper()} engine {name} failed; demoted for {self.cooldown:.0f}s")
+
+        if self.latency_histogram is not None:
+            self.latency_histogram.observe(seconds, kind=self.kind, engine=name)
+            self.calls_counter.inc(kind=self.kind, engine=name, result="ok" if ok else "error")
+
+    def run(self, call: Callable, preferred: Optional[str] = None, units: float = 1.0) -> Tuple[object, str]:
+        """
+        Blocking: call `call(engine)` on each engine in order until one succeeds.
+        Returns (result, engine name); raises RuntimeError when every engine failed.
+        """
+        last_error = None
+        for engine in self.order(preferred):
+            start_time = time.perf_counter()
+            try:
+                result = call(engine)
+            except Exception as e:
+                self.record(engine.name, time.perf_counter() - start_time, False, units)
+                last_error = e
+                continue
+            self.record(engine.name, time.perf_counter() - start_time, True, units)
+            return result, engine.name
+        raise RuntimeError(f"All {self.kind} engines failed: {last_error}")
+
+    def stats(self) -> Dict:
+        now = time.time()
+        return {
+            name: {
+                "local": engine.local,
+                "latency_per_unit": round(self.health[name].latency, 4) if self.health[name].latency else None,
+                "calls": self.health[name].calls,
+                "failures": self.health[name].failures,
+                "demoted": self.health[name].demoted_until > now
+            }
+            for name, engine in self.engines.items()
+        }
+
+
+def run_benchmark(repeats: int = 5):
+    """Latency and throughput of every TTS engine available here, and of the STT engines on their output"""
+    import tempfile
+
+    sentences = [
+        "Take a slow, deep breath and notice how your body feels right now.",
+        "It is okay to ask for help when things feel overwhelming.",
+        "If you are in crisis, please call or text 988 to reach the Suicide and Crisis Lifeline.",
+    ]
+    directory = tempfile.mkdtemp()
+    samples = {}
+
+    print(f"TTS, {repeats} x {len(sentences)} sentences:")
+    for engine in build_tts_engines(DEFAULT_TTS_ENGINES, os.getenv("ELEVENLABS_API_KEY")):
+        if not engine.available():
+            print(f"  {engine.name:>10}: unavailable")
+            continue
+        latencies, characters = [], 0
+        try:
+            for i in range(repeats):
+                for j, sentence in enumerate(sentences):
+                    path = os.path.join(directory, f"{engine.name}-{i}-{j}.{engine.extension}")
+                    start_time = time.perf_counter()
+                    engine.synthesize(sentence, "en", engine.voice_for("en"), path)
+                    latencies.append(time.perf_counter() - start_time)
+                    characters += len(sentence)
+                    samples.setdefault(engine.name, path)
+        except Exception as e:
+            print(f"  {engine.name:>10}: failed ({e})")
+            continue
+        latencies.sort()
+        print(f"  {engine.name:>10}: p50 {latencies[len(latencies) // 2] * 1000:.0f} ms, "
+              f"max {latencies[-1] * 1000:.0f} ms, {characters / sum(latencies):.0f} chars/s"
+              f"{' (local)' if engine.local else ''}")
+
+    wav_samples = [path for path in samples.values() if path.endswith(".wav")]
+    print("STT on synthesized speech:")
+    for engine in build_stt_engines(DEFAULT_STT_ENGINES):
+        if not engine.available() or not wav_samples:
+            print(f"  {engine.name:>10}: {'unavailable' if not engine.available() else 'no WAV sample to recognize'}")
+            continue
+        import speech_recognition as sr
+        with sr.AudioFile(wav_samples[0]) as source:
+            audio = sr.Recognizer().record(source)
+        seconds = len(audio.frame_data) / (audio.sample_rate * audio.sample_width)
+        try:
+            start_time = time.perf_counter()
+            text = engine.recognize(audio)
+            elapsed = time.perf_counter() - start_time
+        except Exception as e:
+            print(f"  {engine.name:>10}: failed ({e})")
+            continue
+        print(f"  {engine.name:>10}: {elapsed * 1000:.0f} ms for {seconds:.1f} s of audio "
+              f"({seconds / elapsed:.1f}x real time): {text!r}")
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    run_benchmark()
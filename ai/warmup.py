@@ -0,0 +1,201 @@
+# warmup.py
+"""
+Offline cache warmup for the Mental Health Chatbot server.
+
+Extracts the most frequent normalized queries from the conversation dataset and
+from the live request history (the `query_log` sorted set written by server_v2.py),
+then precomputes RAG responses, translations and TTS audio straight into the
+cache namespaces the server reads. Upstream calls are bounded by a concurrency
+limit and a rate limit so a warmup run never starves live traffic. The rate
+counts upstream requests, not calls: translating a response costs one request
+per sentence (as the server translates sentence by sentence), and so does TTS
+in "phrases" mode.
+
+Usage:
+    python warmup.py --top 20 --languages es,hi,fr --tts
+"""
+import os
+import json
+import time
+import asyncio
+import logging
+import argparse
+from collections import Counter
+from typing import Dict, List, Optional
+
+from rag import MentalHealthRAG
+from segmentation import split_sentences
+from server_v2 import MentalHealthServer, normalize_query, QUERY_LOG_KEY, CHAT_CACHE_TTL, TTS_MODE
+from translation import TranslationFailed
+
+logger = logging.getLogger("cache_warmup")
+
+DEFAULT_DATASET = "mental_health_conversations.json"
+DEFAULT_LANGUAGES = "es,hi,fr"
+
+
+def sentence_count(text: str) -> int:
+    """Upstream requests made for `text` by per-sentence translation or synthesis"""
+    return max(sum(1 for sentence, _ in split_sentences(text) if sentence.strip()), 1)
+
+
+class RateLimiter:
+    """Spaces out upstream requests so that at most `rate` requests start per second"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.next_slot = 0.0
+        self.lock = asyncio.Lock()
+
+    async def wait(self, requests: int = 1):
+        """Wait for a slot for a call that makes `requests` upstream requests"""
+        if not self.interval:
+            return
+        async with self.lock:
+            now = time.monotonic()
+            delay = self.next_slot - now
+            self.next_slot = max(now, self.next_slot) + self.interval * requests
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class CacheWarmer:
+    """Precomputes chat, translation and TTS cache entries for head queries"""
+
+    def __init__(self, server: MentalHealthServer, languages: List[str],
+                 concurrency: int = 2, rate: float = 1.0, with_tts: bool = False):
+        self.server = server
+        self.languages = languages
+        self.with_tts = with_tts
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.rate_limiter = RateLimiter(rate)
+        self.stats = Counter()
+
+    async def collect_queries(self, dataset_path: Optional[str], top_n: int) -> List[str]:
+        """Merge query frequencies from the dataset and the request history"""
+        counts = Counter()
+
+        if dataset_path and os.path.exists(dataset_path):
+            with open(dataset_path, "r", encoding="utf-8") as f:
+                conversations = json.load(f)
+            for conversation in conversations:
+                message = conversation.get("user_message")
+                if message:
+                    counts[normalize_query(message)] += 1
+            logger.info(f"Loaded {len(conversations)} conversations from {dataset_path}")
+        else:
+            logger.warning(f"Dataset not found: {dataset_path}")
+
+        history = await self.server.cache_manager.top_scores(QUERY_LOG_KEY, top_n)
+        for query, score in history:
+            counts[query] += int(score)
+        logger.info(f"Loaded {len(history)} queries from request history")
+
+        return [query for query, _ in counts.most_common(top_n) if query]
+
+    async def _upstream(self, func, *args, requests: int = 1, **kwargs):
+        """Run an upstream call that makes `requests` upstream requests under the concurrency and rate limits"""
+        async with self.semaphore:
+            await self.rate_limiter.wait(requests)
+            return await func(*args, **kwargs)
+
+    async def _generate(self, query: str) -> Dict:
+        return await asyncio.to_thread(self.server.rag_system.generate_response, query)
+
+    async def _synthesize(self, text: str, language: str) -> Optional[str]:
+        return await self.server.synthesize_speech(text, language)
+
+    async def warm_query(self, query: str):
+        """Warm every cache entry a request for `query` would read"""
+        cache = self.server.cache_manager
+        target_languages = ["en"] + [lang for lang in self.languages if lang != "en"]
+        cache_key = self.server.chat_cache_key(query, "en")
+
+        response_data = await cache.get(cache_key)
+        if response_data:
+            self.stats["chat_cached"] += 1
+        else:
+            response_data = await self._upstream(self._generate, query)
+            if response_data.get("method") == "error":
+                self.stats["errors"] += 1
+                logger.warning(f"Generation failed for query: {query[:50]}")
+                return
+            self.stats["chat_generated"] += 1
+        await cache.set(cache_key, response_data, ttl=CHAT_CACHE_TTL)
+
+        # Final localized responses, served by the chat endpoint without any upstream call
+        english_response = response_data["response"]
+        # Upper bound: sentences already in the translation memory are not sent
+        sentences = sentence_count(english_response)
+        localized = {"en": english_response}
+        for language in target_languages[1:]:
+            try:
+                localized[language] = await self._upstream(
+                    self.server.translate_text, english_response, language, "en", fallback=False,
+                    requests=sentences
+                )
+                self.stats["translations"] += 1
+            except TranslationFailed as e:
+                # A throttled translator must not leave English cached (and voiced) as this language
+                self.stats["translation_failed"] += 1
+                logger.warning(f"Skipping {language} for query '{query[:50]}': {e}")
+
+        for language, text in localized.items():
+            entry = self.server.localized_chat_entry(query, response_data, text, "en")
+            await cache.set(self.server.localized_chat_cache_key(query, language), entry, ttl=CHAT_CACHE_TTL)
+
+        if self.with_tts:
+            for language, text in localized.items():
+                clips = sentence_count(text) if TTS_MODE == "phrases" else 1
+                audio_url = await self._upstream(self._synthesize, text, language, requests=clips)
+                self.stats["tts" if audio_url else "tts_failed"] += 1
+
+    async def run(self, dataset_path: Optional[str], top_n: int) -> Counter:
+        queries = await self.collect_queries(dataset_path, top_n)
+        logger.info(f"Warming {len(queries)} queries for languages: {', '.join(self.languages)}")
+
+        start_time = time.time()
+        results = await asyncio.gather(
+            *(self.warm_query(query) for query in queries), return_exceptions=True
+        )
+        for query, result in zip(queries, results):
+            if isinstance(result, Exception):
+                self.stats["errors"] += 1
+                logger.warning(f"Warmup failed for query '{query[:50]}': {result}")
+
+        self.stats["queries"] = len(queries)
+        logger.info(f"Warmup finished in {time.time() - start_time:.1f}s: {dict(self.stats)}")
+        return self.stats
+
+
+async def warmup(args):
+    server = MentalHealthServer()
+    await server.initialize_redis()
+    if not server.cache_manager.is_connected:
+        logger.error("Redis is not connected - nothing to warm")
+        return
+
+    server.rag_system = MentalHealthRAG(groq_api_key=server.groq_api_key)
+
+    languages = [lang.strip() for lang in args.languages.split(",") if lang.strip()]
+    warmer = CacheWarmer(
+        server,
+        languages=languages,
+        concurrency=args.concurrency,
+        rate=args.rate,
+        with_tts=args.tts
+    )
+    await warmer.run(args.dataset, args.top)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute cache entries for frequent queries")
+    parser.add_argument("--dataset", default=DEFAULT_DATASET, help="Conversation dataset JSON file")
+    parser.add_argument("--top", type=int, default=20, help="Number of most frequent queries to warm")
+    parser.add_argument("--languages", default=DEFAULT_LANGUAGES, help="Comma-separated target language codes")
+    parser.add_argument("--tts", action="store_true", help="Also synthesize TTS audio for each response")
+    parser.add_argument("--concurrency", type=int, default=2, help="Maximum concurrent upstream calls")
+    parser.add_argument("--rate", type=float, default=1.0, help="Maximum upstream requests (LLM calls, translated sentences, TTS clips) started per second")
+    args = parser.parse_args()
+
+    asyncio.run(warmup(args))